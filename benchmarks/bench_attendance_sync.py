@@ -0,0 +1,97 @@
+"""
+Benchmark: DB time per recognition in the attendance sync path.
+
+Compares the legacy flow (SELECT shift_end, SELECT attendance row, INSERT or UPDATE,
+each with its own commit) against DatabaseManager.sync_daily_attendance
+(cached shift lookup + one INSERT ... ON DUPLICATE KEY UPDATE).
+
+Run from the project root against a TEST database (creates and deletes bench_* persons):
+    python benchmarks/bench_attendance_sync.py --persons 50 --rounds 20
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime, date
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.database import DatabaseManager
+
+
+def legacy_sync(db, person_id):
+    """The pre-upsert implementation: up to three round trips + commits"""
+    today = date.today().isoformat()
+    current_time = datetime.now().strftime('%H:%M:%S')
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT shift_end FROM persons WHERE person_id = %s', (person_id,))
+        if not cursor.fetchone():
+            return "Error: Person not found"
+        cursor.execute('SELECT id FROM attendance WHERE person_id = %s AND date = %s', (person_id, today))
+        if cursor.fetchone() is None:
+            cursor.execute('''
+                INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
+                VALUES (%s, %s, %s, %s, 'Present')
+            ''', (person_id, today, current_time, current_time))
+        else:
+            cursor.execute('UPDATE attendance SET leaving_time = %s WHERE person_id = %s AND date = %s',
+                           (current_time, person_id, today))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def clear_today(db, person_ids):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    marks = ', '.join(['%s'] * len(person_ids))
+    cursor.execute(f'DELETE FROM attendance WHERE date = %s AND person_id IN ({marks})',
+                   [date.today().isoformat()] + person_ids)
+    conn.commit()
+    conn.close()
+
+
+def run(label, fn, db, person_ids, rounds):
+    clear_today(db, person_ids)
+    timings = []
+    for _ in range(rounds):
+        for pid in person_ids:
+            start = time.perf_counter()
+            fn(pid)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<28} calls={len(timings):<6} mean={statistics.mean(timings):7.2f} ms  "
+          f"p50={statistics.median(timings):7.2f} ms  p95={p95:7.2f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--persons', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    person_ids = [f"bench_{i:04d}" for i in range(args.persons)]
+    for pid in person_ids:
+        db.add_person(pid, f"Bench {pid}", np.random.rand(512).astype(np.float32))
+
+    try:
+        legacy = run("legacy (3 round trips)", lambda pid: legacy_sync(db, pid), db, person_ids, args.rounds)
+        upsert = run("upsert (1 round trip)", db.sync_daily_attendance, db, person_ids, args.rounds)
+        print(f"\nDB time per recognition: {legacy:.2f} ms -> {upsert:.2f} ms "
+              f"({(1 - upsert / legacy) * 100:.0f}% less)")
+        print(f"Pool: {db.get_pool_stats()}")
+    finally:
+        for pid in person_ids:
+            db.delete_person(pid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: gallery load cost of base64(pickle) LONGTEXT vs raw float32 BLOB embeddings.
+
+Offline part (no DB needed): stored bytes per embedding, decode time for the whole
+gallery and memory held by the decoded gallery (tracemalloc), for --persons embeddings.
+With --db it also times DatabaseManager.get_all_face_encodings() on bench_emb_* persons.
+
+Run from the project root:
+    python benchmarks/bench_embeddings.py --persons 10000
+    python benchmarks/bench_embeddings.py --persons 2000 --db     # TEST database only
+"""
+import os
+import sys
+import time
+import pickle
+import base64
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.embeddings import encode_embedding, decode_embeddings
+
+
+def legacy_load(rows):
+    """What get_all_face_encodings did per row before the BLOB columns"""
+    return {pid: {'name': name, 'encoding': pickle.loads(base64.b64decode(text))} for pid, name, text in rows}
+
+
+def blob_load(rows, dim):
+    matrix = decode_embeddings([blob for _, _, blob in rows], dim)
+    return {pid: {'name': name, 'encoding': matrix[i]} for i, (pid, name, _) in enumerate(rows)}
+
+
+def measure(label, fn, rows, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    gallery = fn(rows, *args)
+    elapsed = (time.perf_counter() - start) * 1000
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} decode={elapsed:8.1f} ms  decoded gallery={held / 1e6:7.2f} MB")
+    return gallery, elapsed, held
+
+
+def offline(persons, dim):
+    embeddings = np.random.rand(persons, dim).astype(np.float32)
+    legacy_rows = [(f"p{i}", f"Person {i}", base64.b64encode(pickle.dumps(e)).decode('utf-8'))
+                   for i, e in enumerate(embeddings)]
+    blob_rows = [(f"p{i}", f"Person {i}", encode_embedding(e)[0]) for i, e in enumerate(embeddings)]
+
+    legacy_size = sum(len(r[2]) for r in legacy_rows)
+    blob_size = sum(len(r[2]) for r in blob_rows)
+    print(f"Stored per embedding:  legacy={legacy_size / persons:.0f} B  blob={blob_size / persons:.0f} B  "
+          f"({legacy_size / blob_size:.2f}x smaller)")
+
+    _, legacy_ms, legacy_mem = measure("legacy base64+pickle", legacy_load, legacy_rows)
+    gallery, blob_ms, blob_mem = measure("float32 blob (bulk)", blob_load, blob_rows, dim)
+    assert np.allclose(gallery['p0']['encoding'], embeddings[0])
+    print(f"Decode: x{legacy_ms / blob_ms:.1f} faster, memory: {legacy_mem / blob_mem:.2f}x less")
+
+
+def with_db(persons, dim):
+    from database.database import DatabaseManager
+    db = DatabaseManager()
+    ids = [f"bench_emb_{i:05d}" for i in range(persons)]
+    for pid in ids:
+        db.add_person(pid, f"Bench {pid}", np.random.rand(dim).astype(np.float32))
+    try:
+        start = time.perf_counter()
+        gallery = db.get_all_face_encodings()
+        print(f"get_all_face_encodings: {len(gallery)} faces in {(time.perf_counter() - start) * 1000:.1f} ms")
+    finally:
+        for pid in ids:
+            db.delete_person(pid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--persons', type=int, default=10000)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--db', action='store_true', help="Also time the real DB load")
+    args = parser.parse_args()
+
+    offline(args.persons, args.dim)
+    if args.db:
+        with_db(args.persons, args.dim)
+
+
+if __name__ == "__main__":
+    main()
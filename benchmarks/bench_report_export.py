@@ -0,0 +1,126 @@
+"""
+Benchmark: attendance report export, fetch-everything vs streamed (database/export.py).
+
+"buffered" is what the Reports tab did before: get_attendance_report() for the whole
+range, then csv.writer / export_to_pdf over the list (one document-wide table). "streamed"
+is export_attendance_report(): unbuffered cursor, REPORT_EXPORT_CHUNK_SIZE rows at a time.
+Prints rows/s and the peak Python memory (tracemalloc, measured in a second run) of each.
+
+Run from the project root against a TEST database:
+    python benchmarks/bench_report_export.py --persons 500 --days 365
+    python benchmarks/bench_report_export.py --formats csv jsonl    # existing data, last --days
+(--persons seeds synthetic bench_rx_* data, removed at the end unless --keep)
+"""
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.database import DatabaseManager
+from database.aggregates import backfill_attendance_daily
+from database.export import REPORT_HEADER, export_attendance_report
+
+PREFIX = 'bench_rx_'
+
+
+def seed(db, persons, days):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    person_ids = [f"{PREFIX}{i:05d}" for i in range(persons)]
+    cursor.executemany(f'''
+        {db.backend.insert_ignore} INTO persons (person_id, name, shift_start, shift_end, registered_date)
+        VALUES (%s, %s, '09:00:00', '18:00:00', %s)
+    ''', [(pid, f"Bench {pid}", date.today().isoformat()) for pid in person_ids])
+    conn.commit()
+
+    start = date.today() - timedelta(days=days)
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        cursor.executemany(f'''
+            {db.backend.insert_ignore} INTO attendance (person_id, date, arrival_time, leaving_time, status)
+            VALUES (%s, %s, %s, %s, 'Present')
+        ''', [(pid, day, f"{random.randint(8, 10):02d}:{random.randint(0, 59):02d}:00",
+               f"{random.randint(17, 19):02d}:{random.randint(0, 59):02d}:00") for pid in person_ids])
+        conn.commit()
+    conn.close()
+    backfill_attendance_daily(db, start.isoformat(), date.today().isoformat(), pause=0)
+    print(f"Seeded {persons} persons x {days} days ({persons * days:,} attendance rows)")
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM persons WHERE person_id LIKE %s', (PREFIX + '%',)) # Cascades to attendance
+    conn.commit()
+    conn.close()
+
+
+def buffered_export(db, path, fmt, start, end):
+    data = db.get_attendance_report(start, end)
+    if fmt == 'pdf':
+        ok, msg = db.export_to_pdf(data, path)
+        if not ok:
+            raise RuntimeError(msg)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_HEADER)
+            writer.writerows(data)
+    return len(data)
+
+
+def streamed_export(db, path, fmt, start, end):
+    ok, msg, stats = export_attendance_report(db, path, fmt, start, end)
+    if not ok:
+        raise RuntimeError(msg)
+    return stats['rows']
+
+
+def measure(label, fn, *args):
+    started = time.perf_counter()
+    rows = fn(*args)
+    elapsed = time.perf_counter() - started
+    # Separate run: tracing slows ReportLab down several times over
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<18} rows={rows:>9,}  {rows / max(elapsed, 1e-9):>10,.0f} rows/s  peak={peak / 1e6:7.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--persons', type=int, default=0, help="Synthetic persons to seed (0 = use existing data)")
+    parser.add_argument('--days', type=int, default=365, help="Days seeded and exported")
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl', 'pdf'], choices=['csv', 'jsonl', 'pdf'])
+    parser.add_argument('--keep', action='store_true', help="Keep the seeded rows")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    if args.persons:
+        seed(db, args.persons, args.days)
+    start = (date.today() - timedelta(days=args.days)).isoformat()
+    end = date.today().isoformat()
+
+    try:
+        with tempfile.TemporaryDirectory() as out:
+            for fmt in args.formats:
+                print(f"\n--- {fmt} ---")
+                path = os.path.join(out, f"report.{fmt}")
+                if fmt != 'jsonl': # No buffered JSON-lines export existed
+                    measure("buffered", buffered_export, db, path, fmt, start, end)
+                measure("streamed", streamed_export, db, path, fmt, start, end)
+    finally:
+        if args.persons and not args.keep:
+            cleanup(db)
+
+
+if __name__ == "__main__":
+    main()
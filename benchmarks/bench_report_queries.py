@@ -0,0 +1,170 @@
+"""
+Benchmark: report / log / unknown-face query times before and after the schema migrations.
+
+Times each query (mean/p95 over --repeats) and prints its EXPLAIN access type, key and
+estimated rows, then applies pending migrations (database/migrations.py) and measures again.
+Startup auto-migration is disabled for this run so the "before" numbers are real.
+
+Run from the project root against a TEST database:
+    python benchmarks/bench_report_queries.py --persons 200 --days 180 --logs-per-day 20 --migrate
+(--persons/--days seed synthetic bench_rq_* data, removed at the end unless --keep)
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config.config as config
+config.AUTO_MIGRATE = False # Must be set before DatabaseManager is imported
+
+from database.database import DatabaseManager
+from database.migrations import MigrationRunner
+
+PREFIX = 'bench_rq_'
+
+
+def seed(db, persons, days, logs_per_day, unknown_per_day):
+    """Synthetic rows, written as strings so they load into either schema"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    person_ids = [f"{PREFIX}{i:05d}" for i in range(persons)]
+    cursor.executemany('''
+        INSERT IGNORE INTO persons (person_id, name, shift_start, shift_end, registered_date)
+        VALUES (%s, %s, '09:00', '18:00', NOW())
+    ''', [(pid, f"Bench {pid}") for pid in person_ids])
+    conn.commit()
+
+    start = date.today() - timedelta(days=days)
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        attendance, logs = [], []
+        for pid in person_ids:
+            arrival = f"{random.randint(8, 10):02d}:{random.randint(0, 59):02d}:00"
+            leaving = f"{random.randint(17, 19):02d}:{random.randint(0, 59):02d}:00"
+            attendance.append((pid, day, arrival, leaving))
+            for _ in range(logs_per_day):
+                t = f"{random.randint(8, 19):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}"
+                logs.append((pid, f"Bench {pid}", day, t, f"{day} {t}"))
+        cursor.executemany('''
+            INSERT IGNORE INTO attendance (person_id, date, arrival_time, leaving_time, status)
+            VALUES (%s, %s, %s, %s, 'Present')
+        ''', attendance)
+        cursor.executemany('''
+            INSERT INTO face_logs (person_id, name, date, time, timestamp) VALUES (%s, %s, %s, %s, %s)
+        ''', logs)
+        cursor.executemany('''
+            INSERT INTO unknown_faces (timestamp, snapshot_path) VALUES (%s, %s)
+        ''', [(f"{day} {random.randint(8, 19):02d}:00:00", f"{PREFIX}/{day}_{i}.jpg") for i in range(unknown_per_day)])
+        conn.commit()
+    conn.close()
+    print(f"Seeded {persons} persons x {days} days ({persons * days * logs_per_day} face_logs rows)")
+    return person_ids
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM persons WHERE person_id LIKE %s', (PREFIX + '%',)) # Cascades to attendance/logs
+    cursor.execute('DELETE FROM unknown_faces WHERE snapshot_path LIKE %s', (PREFIX + '%',))
+    conn.commit()
+    conn.close()
+
+
+def build_queries(db, sample_person):
+    today = date.today()
+    month_start = (today - timedelta(days=30)).isoformat()
+    day = (today - timedelta(days=7)).isoformat()
+    return [
+        # (label, callable, SQL to EXPLAIN, params)
+        ("attendance report (30 days)", lambda: db.get_attendance_report(month_start, today.isoformat()),
+         '''SELECT a.date, p.name, a.person_id, a.arrival_time, a.leaving_time, a.status
+            FROM attendance a JOIN persons p ON a.person_id = p.person_id
+            WHERE a.date BETWEEN %s AND %s ORDER BY a.date DESC, a.arrival_time DESC''',
+         (month_start, today.isoformat())),
+        ("recent logs", db.get_recent_logs,
+         'SELECT person_id, name, date, time FROM face_logs ORDER BY id DESC LIMIT 100', None),
+        ("person log history", None,
+         'SELECT name, date, time FROM face_logs WHERE person_id = %s ORDER BY timestamp DESC LIMIT 100',
+         (sample_person,)),
+        ("logs on one day", None,
+         'SELECT COUNT(*) FROM face_logs WHERE date = %s', (day,)),
+        ("unknown faces (latest 50)", None,
+         'SELECT id, timestamp, snapshot_path FROM unknown_faces ORDER BY timestamp DESC LIMIT 50', None),
+    ]
+
+
+def run_sql(db, sql, params):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    cursor.fetchall()
+    conn.close()
+
+
+def explain(db, sql, params):
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('EXPLAIN ' + sql, params)
+    plan = cursor.fetchall()
+    conn.close()
+    return '; '.join(f"{r['table']}: type={r['type']} key={r['key']} rows={r['rows']}" for r in plan)
+
+
+def measure(db, queries, repeats, label):
+    print(f"\n--- {label} ---")
+    results = {}
+    for name, fn, sql, params in queries:
+        call = fn or (lambda sql=sql, params=params: run_sql(db, sql, params))
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+        results[name] = statistics.mean(timings)
+        print(f"{name:<28} mean={results[name]:8.2f} ms  p95={p95:8.2f} ms")
+        print(f"{'':<28} {explain(db, sql, params)}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--persons', type=int, default=0, help="Synthetic persons to seed (0 = use existing data)")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--logs-per-day', type=int, default=20)
+    parser.add_argument('--unknown-per-day', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--migrate', action='store_true', help="Apply pending migrations and measure again")
+    parser.add_argument('--keep', action='store_true', help="Keep the seeded rows")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    sample_person = None
+    if args.persons:
+        sample_person = seed(db, args.persons, args.days, args.logs_per_day, args.unknown_per_day)[0]
+    else:
+        persons = db.get_all_persons_details()
+        sample_person = persons[0][0] if persons else ''
+
+    try:
+        queries = build_queries(db, sample_person)
+        before = measure(db, queries, args.repeats, "before migrations")
+        if args.migrate:
+            MigrationRunner(db).run_pending()
+            after = measure(db, queries, args.repeats, "after migrations")
+            print("\n--- speedup ---")
+            for name in before:
+                print(f"{name:<28} {before[name]:8.2f} ms -> {after[name]:8.2f} ms  (x{before[name] / max(after[name], 1e-6):.1f})")
+    finally:
+        if args.persons and not args.keep:
+            cleanup(db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Absence / late-arrival alerts and the daily summary, as admin digests.
+
+Each check runs a handful of set-based queries for the whole roster (persons.shift_start
+against today's attendance), leaving out anyone already alerted today (alert_log), and
+sends at most one digest per kind. The alert_log rows are claimed before a digest goes
+out and only the people this process claimed are in it, so two processes checking the
+same database never send the same alert twice (a failed send releases the claim). Delivery goes through a sender object with a
+send(subject, body, recipients) method:
+  - SmtpSender:   SMTP_CONFIG (TLS + login)
+  - OutboxSender: writes each message as an .eml file (local stand-in for tests / demos)
+AlertScheduler runs the checks every ALERT_CHECK_INTERVAL on its own thread, never on the
+video threads, and only when EMAIL_NOTIFICATIONS_ENABLED. Individual kinds follow
+SEND_ABSENCE_ALERTS, SEND_LATE_ARRIVAL_ALERTS and SEND_DAILY_SUMMARY.
+"""
+import os
+import time
+import uuid
+import smtplib
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+from database.formatting import format_db_rows
+from config.config import (SMTP_CONFIG, EMAIL_NOTIFICATIONS_ENABLED, SEND_ABSENCE_ALERTS,
+                           SEND_LATE_ARRIVAL_ALERTS, SEND_DAILY_SUMMARY, DAILY_SUMMARY_TIME,
+                           ALERT_SENDER, ALERT_OUTBOX_DIR, ALERT_CHECK_INTERVAL,
+                           ABSENCE_GRACE_MINUTES, LATE_GRACE_MINUTES, ALERT_WEEKDAYS)
+
+LOCK_NAME = 'attendance_alerts'
+
+
+# --- SENDERS ---
+
+def build_message(sender, subject, body, recipients):
+    msg = EmailMessage()
+    msg['From'] = sender
+    msg['To'] = ', '.join(recipients)
+    msg['Subject'] = subject
+    msg['Date'] = datetime.now().strftime('%a, %d %b %Y %H:%M:%S')
+    msg.set_content(body)
+    return msg
+
+
+class SmtpSender:
+    def __init__(self, config=SMTP_CONFIG):
+        self.config = config
+
+    def send(self, subject, body, recipients):
+        c = self.config
+        msg = build_message(c['sender_email'], subject, body, recipients)
+        with smtplib.SMTP(c['smtp_server'], c['smtp_port'], timeout=30) as server:
+            if c.get('use_tls'):
+                server.starttls()
+            if c.get('sender_password'):
+                server.login(c['sender_email'], c['sender_password'])
+            server.send_message(msg)
+
+
+class OutboxSender:
+    """Local SMTP stand-in: messages are kept in `sent` and written to folder as .eml files"""
+    def __init__(self, folder=ALERT_OUTBOX_DIR, sender_email=SMTP_CONFIG['sender_email']):
+        self.folder = folder
+        self.sender_email = sender_email
+        self.sent = []
+
+    def send(self, subject, body, recipients):
+        msg = build_message(self.sender_email, subject, body, recipients)
+        self.sent.append(msg)
+        if self.folder:
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, f"{datetime.now():%Y%m%d_%H%M%S}_{len(self.sent):04d}.eml")
+            with open(path, 'wb') as f:
+                f.write(msg.as_bytes())
+
+
+def create_sender(kind=ALERT_SENDER):
+    return OutboxSender() if kind == 'outbox' else SmtpSender()
+
+
+# --- ENGINE ---
+
+class AlertEngine:
+    """One check = queries for the roster, alert_log rows claimed, one digest per kind for the claimed rows"""
+    def __init__(self, db_manager, sender=None, recipients=None,
+                 absence=SEND_ABSENCE_ALERTS, late=SEND_LATE_ARRIVAL_ALERTS, summary=SEND_DAILY_SUMMARY):
+        self.db_manager = db_manager
+        self.backend = db_manager.backend
+        self.sender = sender or create_sender()
+        self.recipients = recipients or [SMTP_CONFIG['admin_email']]
+        self.kinds = {'absence': absence, 'late': late, 'summary': summary}
+        self.stats = {'checks': 0, 'digests': 0, 'alerts': 0, 'send_errors': 0, 'errors': 0}
+
+    def run(self, now=None):
+        """Check everything due at `now`. Returns {kind: persons alerted} for the digests sent."""
+        now = now or datetime.now()
+        day = now.date().isoformat()
+        seconds = now.hour * 3600 + now.minute * 60 + now.second
+        sent = {}
+        self.stats['checks'] += 1
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            # GUI and CLI app may both run the engine: one process checks at a time where the
+            # backend has a named lock (MySQL); the alert_log claims dedupe either way
+            if not self.backend.try_lock(cursor, LOCK_NAME):
+                return sent
+            try:
+                if self.kinds['late']:
+                    token, rows = self._claim(conn, cursor, 'late', day, self._late_arrivals(cursor, day))
+                    if rows and self._deliver(conn, cursor, token, rows, self._late_digest(day, rows)):
+                        sent['late'] = len(rows)
+                journal = self.db_manager.journal
+                # Attendance still in the offline journal would show up as absences
+                replayed = not (journal and journal.pending_count())
+                if self.kinds['absence'] and now.weekday() in ALERT_WEEKDAYS and replayed:
+                    token, rows = self._claim(conn, cursor, 'absence', day, self._absentees(cursor, day, seconds))
+                    if rows and self._deliver(conn, cursor, token, rows, self._absence_digest(day, rows)):
+                        sent['absence'] = len(rows)
+                if self.kinds['summary'] and now.strftime('%H:%M') >= DAILY_SUMMARY_TIME \
+                        and not self._already_sent(cursor, 'summary', day):
+                    token, claimed = self._claim(conn, cursor, 'summary', day, [('',)])
+                    if claimed and self._deliver(conn, cursor, token, claimed, self._summary(cursor, day)):
+                        sent['summary'] = 1
+            finally:
+                self.backend.release_lock(cursor, LOCK_NAME)
+        except self.backend.Error as e:
+            self.stats['errors'] += 1
+            print(f"[ALERTS] ✗ Error: {e}")
+        finally:
+            conn.close()
+        return sent
+
+    # --- QUERIES ---
+
+    def _late_arrivals(self, cursor, day):
+        sec = self.backend.time_seconds
+        cursor.execute(f'''
+            SELECT a.person_id, p.name, p.department, p.shift_start, a.arrival_time
+            FROM attendance a
+            JOIN persons p ON p.person_id = a.person_id
+            LEFT JOIN alert_log l ON l.kind = 'late' AND l.date = a.date AND l.person_id = a.person_id
+            WHERE a.date = %s AND l.id IS NULL
+              AND {sec('a.arrival_time')} > {sec('p.shift_start')} + %s
+            ORDER BY a.arrival_time
+        ''', (day, LATE_GRACE_MINUTES * 60))
+        return format_db_rows(cursor.fetchall())
+
+    def _absentees(self, cursor, day, now_seconds, grace=ABSENCE_GRACE_MINUTES * 60, exclude_alerted=True):
+        """Persons whose shift started `grace` seconds ago with no attendance row today"""
+        sec = self.backend.time_seconds
+        cursor.execute(f'''
+            SELECT p.person_id, p.name, p.department, p.shift_start
+            FROM persons p
+            LEFT JOIN attendance a ON a.person_id = p.person_id AND a.date = %s
+            LEFT JOIN alert_log l ON l.kind = 'absence' AND l.date = %s AND l.person_id = p.person_id
+            WHERE a.person_id IS NULL {'AND l.id IS NULL' if exclude_alerted else ''}
+              AND {sec('p.shift_start')} + %s <= %s
+              AND p.registered_date < %s
+            ORDER BY p.department, p.name
+        ''', (day, day, grace, now_seconds, day))
+        return format_db_rows(cursor.fetchall())
+
+    def _already_sent(self, cursor, kind, day):
+        cursor.execute('SELECT COUNT(*) FROM alert_log WHERE kind = %s AND date = %s', (kind, day))
+        return cursor.fetchone()[0] > 0
+
+    def _claim(self, conn, cursor, kind, day, rows):
+        """
+        Insert alert_log rows for rows[i][0] under a fresh claim token (one multi-row insert),
+        then read back which of them carry it. Returns (token, rows this process claimed).
+        """
+        if not rows:
+            return None, []
+        token = uuid.uuid4().hex
+        cursor.executemany(f'''
+            {self.backend.insert_ignore} INTO alert_log (kind, person_id, date, claim_token) VALUES (%s, %s, %s, %s)
+        ''', [(kind, row[0], day, token) for row in rows])
+        cursor.execute('SELECT person_id FROM alert_log WHERE kind = %s AND date = %s AND claim_token = %s',
+                       (kind, day, token))
+        mine = {pid for (pid,) in cursor.fetchall()} # The rest: another process got there first
+        conn.commit()
+        return token, [row for row in rows if row[0] in mine]
+
+    def _release(self, conn, cursor, token):
+        cursor.execute('DELETE FROM alert_log WHERE claim_token = %s', (token,))
+        conn.commit()
+
+    # --- DIGESTS ---
+
+    def _deliver(self, conn, cursor, token, rows, message):
+        """Send a digest for claimed rows; on failure the claims are released for the next check"""
+        subject, body = message
+        try:
+            self.sender.send(subject, body, self.recipients)
+            self.stats['digests'] += 1
+            self.stats['alerts'] += len(rows)
+            print(f"[ALERTS] ✓ Sent: {subject}")
+            return True
+        except Exception as e:
+            self.stats['send_errors'] += 1
+            print(f"[ALERTS] ✗ Send Error: {e}")
+            self._release(conn, cursor, token)
+            return False
+
+    @staticmethod
+    def _table(header, rows):
+        rows = [[str(v) if v is not None else '-' for v in row] for row in rows]
+        widths = [max(len(h), *(len(r[i]) for r in rows)) if rows else len(h) for i, h in enumerate(header)]
+        line = lambda values: '  '.join(v.ljust(w) for v, w in zip(values, widths)).rstrip()
+        return '\n'.join([line(header), line(['-' * w for w in widths])] + [line(r) for r in rows])
+
+    def _late_digest(self, day, rows):
+        body = self._table(['ID', 'Name', 'Department', 'Shift Start', 'Arrival'], rows)
+        return f"[Attendance] {len(rows)} late arrival(s) - {day}", f"Late arrivals on {day}:\n\n{body}\n"
+
+    def _absence_digest(self, day, rows):
+        body = self._table(['ID', 'Name', 'Department', 'Shift Start'], rows)
+        return (f"[Attendance] {len(rows)} absent - {day}",
+                f"No attendance {ABSENCE_GRACE_MINUTES} minutes after shift start on {day}:\n\n{body}\n")
+
+    def _summary(self, cursor, day):
+        cursor.execute('SELECT COUNT(*) FROM persons')
+        total = cursor.fetchone()[0]
+        cursor.execute('''
+            SELECT d.person_id, p.name, d.arrival_time, d.leaving_time, d.worked_seconds, d.is_late, d.is_early
+            FROM attendance_daily d JOIN persons p ON p.person_id = d.person_id
+            WHERE d.date = %s
+            ORDER BY d.arrival_time
+        ''', (day,))
+        present = format_db_rows(cursor.fetchall())
+        absent = self._absentees(cursor, day, 86400, grace=0, exclude_alerted=False)
+        late = sum(1 for r in present if r[5])
+        early = sum(1 for r in present if r[6])
+
+        present_rows = [(pid, name, arrival, leaving, f"{worked / 3600:.1f}",
+                         ', '.join(f for f, on in (('late', is_late), ('early out', is_early)) if on))
+                        for pid, name, arrival, leaving, worked, is_late, is_early in present]
+        body = (f"Attendance summary for {day}\n\n"
+                f"Registered: {total}   Present: {len(present)}   Absent: {len(absent)}   "
+                f"Late: {late}   Early out: {early}\n\n"
+                f"Present:\n{self._table(['ID', 'Name', 'Arrival', 'Leaving', 'Hours', 'Flags'], present_rows)}\n\n"
+                f"Absent:\n{self._table(['ID', 'Name', 'Department', 'Shift Start'], absent)}\n")
+        return f"[Attendance] Daily summary - {day}", body
+
+
+class AlertScheduler:
+    """Runs AlertEngine every ALERT_CHECK_INTERVAL seconds in a background thread (if notifications are enabled)"""
+    def __init__(self, db_manager, interval=ALERT_CHECK_INTERVAL, enabled=EMAIL_NOTIFICATIONS_ENABLED, sender=None):
+        self.engine = AlertEngine(db_manager, sender=sender)
+        self.interval = interval
+        self.last_run = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        if enabled:
+            self.thread = threading.Thread(target=self._worker, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _worker(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.engine.run()
+                self.last_run = time.time()
+            except Exception as e:
+                print(f"Alert Engine Error: {e}")
@@ -7,8 +7,15 @@ from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.database import DatabaseManager
+from database.formatting import format_db_row, format_db_rows
 from core.face_recognition import FaceRecognitionHandler
 
+# Embedding BLOBs are not JSON-serialisable (nor useful to API clients): list columns explicitly
+PERSON_COLUMNS = ("person_id, name, email, department, shift_start, shift_end, registered_date, "
+                  "embedding_dim, embedding_model")
+UNKNOWN_FACE_COLUMNS = "id, timestamp, snapshot_path, embedding_dim, embedding_model"
+PRESENCE_COLUMNS = "id, person_id, name, camera_id, date, start_time, end_time, sightings"
+
 class AttendanceAPI:
     def __init__(self):
         self.db = DatabaseManager()
@@ -29,9 +36,9 @@ class AttendanceAPI:
         Returns: Dictionary or None
         """
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM persons WHERE person_id = %s", (person_id,))
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {PERSON_COLUMNS} FROM persons WHERE person_id = %s", (person_id,))
             person = cursor.fetchone()
             return person
         except Exception as e:
@@ -46,9 +53,9 @@ class AttendanceAPI:
         Returns: List of dictionaries
         """
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM persons")
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {PERSON_COLUMNS} FROM persons")
             persons = cursor.fetchall()
             return persons
         except Exception as e:
@@ -78,7 +85,7 @@ class AttendanceAPI:
 
     def get_today_attendance(self):
         """
-        Get attendance records for the current day.
+        Get attendance records for the current day (served from the in-memory day state).
         Returns: List of tuples/dictionaries (depending on DB implementation, DB returns tuples currently)
         """
         return self.db.get_today_attendance()
@@ -102,9 +109,9 @@ class AttendanceAPI:
         Retrieve recent unknown face logs.
         """
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM unknown_faces ORDER BY timestamp DESC LIMIT %s", (limit,))
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {UNKNOWN_FACE_COLUMNS} FROM unknown_faces ORDER BY timestamp DESC LIMIT %s", (limit,))
             logs = cursor.fetchall()
             return logs
         except Exception as e:
@@ -115,17 +122,17 @@ class AttendanceAPI:
 
     def get_unknown_face(self, record_id):
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM unknown_faces WHERE id = %s", (record_id,))
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {UNKNOWN_FACE_COLUMNS} FROM unknown_faces WHERE id = %s", (record_id,))
             return cursor.fetchone()
         finally:
             conn.close()
 
     def delete_unknown_face(self, record_id):
         conn = self.db.get_connection()
-        cursor = conn.cursor()
         try:
+            cursor = conn.cursor()
             cursor.execute("DELETE FROM unknown_faces WHERE id = %s", (record_id,))
             conn.commit()
             return True, "Deleted successfully"
@@ -138,13 +145,16 @@ class AttendanceAPI:
 
     def create_attendance(self, person_id, date_str, arrival, leaving, status):
         conn = self.db.get_connection()
-        cursor = conn.cursor()
         try:
+            cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
                 VALUES (%s, %s, %s, %s, %s)
             """, (person_id, date_str, arrival, leaving, status))
+            self.db.refresh_attendance_daily(cursor, 'a.person_id = %s AND a.date = %s', (person_id, date_str))
             conn.commit()
+            self.db.day_state.invalidate() # Today's cached state may have changed
+            self.db.report_cache.invalidate([date_str])
             return True, "Attendance created"
         except Exception as e:
             return False, str(e)
@@ -153,23 +163,26 @@ class AttendanceAPI:
 
     def get_attendance_by_id(self, record_id):
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
+            cursor = conn.cursor(dictionary=True)
             cursor.execute("SELECT * FROM attendance WHERE id = %s", (record_id,))
-            return cursor.fetchone()
+            return format_db_row(cursor.fetchone())
         finally:
             conn.close()
 
     def update_attendance(self, record_id, arrival, leaving, status):
         conn = self.db.get_connection()
-        cursor = conn.cursor()
         try:
+            cursor = conn.cursor()
             cursor.execute("""
                 UPDATE attendance 
                 SET arrival_time=%s, leaving_time=%s, status=%s
                 WHERE id=%s
             """, (arrival, leaving, status, record_id))
+            self.db.refresh_attendance_daily(cursor, 'a.id = %s', (record_id,))
             conn.commit()
+            self.db.day_state.invalidate() # Today's cached state may have changed
+            self.db.report_cache.invalidate() # Date of the row not known here
             return True, "Attendance updated"
         except Exception as e:
             return False, str(e)
@@ -178,56 +191,59 @@ class AttendanceAPI:
 
     def delete_attendance(self, record_id):
         conn = self.db.get_connection()
-        cursor = conn.cursor()
         try:
+            cursor = conn.cursor()
             cursor.execute("DELETE FROM attendance WHERE id=%s", (record_id,))
             conn.commit()
+            self.db.day_state.invalidate() # Today's cached state may have changed
+            self.db.report_cache.invalidate() # Date of the row not known here
             return True, "Attendance deleted"
         except Exception as e:
             return False, str(e)
         finally:
             conn.close()
 
-    # --- FACE LOGS CRUD ---
+    # --- PRESENCE LOGS (presence_intervals: recognition no longer writes face_logs) ---
 
-    def create_face_log(self, person_id, name, date_str, time_str):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+    def create_face_log(self, person_id, name, date_str, time_str, camera_id='api'):
+        """Manual sighting: a one-sighting interval at date_str time_str"""
         try:
-            cursor.execute("""
-                INSERT INTO face_logs (person_id, name, date, time)
-                VALUES (%s, %s, %s, %s)
-            """, (person_id, name, date_str, time_str))
-            conn.commit()
-            return True, "Log created"
-        except Exception as e:
-            return False, str(e)
-        finally:
-            conn.close()
-
-    def get_all_logs(self, limit=100):
+            seen_at = datetime.fromisoformat(f"{date_str} {time_str}")
+        except (TypeError, ValueError) as e:
+            return False, f"Invalid date/time: {e}"
+        if not self.db.write_presence_intervals([(person_id, name, camera_id, seen_at, seen_at, 1)]):
+            return False, "Log not written"
+        return True, "Log created"
+
+    def get_all_logs(self, limit=100, person_id=None):
+        """Latest presence intervals, newest first"""
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM face_logs ORDER BY id DESC LIMIT %s", (limit,))
-            return cursor.fetchall()
+            cursor = conn.cursor(dictionary=True)
+            query = f"SELECT {PRESENCE_COLUMNS} FROM presence_intervals"
+            params = []
+            if person_id:
+                query += " WHERE person_id = %s"
+                params.append(person_id)
+            cursor.execute(query + " ORDER BY end_time DESC LIMIT %s", (*params, limit))
+            return format_db_rows(cursor.fetchall())
         finally:
             conn.close()
 
     def get_face_log(self, record_id):
         conn = self.db.get_connection()
-        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT * FROM face_logs WHERE id=%s", (record_id,))
-            return cursor.fetchone()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT {PRESENCE_COLUMNS} FROM presence_intervals WHERE id=%s", (record_id,))
+            return format_db_row(cursor.fetchone())
         finally:
             conn.close()
 
     def delete_face_log(self, record_id):
         conn = self.db.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM face_logs WHERE id=%s", (record_id,))
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM presence_intervals WHERE id=%s", (record_id,))
             conn.commit()
             return True, "Log deleted"
         except Exception as e:
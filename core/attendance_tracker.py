@@ -1,84 +1,132 @@
 import time
-import winsound
-import threading
-from core.voice_handler import VoiceSystem  
+import queue
+from core.voice_handler import VoiceSystem, greeting_phrases
+from core.snapshot_writer import SnapshotWriter
+from database.write_behind import AttendanceWriter
+from database.presence import PresenceRecorder
+from config.config import ATTENDANCE_WRITE_BEHIND
 
 class AttendanceTracker:
     def __init__(self, db_manager, face_handler):
         self.db_manager = db_manager
         self.face_handler = face_handler
         
-        # Initialize Voice
+        # Initialize Voice (one speech worker, engine created once)
         self.voice = VoiceSystem()
+        self.prepare_greetings([face['name'] for face in face_handler.registered_faces.values()])
+        self.voice.prune_cache() # Greetings of renamed / deleted persons
+        
+        # Unknown-face snapshots + DB rows are written off the video thread
+        self.snapshot_writer = SnapshotWriter(db_manager)
+        
+        # Sightings are merged into presence intervals (not one face_logs row each)
+        self.presence = PresenceRecorder(db_manager)
+        
+        # Attendance goes through a write-behind queue (results come back async)
+        self.pending_messages = queue.Queue()
+        self.attendance_writer = None
+        if ATTENDANCE_WRITE_BEHIND:
+            self.attendance_writer = AttendanceWriter(db_manager, on_result=self._on_attendance_result)
         
         # Timers
-        self.last_log_time = {}        
         self.last_attendance_time = {} 
         self.last_unknown_alert_time = 0 
     
-    def process_recognized_face(self, person_id, person_name):
+    def process_recognized_face(self, person_id, person_name, camera_id=None):
         """
-        1. Log Face: 90s gap
+        1. Presence: every sighting extends the person's interval on this camera (in memory)
         2. Update Attendance: 5s gap (with Voice Feedback)
         """
         current_ts = time.time()
         
-        # --- PART 1: RAW LOGGING ---
-        if person_id not in self.last_log_time or \
-           (current_ts - self.last_log_time[person_id] > 10.0):
-            
-            self.db_manager.log_raw_detection(person_id, person_name)
-            self.last_log_time[person_id] = current_ts
+        # --- PART 1: PRESENCE INTERVALS ---
+        self.presence.record(person_id, person_name, camera_id)
 
         # --- PART 2: ATTENDANCE LOGIC & VOICE ---
         if person_id not in self.last_attendance_time or \
            (current_ts - self.last_attendance_time[person_id] > 5.0):
             
-            # Perform DB Sync
-            msg = self.db_manager.sync_daily_attendance(person_id)
             self.last_attendance_time[person_id] = current_ts
             
-            # --- VOICE FEEDBACK -------------------------------------------
+            # Write-behind: result (and voice) arrives via _on_attendance_result
+            if self.attendance_writer:
+                self.attendance_writer.record_attendance(person_id, person_name)
+                return True, None
             
-            if "LOGIN" in msg:
-             
-                self.voice.speak(f"Welcome, {person_name}. Login Successful.")
-                
-            elif "LOGOUT UPDATE" in msg:
-              
-                self.voice.speak(f"Goodbye, {person_name}. Logout Updated.")
-                
-            elif "Shift Ongoing" in msg:
-              
-                # For now, we stay silent for ongoing shifts.
-                pass
+            # Perform DB Sync
+            msg = self.db_manager.sync_daily_attendance(person_id)
+            self.announce(person_name, msg)
             
             return True, f"{person_name}: {msg}"
 
         return True, None
 
-    def process_unknown_person(self, snapshot_path, face_encoding):
+    def announce(self, person_name, msg):
+        """Voice feedback for an attendance result"""
+        if "LOGIN" in msg:
+         
+            self.voice.greet('welcome', person_name) # Merged with others arriving together
+            
+        elif "LOGOUT UPDATE" in msg:
+          
+            self.voice.greet('goodbye', person_name)
+            
+        elif "Shift Ongoing" in msg:
+          
+            # For now, we stay silent for ongoing shifts.
+            pass
+
+    def prepare_greetings(self, names):
+        """Render greetings for names in the background (call after registering / renaming)"""
+        self.voice.prerender([phrase for name in names for phrase in greeting_phrases(name)])
+
+    def _on_attendance_result(self, person_id, person_name, msg):
+        """Called from the DB writer thread once a batch is committed"""
+        self.announce(person_name, msg)
+        self.pending_messages.put(f"{person_name}: {msg}")
+
+    def get_pending_messages(self):
+        """Drain attendance results produced by the write-behind writer"""
+        messages = []
+        while True:
+            try:
+                messages.append(self.pending_messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def shutdown(self):
+        """Flush background writers (call on exit)"""
+        self.presence.stop()
+        if self.attendance_writer:
+            self.attendance_writer.stop()
+        self.snapshot_writer.stop()
+        self.voice.stop()
+
+    def process_unknown_person(self, snapshot_path, face_encoding, face_crop=None):
         """
-        Log unknown person to DB and Alert Admin
+        Log unknown person to DB and Alert Admin.
+        With a face_crop the snapshot and DB row are queued (never blocks);
+        without one the caller already saved the file and we log synchronously.
         """
-        # 1. Log to DB
-        result = self.db_manager.log_unknown_person(snapshot_path, face_encoding)
+        # 1. Save Snapshot + Log to DB
+        if face_crop is not None:
+            result = self.snapshot_writer.submit(snapshot_path, face_crop, face_encoding)
+        else:
+            result = self.db_manager.log_unknown_person(snapshot_path, face_encoding)
         
         # 2. Alert Logic (Cooldown: 15s)
         current_ts = time.time()
         if current_ts - self.last_unknown_alert_time > 15.0:
             self.last_unknown_alert_time = current_ts
             
-            # Run alert in background to avoid freezing video
-            threading.Thread(target=self._trigger_unknown_alert, daemon=True).start()
+            # Queued to the voice worker: never blocks video
+            self._trigger_unknown_alert()
             
         return result
 
     def _trigger_unknown_alert(self):
-        """Play beep and speak warning"""
+        """Play chime and speak warning (both pre-rendered)"""
         try:
-            # Beep: Frequency 1000Hz, Duration 500ms
-            winsound.Beep(1000, 500) 
-            self.voice.speak("Unknown person detected.")
+            self.voice.alert()
         except Exception as e:
             print(f"Alert Error: {e}")
\ No newline at end of file
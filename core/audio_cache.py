@@ -0,0 +1,139 @@
+"""
+Pre-rendered speech: fixed phrases and per-person greetings synthesized once to audio
+files, then played back instead of running TTS for every event.
+
+Files live in VOICE_AUDIO_CACHE_DIR, named by a hash of the text and the voice settings
+(rate, volume, voice id), so changing a setting renders new files instead of playing
+stale ones. Playback goes through a player chosen per platform:
+  - Windows: winsound.PlaySound (standard library)
+  - macOS:   afplay
+  - Linux:   paplay / aplay / ffplay (first one found)
+With no player available VoiceSystem falls back to live TTS.
+"""
+import os
+import sys
+import math
+import wave
+import struct
+import shutil
+import hashlib
+import subprocess
+from config.config import VOICE_AUDIO_CACHE_DIR, VOICE_PLAYER
+
+CHIME_FREQUENCY = 1000 # Hz (the old winsound.Beep alert tone)
+CHIME_SECONDS = 0.5
+CHIME_SAMPLE_RATE = 22050
+
+
+# --- PLAYERS ---
+
+class WinsoundPlayer:
+    name = 'winsound'
+
+    def play(self, path):
+        import winsound
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+
+
+class CommandPlayer:
+    """Plays a file with an external command; blocks until it has finished"""
+    def __init__(self, name, command):
+        self.name = name
+        self.command = command
+
+    def play(self, path):
+        subprocess.run(self.command + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True, timeout=30)
+
+
+COMMANDS = {
+    'afplay': ['afplay'],
+    'paplay': ['paplay'],
+    'aplay': ['aplay', '-q'],
+    'ffplay': ['ffplay', '-nodisp', '-autoexit', '-loglevel', 'quiet'],
+}
+
+
+def create_player(kind=VOICE_PLAYER):
+    """Player for `kind` ('auto' = pick for this platform). None = play nothing, use live TTS."""
+    if kind == 'none':
+        return None
+    if kind == 'winsound' or (kind == 'auto' and sys.platform == 'win32'):
+        return WinsoundPlayer()
+    candidates = [kind] if kind != 'auto' else (['afplay'] if sys.platform == 'darwin' else ['paplay', 'aplay', 'ffplay'])
+    for name in candidates:
+        if name in COMMANDS and shutil.which(COMMANDS[name][0]):
+            return CommandPlayer(name, COMMANDS[name])
+    print(f"[VOICE] No audio player found ({kind}), using live speech")
+    return None
+
+
+# --- CACHE ---
+
+class AudioCache:
+    """Maps phrase text (+ voice settings) to a rendered file in folder"""
+    def __init__(self, folder=VOICE_AUDIO_CACHE_DIR):
+        self.folder = folder
+        self.settings = ''
+        os.makedirs(folder, exist_ok=True)
+
+    def configure(self, rate, volume, voice_id):
+        """Voice settings that are part of every key (set once the engine is up)"""
+        self.settings = f"{rate}|{volume}|{voice_id}"
+
+    def path(self, text):
+        digest = hashlib.sha1(f"{self.settings}|{text}".encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, f"{digest}.wav")
+
+    def lookup(self, text):
+        """Path of the rendered phrase, or None if it is not rendered yet"""
+        path = self.path(text)
+        return path if os.path.exists(path) else None
+
+    def render(self, engine, text):
+        """Synthesize text to its cache file with engine (on the engine's thread)"""
+        path = self.path(text)
+        tmp = path + '.tmp.wav'
+        engine.save_to_file(text, tmp)
+        engine.runAndWait()
+        if not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
+            raise RuntimeError(f"no audio rendered for '{text}'")
+        os.replace(tmp, path) # Never play a half-written file
+        return path
+
+    def prune(self, texts):
+        """Remove rendered files that are not one of texts (renamed / deleted persons, old settings)"""
+        keep = {os.path.basename(self.path(text)) for text in texts}
+        keep.add(os.path.basename(self.chime_path()))
+        removed = 0
+        for name in os.listdir(self.folder):
+            if name.endswith('.wav') and name not in keep:
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                    removed += 1
+                except OSError as e:
+                    print(f"Voice Error: {e}")
+        return removed
+
+    def chime_path(self):
+        return os.path.join(self.folder, f"chime_{CHIME_FREQUENCY}hz.wav")
+
+    def chime(self):
+        """Alert tone as a WAV file (generated once, independent of the voice settings)"""
+        path = self.chime_path()
+        if os.path.exists(path):
+            return path
+        frames = int(CHIME_SAMPLE_RATE * CHIME_SECONDS)
+        fade = CHIME_SAMPLE_RATE // 100 # 10 ms ramps, no clicks
+        samples = bytearray()
+        for i in range(frames):
+            level = min(1.0, i / fade, (frames - i) / fade)
+            value = int(0.6 * 32767 * level * math.sin(2 * math.pi * CHIME_FREQUENCY * i / CHIME_SAMPLE_RATE))
+            samples += struct.pack('<h', value)
+        with wave.open(path + '.tmp', 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(CHIME_SAMPLE_RATE)
+            f.writeframes(bytes(samples))
+        os.replace(path + '.tmp', path)
+        return path
@@ -1,6 +1,15 @@
+import re
+import os
 import cv2
 import threading
 import time
+import subprocess
+import uuid
+import multiprocessing
+import numpy as np
+from core.frame_ring import SharedFrameRing
+from config.config import (FFMPEG_PATH, FFMPEG_OUTPUT_SIZE, FFMPEG_FPS, FFMPEG_PIX_FMT, SHARED_MEMORY_SLOTS,
+                           DUAL_STREAM_MAX_SKEW, DUAL_STREAM_MAIN_FPS)
 
 class ThreadedCamera:
     def __init__(self, src=0):
@@ -10,6 +19,8 @@ class ThreadedCamera:
         
         self.status = False
         self.frame = None
+        self.latest = (None, None) # (frame, capture time), swapped as one
+        self.frame_seq = 0 # Increments on every new frame
         self.stopped = False # Flag to stop the thread gracefully
         
         # Start the background thread
@@ -25,12 +36,20 @@ class ThreadedCamera:
                 if status:
                     self.status = status
                     self.frame = frame
+                    self.latest = (frame, time.time())
+                    self.frame_seq += 1
             # Tiny sleep to let other CPU tasks run
             time.sleep(0.01)
 
-    def read(self):
-        # Return the most recent frame found by the thread
+    def read(self, out=None):
+        # Return the most recent frame found by the thread (cv2 decodes every frame into a
+        # new array, so there is nothing to copy: `out` is only accepted for parity)
         return self.status, self.frame
+
+    def read_stamped(self, out=None):
+        """(status, frame, capture time)"""
+        frame, frame_time = self.latest
+        return self.status, frame, frame_time
     
     def isOpened(self):
         return self.capture.isOpened()
@@ -39,3 +58,350 @@ class ThreadedCamera:
         self.stopped = True
         self.thread.join()
         self.capture.release()
+
+
+def get_substream_url(url, subtype):
+    """Return the same RTSP URL pointing at another stream 'subtype' (0 = main, 1 = sub)"""
+    if isinstance(url, str) and 'subtype=' in url:
+        return re.sub(r'subtype=\d+', f'subtype={subtype}', url)
+    return url
+
+
+def probe_size(src):
+    """(width, height) of the first video stream, via the ffprobe next to FFMPEG_PATH. None if unknown."""
+    folder, name = os.path.split(FFMPEG_PATH)
+    cmd = [os.path.join(folder, name.replace('ffmpeg', 'ffprobe')), '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'stream=width,height', '-of', 'csv=p=0:s=x']
+    if str(src).startswith('rtsp'):
+        cmd += ['-rtsp_transport', 'tcp']
+    cmd.append(str(src))
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=15).stdout
+        width, height = (int(v) for v in out.strip().splitlines()[0].split('x')[:2])
+        return width, height
+    except (OSError, subprocess.SubprocessError, ValueError, IndexError):
+        return None
+
+
+class FFmpegCamera:
+    """
+    Reads raw frames from a local ffmpeg subprocess instead of cv2.VideoCapture.
+    Scaling, fps decimation and pixel format are done inside ffmpeg, and frames are
+    read from the pipe straight into a small ring of preallocated NumPy buffers
+    (no per-frame allocation). Works with RTSP URLs and local video files.
+    size=None keeps the stream's native resolution (and aspect ratio); fps=None keeps
+    every decoded frame; keyframes_only decodes nothing but keyframes (-skip_frame nokey).
+    read(out) copies the latest frame as BGR into the caller's buffer `out` (pass back the
+    frame it returned; a new one is allocated only on the first call or a size change).
+    The copy is the caller's: safe to keep and crop from until the next read() into it.
+    """
+    # The pipe fills one buffer while another is published; publishing waits for a
+    # read() copy in progress, so the buffer being copied is never the one being filled
+    NUM_BUFFERS = 3
+
+    def __init__(self, src, size=FFMPEG_OUTPUT_SIZE, fps=FFMPEG_FPS, pix_fmt=FFMPEG_PIX_FMT, keyframes_only=False):
+        self.src = src
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.keyframes_only = keyframes_only
+        self.lock = threading.Lock()
+
+        self.status = False
+        self.frame = None
+        self.frame_time = None
+        self.frame_seq = 0
+        self.stopped = False
+        self.process = None
+
+        self.scale = size is not None
+        size = size or probe_size(src)
+        if size is None:
+            print(f"Could not probe the resolution of {src}")
+            return
+        self.width, self.height = size
+
+        shape = (self.height, self.width) if pix_fmt == 'gray' else (self.height, self.width, 3)
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.NUM_BUFFERS)]
+        self.views = [memoryview(buf).cast('B') for buf in self.buffers]
+        self.frame_bytes = self.buffers[0].nbytes
+        self.write_index = 0
+
+        try:
+            self.process = subprocess.Popen(
+                self.build_command(),
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                bufsize=0
+            )
+        except OSError as e:
+            print(f"Could not start ffmpeg ({FFMPEG_PATH}): {e}")
+            self.process = None
+            return
+
+        self.thread = threading.Thread(target=self.update, args=())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def build_command(self):
+        src = str(self.src)
+        cmd = [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-nostdin']
+
+        if src.startswith('rtsp'):
+            # TCP avoids smeared frames from UDP packet loss; no input buffering for low latency
+            cmd += ['-rtsp_transport', 'tcp', '-fflags', 'nobuffer', '-flags', 'low_delay']
+        elif os.path.isfile(src):
+            # Local files: read at native speed like a live camera
+            cmd += ['-re']
+
+        if self.keyframes_only:
+            # The decoder skips every non-key frame: no decode cost for them at all
+            cmd += ['-skip_frame', 'nokey']
+
+        filters = []
+        if self.fps:
+            filters.append(f'fps={self.fps}')
+        if self.scale:
+            filters.append(f'scale={self.width}:{self.height}')
+        cmd += ['-i', src, '-an']
+        if filters:
+            cmd += ['-vf', ','.join(filters)]
+        if self.keyframes_only:
+            cmd += ['-vsync', '0'] # Pass keyframes through as they come, no frame duplication
+        cmd += [
+            '-pix_fmt', self.pix_fmt,
+            '-f', 'rawvideo',
+            'pipe:1'
+        ]
+        return cmd
+
+    def update(self):
+        """Thread worker: fill the next ring buffer, then publish it"""
+        while not self.stopped:
+            index = self.write_index
+            if not self._read_exact(self.views[index]):
+                # Stream ended or ffmpeg exited
+                self.status = False
+                return
+
+            with self.lock:
+                self.frame = self.buffers[index]
+                self.frame_time = time.time()
+                self.status = True
+                self.frame_seq += 1
+            self.write_index = (index + 1) % self.NUM_BUFFERS
+
+    def _read_exact(self, view):
+        pos = 0
+        while pos < self.frame_bytes:
+            n = self.process.stdout.readinto(view[pos:])
+            if not n:
+                return False
+            pos += n
+        return True
+
+    def read(self, out=None):
+        status, frame, _ = self.read_stamped(out)
+        return status, frame
+
+    def read_stamped(self, out=None):
+        """(status, frame copied into out, capture time)"""
+        with self.lock:
+            if self.frame is None:
+                return self.status, None, None
+            shape = (self.height, self.width, 3)
+            if out is None or out.shape != shape or out.dtype != np.uint8:
+                out = np.empty(shape, dtype=np.uint8)
+            if self.pix_fmt == 'gray':
+                # Detection, embedding and display all expect 3 channels
+                cv2.cvtColor(self.frame, cv2.COLOR_GRAY2BGR, dst=out)
+            else:
+                np.copyto(out, self.frame)
+            return self.status, out, self.frame_time
+
+    def isOpened(self):
+        return self.process is not None and (self.process.poll() is None or self.status)
+
+    def release(self):
+        self.stopped = True
+        if self.process is None:
+            return
+        self.process.kill()
+        self.process.wait()
+        self.thread.join(timeout=1.0)
+        self.process.stdout.close()
+
+
+class DualStreamCamera:
+    """
+    Same camera opened twice: the low-res substream for detection/tracking/display,
+    and the high-res main stream for face crops.
+    The main stream is delivered at main_fps (decimated inside ffmpeg), so at most one
+    full-resolution frame per 1 / main_fps seconds is scaled, piped and copied; with
+    main_fps=0 only keyframes are decoded (-skip_frame nokey), which is cheaper but
+    only matches when a keyframe happens to fall within max_skew. A main-stream frame is
+    only used for a crop if it was captured within max_skew seconds of the substream
+    frame the box came from; otherwise read_main() returns (False, None), the crop is
+    taken from the substream frame itself and the fallback is counted (get_stats()).
+    The main stream needs ffmpeg.
+    """
+    def __init__(self, detect_src, main_src, reader='opencv', max_skew=DUAL_STREAM_MAX_SKEW,
+                 main_fps=DUAL_STREAM_MAIN_FPS):
+        if reader == 'ffmpeg':
+            # Native substream size: FFMPEG_OUTPUT_SIZE would upscale it and bend its aspect ratio
+            self.detect_camera = FFmpegCamera(detect_src, size=None)
+        else:
+            self.detect_camera = ThreadedCamera(detect_src)
+
+        self.main_camera = FFmpegCamera(main_src, size=None, fps=main_fps or None, pix_fmt='bgr24',
+                                        keyframes_only=not main_fps)
+        if self.main_camera.process is None:
+            print("Main stream unavailable: face crops are taken from the substream")
+        if main_fps and 1.0 / main_fps > max_skew:
+            print(f"DUAL_STREAM_MAIN_FPS={main_fps} leaves gaps over DUAL_STREAM_MAX_SKEW={max_skew}s: "
+                  f"some face crops will come from the substream")
+        self.max_skew = max_skew
+        self.local = threading.local() # Per thread: capture time of the last read(), main-stream buffer
+        self.stats_lock = threading.Lock()
+        self.stats = {'main_crops': 0, 'fallbacks': 0}
+
+    @property
+    def frame_seq(self):
+        return self.detect_camera.frame_seq
+
+    def read(self, out=None):
+        # Substream frame: what detection, tracking and display run on
+        status, frame, frame_time = self.detect_camera.read_stamped(out)
+        self.local.frame_time = frame_time
+        return status, frame
+
+    def read_main(self):
+        """Latest main-stream frame, if it matches the substream frame this thread last read()"""
+        frame_time = getattr(self.local, 'frame_time', None)
+        main_time = self.main_camera.frame_time
+        if frame_time is None or main_time is None or abs(main_time - frame_time) > self.max_skew:
+            return self._fallback()
+        # Copy only when it will be used, into this thread's reused buffer
+        status, frame, main_time = self.main_camera.read_stamped(getattr(self.local, 'main_buffer', None))
+        if frame is None:
+            return self._fallback()
+        self.local.main_buffer = frame
+        if abs(main_time - frame_time) > self.max_skew:
+            return self._fallback()
+        with self.stats_lock:
+            self.stats['main_crops'] += 1
+        return True, frame
+
+    def _fallback(self):
+        with self.stats_lock:
+            self.stats['fallbacks'] += 1
+        return False, None
+
+    def get_stats(self):
+        """Crops taken from the main stream vs. substream fallbacks"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        total = stats['main_crops'] + stats['fallbacks']
+        stats['fallback_rate'] = stats['fallbacks'] / total if total else 0.0
+        return stats
+
+    def isOpened(self):
+        return self.detect_camera.isOpened()
+
+    def release(self):
+        stats = self.get_stats()
+        if stats['fallbacks']:
+            print(f"Dual stream: {stats['main_crops']} crops from the main stream, "
+                  f"{stats['fallbacks']} from the substream ({stats['fallback_rate']:.0%})")
+        self.main_camera.release()
+        self.detect_camera.release()
+
+
+def capture_to_ring(src, ring_name, reader, slots, ready_event, stop_event):
+    """
+    Capture process entry point: read frames from the camera and publish them
+    into a shared-memory ring named ring_name. Sets ready_event once the ring exists.
+    The ring's frame size is fixed by the first frame: if the stream changes resolution
+    later, frames are resized to it (a different channel count is dropped).
+    """
+    camera = FFmpegCamera(src) if reader == 'ffmpeg' and isinstance(src, str) else ThreadedCamera(src)
+    ring = None
+    last_seq = 0
+    resized = False
+    buffer = None
+    try:
+        while not stop_event.is_set():
+            if camera.frame_seq == last_seq:
+                time.sleep(0.005)
+                continue
+            status, frame = camera.read(out=buffer)
+            if not status or frame is None:
+                time.sleep(0.005)
+                continue
+            buffer = frame
+            last_seq = camera.frame_seq
+
+            if ring is None:
+                # Frame size is only known after the first decode
+                ring = SharedFrameRing(ring_name, shape=frame.shape, slots=slots, create=True)
+                ready_event.set()
+            if frame.shape != ring.frame_shape:
+                if frame.shape[2:] != ring.frame_shape[2:]:
+                    continue
+                if not resized:
+                    print(f"Capture {src}: stream is now {frame.shape[1]}x{frame.shape[0]}, "
+                          f"resizing to {ring.frame_shape[1]}x{ring.frame_shape[0]}")
+                    resized = True
+                frame = cv2.resize(frame, (ring.frame_shape[1], ring.frame_shape[0]))
+            ring.write(frame)
+    finally:
+        camera.release()
+        if ring is not None:
+            ring.close()
+
+
+class SharedMemoryCamera:
+    """
+    Runs capture in a separate process and reads frames from a shared-memory ring.
+    read(out) copies the newest frame out of the ring into the caller's buffer (pass back
+    the frame it returned: nothing is allocated per frame) and checks it was not overwritten
+    during the copy. The copy stays valid until the caller reads into it again.
+    """
+    def __init__(self, src=0, reader='opencv', slots=SHARED_MEMORY_SLOTS, timeout=10.0):
+        self.src = src
+        self.ring = None
+        self.frame_seq = 0
+
+        ring_name = f"cam_{uuid.uuid4().hex[:12]}"
+        self.ready_event = multiprocessing.Event()
+        self.stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=capture_to_ring,
+            args=(src, ring_name, reader, slots, self.ready_event, self.stop_event),
+            daemon=True
+        )
+        self.process.start()
+
+        if self.ready_event.wait(timeout):
+            self.ring = SharedFrameRing(ring_name)
+        else:
+            print(f"Capture process for {src} produced no frames within {timeout}s")
+
+    def read(self, out=None):
+        if self.ring is None:
+            return False, None
+        seq, frame = self.ring.read_copy(out=out)
+        if frame is None:
+            return False, None
+        self.frame_seq = seq
+        return True, frame
+
+    def isOpened(self):
+        return self.ring is not None and self.process.is_alive()
+
+    def release(self):
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -1,12 +1,14 @@
 import numpy as np
 import pickle
 import os
+import threading
 from insightface.app import FaceAnalysis
 
 # ADD THIS LINE at the top to import configuration variables
 from config.config import (
     SIMILARITY_THRESHOLD, FACE_DETECTION_MODEL, DETECTION_SIZE,
-    FACE_DETECTION_BACKEND, DNN_PROTO_PATH, DNN_MODEL_PATH, DNN_CONFIDENCE_THRESHOLD
+    FACE_DETECTION_BACKEND, DNN_PROTO_PATH, DNN_MODEL_PATH, DNN_CONFIDENCE_THRESHOLD,
+    GALLERY_SYNC_INTERVAL
 )
 
 class Face:
@@ -40,8 +42,19 @@ class FaceRecognitionHandler:
 
         self.db_manager = db_manager
         self.similarity_threshold = SIMILARITY_THRESHOLD 
+
+        # registered_faces is replaced, never mutated, so video threads can iterate it without locking
+        self.gallery_lock = threading.Lock()
+        self.gallery_version = self._current_gallery_version()
+        self.gallery_applied = set() # Change ids just below gallery_version already applied (empty: re-read them)
         self.registered_faces = self.load_face_encodings()
 
+        # Pick up persons added/edited/deleted by other processes (API server, second GUI)
+        self.sync_stop = threading.Event()
+        self.sync_thread = None
+        if GALLERY_SYNC_INTERVAL > 0:
+            self.start_gallery_sync(GALLERY_SYNC_INTERVAL)
+
 
 
 
@@ -110,18 +123,76 @@ class FaceRecognitionHandler:
     
     def add_face_encoding(self, person_id, name, face_encoding):
         """Add a face encoding to the in-memory database"""
-        self.registered_faces[person_id] = {
-            'name': name,
-            'encoding': face_encoding
-        }
+        with self.gallery_lock:
+            faces = dict(self.registered_faces)
+            faces[person_id] = {
+                'name': name,
+                'encoding': face_encoding
+            }
+            self.registered_faces = faces
         return True
     
     def remove_face_encoding(self, person_id):
         """Remove a face encoding from the database"""
-        if person_id in self.registered_faces:
-            del self.registered_faces[person_id]
-            return True
+        with self.gallery_lock:
+            if person_id in self.registered_faces:
+                faces = dict(self.registered_faces)
+                del faces[person_id]
+                self.registered_faces = faces
+                return True
         return False
+
+    # --- INCREMENTAL GALLERY SYNC ---
+
+    def _current_gallery_version(self):
+        try:
+            return self.db_manager.get_gallery_version()
+        except Exception as e:
+            print(f"Gallery Version Error: {e}")
+            return 0
+
+    def sync_gallery(self):
+        """
+        Apply persons changed since the last sync (by any process) without a full reload.
+        Returns: number of persons added/updated/removed
+        """
+        # Query without the lock: registration / deletion in this process aren't held up by the DB
+        current = self.registered_faces
+        dim = len(next(iter(current.values()))['encoding']) if current else None
+        version, upserts, deleted, applied = self.db_manager.get_gallery_changes(
+            self.gallery_version, dim, self.gallery_applied)
+
+        with self.gallery_lock:
+            self.gallery_version = max(self.gallery_version, version)
+            self.gallery_applied = applied
+            if not upserts and not deleted:
+                return 0
+
+            faces = dict(self.registered_faces) # Not `current`: may have changed while we queried
+            faces.update(upserts)
+            for person_id in deleted:
+                faces.pop(person_id, None)
+            self.registered_faces = faces
+
+        if upserts or deleted:
+            print(f"[GALLERY] Synced: {len(upserts)} added/updated, {len(deleted)} removed (version {version})")
+        return len(upserts) + len(deleted)
+
+    def start_gallery_sync(self, interval):
+        self.sync_stop.clear()
+        self.sync_thread = threading.Thread(target=self._gallery_sync_loop, args=(interval,), daemon=True)
+        self.sync_thread.start()
+
+    def stop_gallery_sync(self):
+        self.sync_stop.set()
+
+    def _gallery_sync_loop(self, interval):
+        while not self.sync_stop.wait(interval):
+            try:
+                self.sync_gallery()
+            except Exception as e:
+                # DB unreachable: keep the current gallery and retry next poll
+                print(f"Gallery Sync Error: {e}")
     
     def calculate_similarity(self, encoding1, encoding2):
         """Calculate cosine similarity between two face encodings"""
@@ -190,7 +261,11 @@ class FaceRecognitionHandler:
     
     def reload_face_encodings(self):
         """Reload face encodings from database"""
-        self.registered_faces = self.load_face_encodings()
+        with self.gallery_lock:
+            version = self._current_gallery_version()
+            self.registered_faces = self.load_face_encodings()
+            self.gallery_version = version
+            self.gallery_applied = set()
         return len(self.registered_faces)
     
     def update_similarity_threshold(self, new_threshold):
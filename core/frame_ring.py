@@ -0,0 +1,127 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+class SharedFrameRing:
+    """
+    Ring of fixed-size frames in multiprocessing.shared_memory, so capture,
+    inference and display can live in separate processes without pickling frames.
+
+    Layout: [int64 header][slot 0][slot 1]...
+      header[0]           latest published sequence number (0 = nothing yet)
+      header[1:4]         frame height, width, channels
+      header[4]           number of slots
+      header[5 + i]       sequence counter of slot i (seqlock: odd while being written)
+
+    One writer, any number of readers. read_latest() gives a zero-copy view that is
+    only valid while is_valid(slot, stamp) returns True; read_copy() copies the frame
+    out and re-checks the seqlock, so the copy is never torn.
+    """
+    HEADER_FIELDS = 5
+
+    def __init__(self, name, shape=None, slots=8, create=False):
+        if create:
+            height, width = shape[:2]
+            channels = shape[2] if len(shape) > 2 else 1
+            header_bytes = (self.HEADER_FIELDS + slots) * 8
+            size = header_bytes + slots * height * width * channels
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.header = np.ndarray((self.HEADER_FIELDS + slots,), dtype=np.int64, buffer=self.shm.buf)
+            self.header[:] = 0
+            self.header[1:5] = (height, width, channels, slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self._untrack()
+            fields = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            height, width, channels, slots = (int(v) for v in fields[1:5])
+            self.header = np.ndarray((self.HEADER_FIELDS + slots,), dtype=np.int64, buffer=self.shm.buf)
+
+        self.owner = create
+        self.name = self.shm.name
+        self.slots = slots
+        self.frame_shape = (height, width, channels) if channels > 1 else (height, width)
+        self.slot_seq = self.header[self.HEADER_FIELDS:]
+
+        offset = (self.HEADER_FIELDS + slots) * 8
+        frame_bytes = height * width * channels
+        self.frames = [
+            np.ndarray(self.frame_shape, dtype=np.uint8, buffer=self.shm.buf, offset=offset + i * frame_bytes)
+            for i in range(slots)
+        ]
+
+    def _untrack(self):
+        # Attaching processes must not unlink the segment when they exit (Python < 3.13)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    # --- WRITER ---
+
+    def write(self, frame):
+        """Copy a frame into the next slot and publish it. Returns its sequence number."""
+        seq = int(self.header[0]) + 1
+        slot = seq % self.slots
+
+        self.slot_seq[slot] = 2 * seq - 1   # Odd: slot is being written
+        np.copyto(self.frames[slot], frame.reshape(self.frame_shape))
+        self.slot_seq[slot] = 2 * seq       # Even: slot is stable
+        self.header[0] = seq
+        return seq
+
+    # --- READERS ---
+
+    def latest_seq(self):
+        return int(self.header[0])
+
+    def read_latest(self):
+        """
+        Zero-copy access to the newest complete frame.
+        Returns: (seq, slot, stamp, frame_view) or (0, None, None, None) if nothing is available.
+        """
+        seq = int(self.header[0])
+        if seq == 0:
+            return 0, None, None, None
+
+        slot = seq % self.slots
+        stamp = int(self.slot_seq[slot])
+        if stamp != 2 * seq:
+            # Writer already lapped us onto this slot; fall back to the previous frame
+            seq -= 1
+            if seq == 0:
+                return 0, None, None, None
+            slot = seq % self.slots
+            stamp = int(self.slot_seq[slot])
+            if stamp != 2 * seq:
+                return 0, None, None, None
+
+        return seq, slot, stamp, self.frames[slot]
+
+    def read_copy(self, out=None, retries=3):
+        """
+        Copy of the newest complete frame, verified against the slot's seqlock after
+        the copy (retried if the writer lapped us meanwhile).
+        Returns: (seq, frame) or (0, None)
+        """
+        for _ in range(retries):
+            seq, slot, stamp, view = self.read_latest()
+            if view is None:
+                return 0, None
+            if out is None or out.shape != view.shape:
+                out = np.empty_like(view)
+            np.copyto(out, view)
+            if self.is_valid(slot, stamp):
+                return seq, out
+        return 0, None
+
+    def is_valid(self, slot, stamp):
+        """True if the slot has not been overwritten since read_latest() returned it"""
+        return slot is not None and int(self.slot_seq[slot]) == stamp
+
+    def close(self):
+        self.frames = []
+        self.header = None
+        self.slot_seq = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
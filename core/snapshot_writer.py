@@ -0,0 +1,139 @@
+import os
+import time
+import queue
+import threading
+import cv2
+from config.config import (
+    UNKNOWN_SNAPSHOT_QUEUE_SIZE, UNKNOWN_SNAPSHOT_JPEG_QUALITY, UNKNOWN_SNAPSHOT_MAX_SIZE,
+    UNKNOWN_DB_BATCH_SIZE, UNKNOWN_DB_FLUSH_INTERVAL, UNKNOWN_DB_MAX_PENDING
+)
+
+class SnapshotWriter:
+    """
+    Background pipeline for unknown faces.
+    The video thread only enqueues (crop, encoding); JPEG encoding, disk writes
+    and batched DB inserts all happen on a single worker thread.
+    When the queue is full new work is dropped (counted) instead of blocking video.
+    """
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.queue = queue.Queue(maxsize=UNKNOWN_SNAPSHOT_QUEUE_SIZE)
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), UNKNOWN_SNAPSHOT_JPEG_QUALITY]
+
+        # Rows waiting for the next DB batch: [(snapshot_path, face_encoding)]
+        self.pending_rows = []
+        self.last_flush_time = time.time()
+
+        # Counters (read by UI/CLI; video threads and the worker both update them)
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'queued': 0,
+            'dropped': 0,        # Queue full, snapshot never written
+            'written': 0,        # JPEG files saved
+            'write_errors': 0,
+            'db_rows': 0,        # Rows inserted
+            'db_batches': 0,     # INSERT round trips
+            'db_dropped': 0,     # Rows discarded because DB could not keep up
+            'db_errors': 0,
+        }
+
+        self.stopped = False
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def submit(self, filepath, face_crop, face_encoding):
+        """
+        Non-blocking. Returns False if the snapshot was dropped.
+        The crop is copied because the caller's frame buffer is reused.
+        """
+        try:
+            self.queue.put_nowait((filepath, face_crop.copy(), face_encoding))
+            self._count('queued')
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+
+    def _count(self, key, n=1):
+        with self.stats_lock:
+            self.stats[key] += n
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['pending_rows'] = len(self.pending_rows)
+        return stats
+
+    def stop(self, timeout=2.0):
+        """Flush what we can and stop the worker"""
+        self.stopped = True
+        self.thread.join(timeout=timeout)
+
+    # --- WORKER ---
+
+    def _worker(self):
+        while not self.stopped or not self.queue.empty():
+            try:
+                filepath, face_crop, face_encoding = self.queue.get(timeout=0.5)
+                if self._write_snapshot(filepath, face_crop):
+                    self._add_row(filepath, face_encoding)
+            except queue.Empty:
+                pass
+
+            if self.pending_rows and (
+                len(self.pending_rows) >= UNKNOWN_DB_BATCH_SIZE or
+                time.time() - self.last_flush_time >= UNKNOWN_DB_FLUSH_INTERVAL or
+                self.stopped
+            ):
+                self._flush_rows()
+
+    def _write_snapshot(self, filepath, face_crop):
+        try:
+            h, w = face_crop.shape[:2]
+            longest = max(h, w)
+            if UNKNOWN_SNAPSHOT_MAX_SIZE and longest > UNKNOWN_SNAPSHOT_MAX_SIZE:
+                scale = UNKNOWN_SNAPSHOT_MAX_SIZE / float(longest)
+                face_crop = cv2.resize(face_crop, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                       interpolation=cv2.INTER_AREA)
+
+            ok, buf = cv2.imencode('.jpg', face_crop, self.encode_params)
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+
+            os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+            with open(filepath, 'wb') as f:
+                f.write(buf.tobytes())
+            self._count('written')
+            return True
+        except Exception as e:
+            self._count('write_errors')
+            print(f"Snapshot Write Error: {e}")
+            return False
+
+    def _add_row(self, filepath, face_encoding):
+        self.pending_rows.append((filepath, face_encoding))
+
+        # DB is behind: keep the newest rows, count what we shed
+        overflow = len(self.pending_rows) - UNKNOWN_DB_MAX_PENDING
+        if overflow > 0:
+            del self.pending_rows[:overflow]
+            self._count('db_dropped', overflow)
+
+    def _flush_rows(self):
+        batch = self.pending_rows[:UNKNOWN_DB_BATCH_SIZE]
+        self.last_flush_time = time.time()
+        try:
+            ok = self.db_manager.log_unknown_persons_batch(batch)
+        except Exception as e:
+            print(f"Unknown Batch Error: {e}")
+            ok = False
+
+        if ok:
+            del self.pending_rows[:len(batch)]
+            with self.stats_lock:
+                self.stats['db_rows'] += len(batch)
+                self.stats['db_batches'] += 1
+        else:
+            # Rows stay pending and are retried on the next flush interval
+            self._count('db_errors')
@@ -70,6 +70,14 @@ class Utils:
         except:
             return "Error"
     
+    @staticmethod
+    def format_duration(seconds):
+        """Worked seconds (attendance_daily) -> "Xh Ym" like calculate_duration"""
+        if not seconds:
+            return "N/A"
+        seconds = int(seconds)
+        return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+    
     @staticmethod
     def get_date_range(days_back=7):
         """Get date range for the last N days"""
@@ -137,7 +145,7 @@ class Utils:
                 'arrival_time': record[3],
                 'leaving_time': record[4],
                 'status': record[5],
-                'duration': Utils.calculate_duration(record[3], record[4])
+                'duration': Utils.format_duration(record[6])
             })
         
         return report
@@ -229,13 +237,11 @@ class Utils:
             
             person_attendance[person_id]['days_present'] += 1
             
-            # Calculate hours if both times available
-            if record[3] and record[4]:
-                duration = Utils.calculate_duration(record[3], record[4])
-                if 'h' in duration:
-                    hours = int(duration.split('h')[0])
-                    person_attendance[person_id]['total_hours'] += hours
+            # Worked seconds are precomputed in attendance_daily
+            person_attendance[person_id]['total_hours'] += record[6] / 3600
         
+        for summary in person_attendance.values():
+            summary['total_hours'] = round(summary['total_hours'], 1)
         return person_attendance
     
     @staticmethod
@@ -251,7 +257,7 @@ class Utils:
             ])
             
             for record in records:
-                duration = Utils.calculate_duration(record[3], record[4])
+                duration = Utils.format_duration(record[6])
                 writer.writerow([
                     record[0], record[1], record[2], 
                     record[3] or 'N/A', 
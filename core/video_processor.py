@@ -40,9 +40,12 @@ class VideoProcessor:
         self.tracker_id_to_person = {}
         self.logged_unknown_ids = set()
 
-    def process_frame(self, frame, mark_attendance_callback=None, unknown_person_callback=None):
+    def process_frame(self, frame, mark_attendance_callback=None, unknown_person_callback=None, hires_reader=None):
         """
         Process a single frame for Face Recognition and Tracking.
+        hires_reader: optional callable returning (ret, frame) from the camera's main stream.
+        When given, `frame` is treated as the low-res substream (no resize) and face crops
+        are taken from the high-res frame with coordinates mapped between the two.
         Returns: (detections, labels, faces, messages)
         """
         from config.config import PROCESS_EVERY_N_FRAMES, RESIZE_FACTOR, SHOW_DETECTION_SCORE
@@ -55,20 +58,36 @@ class VideoProcessor:
         
         self.frame_count += 1
         
+        # Substream frames are already small: detect on them as-is
+        resize_factor = 1.0 if hires_reader else RESIZE_FACTOR
+        
+        # Main-stream frame is fetched lazily, at most once per call
+        hires = {}
+        def get_hires_frame():
+            if hires_reader is None: return None
+            if 'frame' not in hires:
+                ret, hires_frame = hires_reader()
+                hires['frame'] = hires_frame if ret else None
+            return hires['frame']
+        
         # --- PROCESS EVERY Nth FRAME ---
         if self.frame_count % PROCESS_EVERY_N_FRAMES == 0:
             
             # 1. Resize for faster inference
-            small_frame = cv2.resize(frame, (0, 0), fx=RESIZE_FACTOR, fy=RESIZE_FACTOR)
+            if resize_factor != 1.0:
+                small_frame = cv2.resize(frame, (0, 0), fx=resize_factor, fy=resize_factor)
+            else:
+                small_frame = frame
             
             # 2. Detect faces on small frame
             faces = self.face_handler.detect_faces(small_frame)
             
             # 3. Scale back coordinates to original size
-            for face in faces:
-                face.bbox = face.bbox / RESIZE_FACTOR
-                if hasattr(face, 'kps') and face.kps is not None:
-                    face.kps = face.kps / RESIZE_FACTOR
+            if resize_factor != 1.0:
+                for face in faces:
+                    face.bbox = face.bbox / resize_factor
+                    if hasattr(face, 'kps') and face.kps is not None:
+                        face.kps = face.kps / resize_factor
             
             self.last_faces = faces
             
@@ -145,11 +164,7 @@ class VideoProcessor:
                         # --- HYBRID BACKEND SUPPORT ---
                         # If detecting with OpenCV DNN, embedding is None. We must extract it now.
                         if best_face.embedding is None:
-                            x1, y1, x2, y2 = map(int, best_face.bbox)
-                            h, w = frame.shape[:2]
-                            x1, y1 = max(0, x1), max(0, y1)
-                            x2, y2 = min(w, x2), min(h, y2)
-                            face_crop = frame[y1:y2, x1:x2]
+                            face_crop = self.crop_face(frame, best_face.bbox, get_hires_frame())
                             
                             if face_crop.size > 0:
                                 emb, _ = self.face_handler.extract_face_encoding(face_crop)
@@ -181,19 +196,12 @@ class VideoProcessor:
                                     filename = f"unknown_{timestamp}.jpg"
                                     filepath = os.path.join(UNKNOWN_FACES_DIR, filename)
                                     
-                                    # Save the face crop
-                                    x1, y1, x2, y2 = map(int, current_bbox)
-                                    h, w, _ = frame.shape
-                                    x1, y1 = max(0, x1), max(0, y1)
-                                    x2, y2 = min(w, x2), min(h, y2)
-                                    
-                                    face_crop = frame[y1:y2, x1:x2]
+                                    # Save the face crop (from main stream if available)
+                                    face_crop = self.crop_face(frame, current_bbox, get_hires_frame())
                                     
                                     if face_crop.size > 0:
-                                        cv2.imwrite(filepath, face_crop)
-                                        
-                                        # 2. Log to DB
-                                        unknown_person_callback(filepath, best_face.embedding)
+                                        # 2. Hand off to the background writer (JPEG + DB batch)
+                                        unknown_person_callback(filepath, best_face.embedding, face_crop)
                                         self.logged_unknown_ids.add(tracker_id)
                                         messages.append(f"Logged Unknown Person #{tracker_id}")
                         else:
@@ -223,6 +231,59 @@ class VideoProcessor:
         
         return annotated_frame
     
+    def annotate_for_display(self, frame, detections, labels, faces, size=(640, 480), out=None):
+        """
+        Display path: downsize first (into the reusable `out` buffer), then draw
+        boxes/landmarks scaled to the small frame. Cost follows the display size,
+        not the camera resolution. Returns the buffer so callers can pass it back.
+        """
+        width, height = size
+        if out is None or out.shape[:2] != (height, width):
+            out = np.empty((height, width, 3), dtype=np.uint8)
+        
+        cv2.resize(frame, (width, height), dst=out, interpolation=cv2.INTER_LINEAR)
+        sx = width / float(frame.shape[1])
+        sy = height / float(frame.shape[0])
+        
+        # Annotate boxes and labels (in place, no frame copy)
+        if detections is not None and len(detections) > 0:
+            scaled = sv.Detections(
+                xyxy=detections.xyxy * np.array([sx, sy, sx, sy]),
+                confidence=detections.confidence,
+                class_id=detections.class_id,
+                tracker_id=detections.tracker_id
+            )
+            self.box_annotator.annotate(scene=out, detections=scaled, labels=labels)
+        
+        # Draw landmarks
+        for face in faces or []:
+            if hasattr(face, 'kps') and face.kps is not None:
+                for point in face.kps:
+                    cv2.circle(out, (int(point[0] * sx), int(point[1] * sy)), 2, (0, 255, 0), -1)
+        
+        return out
+    
+    def crop_face(self, frame, bbox, hires_frame=None):
+        """
+        Crop bbox (given in `frame` coordinates).
+        If a high-res frame of the same scene is given, the box is mapped onto it
+        and the crop is taken from there instead.
+        """
+        x1, y1, x2, y2 = bbox[:4]
+        source = frame
+        
+        if hires_frame is not None:
+            sx = hires_frame.shape[1] / float(frame.shape[1])
+            sy = hires_frame.shape[0] / float(frame.shape[0])
+            x1, x2 = x1 * sx, x2 * sx
+            y1, y2 = y1 * sy, y2 * sy
+            source = hires_frame
+        
+        h, w = source.shape[:2]
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(w, int(x2)), min(h, int(y2))
+        return source[y1:y2, x1:x2]
+    
     def calculate_iou(self, boxA, boxB):
         xA = max(boxA[0], boxB[0])
         yA = max(boxA[1], boxB[1])
@@ -242,7 +303,7 @@ class VideoProcessor:
         return frame
     
     def draw_info_panel(self, frame, info_dict):
-        panel_height = 80
+        panel_height = 25 * len(info_dict) + 10 # One line per entry
         panel = np.zeros((panel_height, frame.shape[1], 3), dtype=np.uint8)
         panel[:] = (40, 40, 40)
         y_offset = 25
@@ -1,24 +1,281 @@
-import pyttsx3
+import time
+import heapq
+import itertools
 import threading
+from collections import deque
+import pyttsx3
+from core.audio_cache import AudioCache, create_player
+from config.config import (VOICE_RATE, VOICE_VOLUME, VOICE_QUEUE_SIZE, VOICE_MAX_AGE_SECONDS,
+                           VOICE_COALESCE_MAX_NAMES, VOICE_PRERENDER, VOICE_PLAYER, VOICE_AUDIO_CACHE_DIR)
+
+# Lower value = spoken first
+PRIORITY_ALERT = 0
+PRIORITY_GREETING = 1
+PRIORITY_INFO = 2
+
+# kind -> (names part, fixed part)
+GREETINGS = {
+    'welcome': ("Welcome, {names}.", "Login Successful."),
+    'goodbye': ("Goodbye, {names}.", "Logout Updated."),
+}
+
+UNKNOWN_PERSON_PHRASE = "Unknown person detected."
+FIXED_PHRASES = [UNKNOWN_PERSON_PHRASE] # Rendered when the worker starts
+
+
+def join_names(names):
+    """['A', 'B', 'C'] -> 'A, B and C'"""
+    return names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+def greeting_phrases(name):
+    """Every single-person greeting for name, exactly as greet() renders it"""
+    return [Utterance(PRIORITY_GREETING, kind=kind, names=[name]).render() for kind in GREETINGS]
+
+
+class Utterance:
+    __slots__ = ('priority', 'created', 'text', 'kind', 'names', 'chime')
+
+    def __init__(self, priority, text=None, kind=None, names=None, chime=False):
+        self.priority = priority
+        self.chime = chime
+        self.created = time.time()
+        self.text = text
+        self.kind = kind
+        self.names = names or []
+
+    def render(self):
+        if self.kind is None:
+            return self.text
+        names_part, fixed = GREETINGS[self.kind]
+        return f"{names_part.format(names=join_names(self.names))} {fixed}"
+
 
 class VoiceSystem:
-    def __init__(self):
-        # We don't initialize the engine here to avoid threading conflicts.
-        # We initialize it inside the thread every time we speak.
-        pass
+    """
+    One long-lived speech worker. The pyttsx3 engine is created once, on the worker thread
+    (engines are tied to the thread that created them), and utterances wait in a bounded
+    priority queue (alerts before greetings):
+      - greet(): a greeting of the same kind still waiting absorbs the new name
+        ("Welcome, A, B and C. Login Successful.")
+      - speak(): an identical phrase still waiting is not queued twice
+      - anything older than max_age when its turn comes is dropped, not spoken late
+      - when full, the oldest utterance of the lowest priority makes room
+
+    With prerender, phrases given to prerender() (and FIXED_PHRASES) are synthesized to
+    the audio cache while nothing is waiting to be said; a rendered phrase is then only
+    played back. Merged greetings ("A, B and C") are not rendered ahead and use live TTS.
+    prune_cache() drops rendered files for phrases no longer asked for (renamed or deleted
+    persons); call it once every current phrase has gone through prerender().
+    """
+    def __init__(self, rate=VOICE_RATE, volume=VOICE_VOLUME, max_queue=VOICE_QUEUE_SIZE,
+                 max_age=VOICE_MAX_AGE_SECONDS, coalesce_max=VOICE_COALESCE_MAX_NAMES,
+                 prerender=VOICE_PRERENDER, player=VOICE_PLAYER, cache_dir=VOICE_AUDIO_CACHE_DIR):
+        self.rate = rate
+        self.volume = volume
+        self.max_queue = max_queue
+        self.max_age = max_age
+        self.coalesce_max = coalesce_max
+        self.cond = threading.Condition()
+        self.heap = [] # (priority, seq, Utterance)
+        self.seq = itertools.count()
+        self.player = create_player(player) if prerender else None
+        self.cache = None
+        if self.player:
+            try:
+                self.cache = AudioCache(cache_dir)
+            except OSError as e:
+                print(f"Voice Error: {e}") # No cache folder: live TTS only
+                self.player = None
+        self.chime_path = None
+        self.renders = deque() # Phrases to render when idle
+        self.render_set = set()
+        self.phrases = set(FIXED_PHRASES) # Everything given to prerender(), kept by prune_cache()
+        self.prune_due = False
+        self.stats = {
+            'queued': 0,
+            'spoken': 0,        # Live TTS
+            'played': 0,        # From the audio cache
+            'rendered': 0,
+            'pruned': 0,        # Stale cache files removed
+            'coalesced': 0,     # Merged into an utterance already waiting
+            'dropped_full': 0,
+            'dropped_stale': 0,
+            'errors': 0,
+        }
+        self.stopped = False
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    # --- PRODUCERS (any thread, never block) ---
+
+    def speak(self, text, priority=PRIORITY_INFO):
+        """Queue a phrase. Returns False if it was dropped."""
+        with self.cond:
+            for _, _, waiting in self.heap:
+                if waiting.kind is None and waiting.text == text:
+                    waiting.created = time.time()
+                    self.stats['coalesced'] += 1
+                    return True
+            return self._push(Utterance(priority, text=text))
 
-    def speak(self, text):
-        """Public method to trigger speech without freezing the app"""
-        threading.Thread(target=self._speak_thread, args=(text,), daemon=True).start()
+    def alert(self, text=UNKNOWN_PERSON_PHRASE):
+        """Chime, then text, ahead of any greeting"""
+        with self.cond:
+            return self._push(Utterance(PRIORITY_ALERT, text=text, chime=True))
 
-    def _speak_thread(self, text):
-        """Internal thread logic"""
+    def prerender(self, texts):
+        """Render texts to the audio cache in the background (no-op without a player)"""
+        if self.cache is None:
+            return
+        with self.cond:
+            for text in texts:
+                self.phrases.add(text)
+                if text not in self.render_set:
+                    self.render_set.add(text)
+                    self.renders.append(text)
+            self.cond.notify()
+
+    def prune_cache(self):
+        """Remove cached files for phrases never given to prerender() (on the worker, no-op without a cache)"""
+        if self.cache is None:
+            return
+        with self.cond:
+            self.prune_due = True
+            self.cond.notify()
+
+    def greet(self, kind, name):
+        """Queue a 'welcome' / 'goodbye' greeting for name, merged with one already waiting"""
+        with self.cond:
+            for _, _, waiting in self.heap:
+                if waiting.kind == kind and len(waiting.names) < self.coalesce_max:
+                    if name not in waiting.names:
+                        waiting.names.append(name)
+                    waiting.created = time.time() # Age counts from the latest name
+                    self.stats['coalesced'] += 1
+                    return True
+            return self._push(Utterance(PRIORITY_GREETING, kind=kind, names=[name]))
+
+    def _push(self, utterance):
+        """Caller holds self.cond"""
+        if len(self.heap) >= self.max_queue:
+            lowest = max(priority for priority, _, _ in self.heap)
+            if utterance.priority > lowest:
+                self.stats['dropped_full'] += 1
+                return False
+            victim = min((entry for entry in self.heap if entry[0] == lowest), key=lambda entry: entry[1])
+            self.heap.remove(victim)
+            heapq.heapify(self.heap)
+            self.stats['dropped_full'] += 1
+        heapq.heappush(self.heap, (utterance.priority, next(self.seq), utterance))
+        self.stats['queued'] += 1
+        self.cond.notify()
+        return True
+
+    # --- WORKER ---
+
+    def _init_engine(self):
         try:
             engine = pyttsx3.init()
-            engine.setProperty('rate', 230)  # Speed (Default is usually 200)
-            engine.setProperty('volume', 1.0) # Volume (0.0 to 1.0)
-            
+            engine.setProperty('rate', self.rate)
+            engine.setProperty('volume', self.volume)
+        except Exception as e:
+            print(f"Voice Error: {e}")
+            return None
+        if self.cache is not None:
+            self.cache.configure(self.rate, self.volume, engine.getProperty('voice'))
+            try:
+                self.chime_path = self.cache.chime()
+            except OSError as e:
+                print(f"Voice Error: {e}")
+            self.prerender(FIXED_PHRASES)
+        return engine
+
+    def _worker(self):
+        engine = self._init_engine()
+        while True:
+            utterance = None
+            with self.cond:
+                while not self.heap and not ((self.renders or self.prune_due) and engine) and not self.stopped:
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                keep = None
+                if self.heap: # Announcements always go before rendering
+                    _, _, utterance = heapq.heappop(self.heap)
+                elif self.prune_due:
+                    self.prune_due = False
+                    keep = list(self.phrases)
+                else:
+                    text = self.renders.popleft()
+                    self.render_set.discard(text)
+
+            if keep is not None:
+                self._prune(keep)
+                continue
+            if utterance is None:
+                self._render(engine, text)
+                continue
+            if time.time() - utterance.created > self.max_age:
+                self.stats['dropped_stale'] += 1
+                continue
+            self._say(engine, utterance)
+
+    def _render(self, engine, text):
+        if self.cache.lookup(text):
+            return
+        try:
+            self.cache.render(engine, text)
+            self.stats['rendered'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Voice Error: {e}")
+
+    def _prune(self, keep):
+        try:
+            removed = self.cache.prune(keep)
+        except OSError as e:
+            print(f"Voice Error: {e}")
+            return
+        self.stats['pruned'] += removed
+        if removed:
+            print(f"[VOICE] Removed {removed} stale cached phrase(s)")
+
+    def _say(self, engine, utterance):
+        text = utterance.render()
+        if self.player is not None:
+            path = self.cache.lookup(text) if engine else None
+            try:
+                if utterance.chime and self.chime_path:
+                    self.player.play(self.chime_path)
+                if path:
+                    self.player.play(path)
+                    self.stats['played'] += 1
+                    return
+            except Exception as e:
+                print(f"Voice Error: {e}") # Fall back to live speech
+        if engine is None:
+            self.stats['errors'] += 1
+            return
+        try:
             engine.say(text)
             engine.runAndWait()
+            self.stats['spoken'] += 1
         except Exception as e:
-            print(f"Voice Error: {e}")
\ No newline at end of file
+            self.stats['errors'] += 1
+            print(f"Voice Error: {e}")
+
+    def get_stats(self):
+        with self.cond:
+            stats = dict(self.stats)
+            stats['queue_depth'] = len(self.heap)
+            stats['render_backlog'] = len(self.renders)
+        return stats
+
+    def stop(self, timeout=2.0):
+        """Drop what is still waiting and end the worker (the current utterance finishes)"""
+        with self.cond:
+            self.stopped = True
+            self.heap.clear()
+            self.cond.notify()
+        self.thread.join(timeout=timeout)
@@ -0,0 +1,96 @@
+"""
+attendance_daily: one precomputed row per attendance row, with the figures reports need
+(worked seconds, late / early flags) and the shift they were judged against.
+
+Kept current by DatabaseManager._write_attendance (same transaction as the attendance
+upsert, so also for journal replays) and by the API's attendance edits; deleted rows go
+with their attendance row (foreign key). Rebuild a range (or everything) with:
+    python -m database.aggregates                               # all dates
+    python -m database.aggregates --from 2025-01-01 --to 2025-12-31
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.config import AGGREGATE_BACKFILL_DAYS, MIGRATION_BATCH_PAUSE
+
+
+def _refresh_sql(backend, where):
+    """INSERT ... SELECT upsert recomputing attendance_daily for the attendance rows matching `where`"""
+    sec = backend.time_seconds
+    arrival, leaving = sec('a.arrival_time'), sec('a.leaving_time')
+    new = backend.excluded
+    columns = ('arrival_time', 'leaving_time', 'status', 'worked_seconds', 'is_late', 'is_early',
+               'shift_start', 'shift_end')
+    return f'''
+        INSERT INTO attendance_daily (person_id, date, {', '.join(columns)})
+        SELECT a.person_id, a.date, a.arrival_time, a.leaving_time, a.status,
+               CASE WHEN {leaving} > {arrival} THEN {leaving} - {arrival} ELSE 0 END,
+               CASE WHEN {arrival} > {sec('p.shift_start')} THEN 1 ELSE 0 END,
+               CASE WHEN {leaving} < {sec('p.shift_end')} THEN 1 ELSE 0 END,
+               p.shift_start, p.shift_end
+        FROM attendance a JOIN persons p ON p.person_id = a.person_id
+        WHERE {where}
+        {backend.upsert(['person_id', 'date'])}
+            {', '.join(f'{col} = {new(col)}' for col in columns)}
+    '''
+
+
+def refresh_attendance_daily(cursor, backend, where, params):
+    """
+    Recompute the aggregate rows for attendance rows matching `where` (alias `a`),
+    inside the caller's transaction.
+    """
+    cursor.execute(_refresh_sql(backend, where), params)
+
+
+def backfill_attendance_daily(db_manager, start_date=None, end_date=None,
+                              step_days=AGGREGATE_BACKFILL_DAYS, pause=MIGRATION_BATCH_PAUSE):
+    """
+    (Re)build attendance_daily from attendance in date chunks of step_days, one short
+    transaction each. Defaults to the whole attendance table. Returns rows written.
+    """
+    conn = db_manager.get_connection()
+    try:
+        cursor = conn.cursor()
+        if not (start_date and end_date):
+            cursor.execute('SELECT MIN(date), MAX(date) FROM attendance')
+            first, last = cursor.fetchone()
+            if first is None:
+                return 0
+            start_date = start_date or str(first)
+            end_date = end_date or str(last)
+
+        day = date.fromisoformat(str(start_date))
+        last_day = date.fromisoformat(str(end_date))
+        written = 0
+        while day <= last_day:
+            chunk_end = min(day + timedelta(days=step_days - 1), last_day)
+            refresh_attendance_daily(cursor, db_manager.backend, 'a.date BETWEEN %s AND %s',
+                                     (day.isoformat(), chunk_end.isoformat()))
+            written += max(cursor.rowcount, 0)
+            conn.commit()
+            day = chunk_end + timedelta(days=1)
+            time.sleep(pause) # Let live writes in between chunks
+        print(f"[AGGREGATES] ✓ attendance_daily rebuilt for {start_date} .. {end_date}")
+        return written
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the attendance_daily aggregate table")
+    parser.add_argument('--from', dest='start_date', help="First date (YYYY-MM-DD), default: earliest row")
+    parser.add_argument('--to', dest='end_date', help="Last date (YYYY-MM-DD), default: latest row")
+    args = parser.parse_args()
+
+    from database.database import DatabaseManager
+    backfill_attendance_daily(DatabaseManager(), args.start_date, args.end_date)
+
+
+if __name__ == "__main__":
+    main()
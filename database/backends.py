@@ -0,0 +1,572 @@
+"""
+Storage backends for DatabaseManager.
+
+DatabaseManager's SQL is written once, with %s placeholders. A backend supplies connections,
+its schema, its exception types and the few dialect fragments that differ between engines.
+Selected with DB_BACKEND in config:
+    'mysql'  - shared server (MYSQL_CONFIG), pooled connections, offline journal + circuit breaker
+    'sqlite' - embedded file (SQLITE_PATH) in WAL mode: no server or network round trips,
+               for single-door edge nodes and as the test backend
+"""
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from datetime import datetime, date
+from config.config import DB_BACKEND, MYSQL_CONFIG, SQLITE_PATH
+
+# --- MYSQL ---
+
+# Also created by migration 006 on databases whose attendance.date was VARCHAR
+# (the foreign key needs the migrated DATE column)
+ATTENDANCE_DAILY_MYSQL = '''
+    CREATE TABLE IF NOT EXISTS attendance_daily (
+        person_id VARCHAR(50) NOT NULL,
+        date DATE NOT NULL,
+        arrival_time TIME,
+        leaving_time TIME,
+        status VARCHAR(20),
+        worked_seconds INT NOT NULL DEFAULT 0,
+        is_late TINYINT NOT NULL DEFAULT 0,
+        is_early TINYINT NOT NULL DEFAULT 0,
+        shift_start VARCHAR(10),
+        shift_end VARCHAR(10),
+        PRIMARY KEY (person_id, date),
+        FOREIGN KEY (person_id, date) REFERENCES attendance (person_id, date) ON DELETE CASCADE,
+        INDEX idx_attendance_daily_date (date)
+    )
+'''
+
+MYSQL_SCHEMA = [
+    # 1. Persons Table (With Shift Columns)
+    ('persons', ['''
+        CREATE TABLE IF NOT EXISTS persons (
+            person_id VARCHAR(50) PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(100),
+            department VARCHAR(100),
+            shift_start VARCHAR(10) DEFAULT '09:00',
+            shift_end VARCHAR(10) DEFAULT '18:00',
+            registered_date VARCHAR(30) NOT NULL,
+            embedding BLOB,
+            embedding_dim SMALLINT,
+            embedding_model VARCHAR(64)
+        )
+    ''']),
+    # 2. Attendance Summary
+    ('attendance', ['''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            person_id VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            arrival_time TIME,
+            leaving_time TIME,
+            status VARCHAR(20) DEFAULT 'Present',
+            FOREIGN KEY (person_id) REFERENCES persons (person_id) ON DELETE CASCADE,
+            UNIQUE KEY unique_attendance (person_id, date),
+            INDEX idx_attendance_date (date)
+        )
+    ''']),
+    # 3. Daily attendance aggregate, maintained with the attendance upsert (database/aggregates.py)
+    ('attendance_daily', [ATTENDANCE_DAILY_MYSQL]),
+    # 4. Raw Logs (With Name Column)
+    ('face_logs', ['''
+        CREATE TABLE IF NOT EXISTS face_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            person_id VARCHAR(50),
+            name VARCHAR(100),
+            date DATE,
+            time TIME,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            event_uid CHAR(32),
+            FOREIGN KEY (person_id) REFERENCES persons(person_id) ON DELETE CASCADE,
+            INDEX idx_face_logs_person_ts (person_id, timestamp),
+            INDEX idx_face_logs_date (date),
+            UNIQUE KEY uq_face_logs_event_uid (event_uid)
+        )
+    ''']),
+    # 5. Unknown Faces Table
+    ('unknown_faces', ['''
+        CREATE TABLE IF NOT EXISTS unknown_faces (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            snapshot_path VARCHAR(255),
+            embedding BLOB,
+            embedding_dim SMALLINT,
+            embedding_model VARCHAR(64),
+            event_uid CHAR(32),
+            INDEX idx_unknown_faces_ts (timestamp),
+            UNIQUE KEY uq_unknown_faces_event_uid (event_uid)
+        )
+    ''']),
+    # 6. Presence intervals: consecutive sightings of a person on one camera (database/presence.py)
+    ('presence_intervals', ['''
+        CREATE TABLE IF NOT EXISTS presence_intervals (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            interval_uid CHAR(32) NOT NULL,
+            person_id VARCHAR(50) NOT NULL,
+            name VARCHAR(100),
+            camera_id VARCHAR(50) NOT NULL DEFAULT '',
+            date DATE NOT NULL,
+            start_time DATETIME NOT NULL,
+            end_time DATETIME NOT NULL,
+            sightings INT NOT NULL DEFAULT 1,
+            FOREIGN KEY (person_id) REFERENCES persons (person_id) ON DELETE CASCADE,
+            UNIQUE KEY uq_presence_interval_uid (interval_uid),
+            INDEX idx_presence_person_start (person_id, start_time),
+            INDEX idx_presence_date (date)
+        )
+    ''']),
+    # 7. Daily per-person rollup of face_logs / presence_intervals kept after retention (database/maintenance.py)
+    ('presence_daily', ['''
+        CREATE TABLE IF NOT EXISTS presence_daily (
+            person_id VARCHAR(50) NOT NULL,
+            date DATE NOT NULL,
+            first_seen TIME,
+            last_seen TIME,
+            log_rows INT NOT NULL DEFAULT 0,
+            intervals INT NOT NULL DEFAULT 0,
+            sightings INT NOT NULL DEFAULT 0,
+            seconds_on_site INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (person_id, date),
+            FOREIGN KEY (person_id) REFERENCES persons (person_id) ON DELETE CASCADE,
+            INDEX idx_presence_daily_date (date)
+        )
+    ''']),
+    # 8. Person change log (incremental gallery sync between processes)
+    ('person_changes', ['''
+        CREATE TABLE IF NOT EXISTS person_changes (
+            change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            person_id VARCHAR(50) NOT NULL,
+            op VARCHAR(10) NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''']),
+    # 9. Alerts already sent (core/alerts.py): one row per person, kind and day ('' = whole-day digest)
+    ('alert_log', ['''
+        CREATE TABLE IF NOT EXISTS alert_log (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(20) NOT NULL,
+            person_id VARCHAR(50) NOT NULL DEFAULT '',
+            date DATE NOT NULL,
+            sent_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            claim_token CHAR(32) NULL,
+            UNIQUE KEY uq_alert_log (kind, date, person_id),
+            INDEX idx_alert_log_date (date)
+        )
+    ''']),
+]
+
+class MySQLBackend:
+    name = 'mysql'
+    remote = True # Network round trips: offline journal and circuit breaker apply
+    schema = MYSQL_SCHEMA
+    insert_ignore = 'INSERT IGNORE'
+    greatest = 'GREATEST'
+    least = 'LEAST'
+
+    # Can't connect / server gone away / lost connection
+    CONNECTIVITY_ERRNOS = {2002, 2003, 2006, 2013, 2055}
+
+    def __init__(self, config=MYSQL_CONFIG):
+        import mysql.connector
+        from mysql.connector.errors import PoolError
+        from database.pool import get_pool
+
+        self.connector = mysql.connector
+        self.Error = mysql.connector.Error
+        self.IntegrityError = mysql.connector.IntegrityError
+        self.PoolError = PoolError
+        self.config = config
+        self.pool = get_pool(config)
+
+    def connect(self):
+        """Borrow a pooled connection (conn.close() returns it to the pool)"""
+        return self.pool.get_connection()
+
+    def get_stats(self):
+        return self.pool.get_stats()
+
+    def upsert(self, conflict_columns):
+        return 'ON DUPLICATE KEY UPDATE'
+
+    def excluded(self, column):
+        """The value the INSERT tried to write, inside the upsert's update clause"""
+        return f'VALUES({column})'
+
+    def time_seconds(self, expr):
+        """Seconds since midnight of a TIME (or 'HH:MM[:SS]' text) expression"""
+        return f'TIME_TO_SEC({expr})'
+
+    def is_connectivity_error(self, err):
+        """Server unreachable (retry later) as opposed to a statement the server rejected"""
+        return (isinstance(err, (self.PoolError, self.connector.InterfaceError, self.connector.OperationalError))
+                or getattr(err, 'errno', None) in self.CONNECTIVITY_ERRNOS)
+
+    def stream_cursor(self, conn):
+        """Unbuffered cursor: rows stay on the server until fetched"""
+        return conn.cursor(buffered=False)
+
+    def end_stream(self, conn, cursor):
+        """Drop unread rows of an abandoned stream so the pooled connection is reusable"""
+        try:
+            conn.consume_results()
+            cursor.close()
+        except self.Error:
+            pass
+
+    def table_size(self, cursor, table):
+        """(rows, bytes) of a table; InnoDB estimates from information_schema"""
+        cursor.execute('''
+            SELECT TABLE_ROWS, DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ''', (table,))
+        row = cursor.fetchone()
+        return (row[0] or 0, row[1] or 0) if row else (0, 0)
+
+    def try_lock(self, cursor, name):
+        """Named lock held by this connection's session, so only one process runs a job"""
+        cursor.execute('SELECT GET_LOCK(%s, 0)', (name,))
+        return bool(cursor.fetchone()[0])
+
+    def release_lock(self, cursor, name):
+        cursor.execute('SELECT RELEASE_LOCK(%s)', (name,))
+        cursor.fetchall()
+
+    def create_database(self):
+        """Creates the database if it doesn't exist"""
+        db_name = self.config.get('database')
+        if not db_name: return
+
+        # Connect without database
+        temp_config = self.config.copy()
+        if 'database' in temp_config:
+            del temp_config['database']
+
+        try:
+            conn = self.connector.connect(**temp_config)
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
+            conn.commit()
+            cursor.close()
+            conn.close()
+            print(f"Database '{db_name}' checked/created successfully.")
+        except self.Error as err:
+            print(f"Error creating database: {err}")
+
+    def upgrade_schema(self, db_manager):
+        """Bring existing (older) tables up to the current schema"""
+        from database.migrations import MigrationRunner
+        MigrationRunner(db_manager).run_pending()
+
+
+# --- SQLITE ---
+
+SQLITE_SCHEMA = [
+    ('persons', ['''
+        CREATE TABLE IF NOT EXISTS persons (
+            person_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT,
+            department TEXT,
+            shift_start TEXT DEFAULT '09:00',
+            shift_end TEXT DEFAULT '18:00',
+            registered_date TEXT NOT NULL,
+            embedding BLOB,
+            embedding_dim INTEGER,
+            embedding_model TEXT
+        )
+    ''']),
+    ('attendance', ['''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id TEXT NOT NULL REFERENCES persons (person_id) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            arrival_time TEXT,
+            leaving_time TEXT,
+            status TEXT DEFAULT 'Present',
+            UNIQUE (person_id, date)
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date)']),
+    ('attendance_daily', ['''
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            person_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            arrival_time TEXT,
+            leaving_time TEXT,
+            status TEXT,
+            worked_seconds INTEGER NOT NULL DEFAULT 0,
+            is_late INTEGER NOT NULL DEFAULT 0,
+            is_early INTEGER NOT NULL DEFAULT 0,
+            shift_start TEXT,
+            shift_end TEXT,
+            PRIMARY KEY (person_id, date),
+            FOREIGN KEY (person_id, date) REFERENCES attendance (person_id, date) ON DELETE CASCADE
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_attendance_daily_date ON attendance_daily (date)']),
+    ('face_logs', ['''
+        CREATE TABLE IF NOT EXISTS face_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id TEXT REFERENCES persons (person_id) ON DELETE CASCADE,
+            name TEXT,
+            date TEXT,
+            time TEXT,
+            timestamp TEXT DEFAULT (datetime('now', 'localtime')),
+            event_uid TEXT UNIQUE
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_face_logs_person_ts ON face_logs (person_id, timestamp)',
+         'CREATE INDEX IF NOT EXISTS idx_face_logs_date ON face_logs (date)']),
+    ('unknown_faces', ['''
+        CREATE TABLE IF NOT EXISTS unknown_faces (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT DEFAULT (datetime('now', 'localtime')),
+            snapshot_path TEXT,
+            embedding BLOB,
+            embedding_dim INTEGER,
+            embedding_model TEXT,
+            event_uid TEXT UNIQUE
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_unknown_faces_ts ON unknown_faces (timestamp)']),
+    ('presence_intervals', ['''
+        CREATE TABLE IF NOT EXISTS presence_intervals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            interval_uid TEXT NOT NULL UNIQUE,
+            person_id TEXT NOT NULL REFERENCES persons (person_id) ON DELETE CASCADE,
+            name TEXT,
+            camera_id TEXT NOT NULL DEFAULT '',
+            date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            sightings INTEGER NOT NULL DEFAULT 1
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_presence_person_start ON presence_intervals (person_id, start_time)',
+         'CREATE INDEX IF NOT EXISTS idx_presence_date ON presence_intervals (date)']),
+    ('presence_daily', ['''
+        CREATE TABLE IF NOT EXISTS presence_daily (
+            person_id TEXT NOT NULL REFERENCES persons (person_id) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            first_seen TEXT,
+            last_seen TEXT,
+            log_rows INTEGER NOT NULL DEFAULT 0,
+            intervals INTEGER NOT NULL DEFAULT 0,
+            sightings INTEGER NOT NULL DEFAULT 0,
+            seconds_on_site INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (person_id, date)
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_presence_daily_date ON presence_daily (date)']),
+    ('person_changes', ['''
+        CREATE TABLE IF NOT EXISTS person_changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT DEFAULT (datetime('now', 'localtime'))
+        )
+    ''']),
+    ('alert_log', ['''
+        CREATE TABLE IF NOT EXISTS alert_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            person_id TEXT NOT NULL DEFAULT '',
+            date TEXT NOT NULL,
+            sent_at TEXT DEFAULT (datetime('now', 'localtime')),
+            claim_token TEXT,
+            UNIQUE (kind, date, person_id)
+        )
+    ''', 'CREATE INDEX IF NOT EXISTS idx_alert_log_date ON alert_log (date)']),
+]
+
+# Store dates/times as the same text the MySQL path returns after format_db_row()
+sqlite3.register_adapter(datetime, lambda d: d.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+
+@lru_cache(maxsize=512)
+def _to_qmark(sql):
+    """%s placeholders -> ? (parameters are always passed separately, never inlined)"""
+    return sql.replace('%s', '?')
+
+
+class SQLiteCursor:
+    """sqlite3 cursor with the mysql.connector surface DatabaseManager/API use (%s, dictionary rows)"""
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self.dictionary = dictionary
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(_to_qmark(sql), params or ())
+        return self
+
+    def executemany(self, sql, params):
+        self._cursor.executemany(_to_qmark(sql), params)
+        return self
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def __iter__(self):
+        return (self._row(r) for r in self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    One long-lived sqlite3 connection per thread (its statement cache keeps prepared
+    statements across calls). close() only ends an open transaction, like returning
+    a pooled MySQL connection.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self.raw.cursor(), dictionary)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def close(self):
+        if self.raw.in_transaction:
+            self.raw.rollback()
+
+    def invalidate(self):
+        pass # Local file: nothing to reconnect
+
+    def is_connected(self):
+        return True
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    remote = False
+    schema = SQLITE_SCHEMA
+    insert_ignore = 'INSERT OR IGNORE'
+    greatest = 'MAX' # Multi-argument MAX/MIN are scalar in SQLite (NULL if any argument is NULL, like GREATEST)
+    least = 'MIN'
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {'connections': 0, 'acquired': 0}
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            raw = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False,
+                                  cached_statements=256, uri=self.path.startswith('file:'))
+            raw.execute('PRAGMA journal_mode=WAL')   # Readers never block the writer
+            raw.execute('PRAGMA synchronous=NORMAL')
+            raw.execute('PRAGMA foreign_keys=ON')    # ON DELETE CASCADE like InnoDB
+            conn = self.local.conn = SQLiteConnection(raw)
+            with self.lock:
+                self.stats['connections'] += 1
+        with self.lock:
+            self.stats['acquired'] += 1
+        return conn
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, backend='sqlite', path=self.path)
+
+    def upsert(self, conflict_columns):
+        return f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET"
+
+    def excluded(self, column):
+        return f'excluded.{column}'
+
+    def time_seconds(self, expr):
+        # Not strftime('%s'): a literal %s would be taken for a placeholder by _to_qmark
+        return f"(strftime('%H', {expr}) * 3600 + strftime('%M', {expr}) * 60 + strftime('%S', {expr}))"
+
+    def is_connectivity_error(self, err):
+        return False
+
+    def stream_cursor(self, conn):
+        return conn.cursor() # sqlite3 steps through the result as rows are fetched
+
+    def end_stream(self, conn, cursor):
+        cursor.close()
+
+    def table_size(self, cursor, table):
+        """(rows, bytes) of a table and its indexes (dbstat, when SQLite was built with it)"""
+        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        rows = cursor.fetchone()[0]
+        try:
+            cursor.execute('''
+                SELECT COALESCE(SUM(pgsize), 0) FROM dbstat
+                WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)
+            ''', (table,))
+            return rows, cursor.fetchone()[0]
+        except sqlite3.Error:
+            return rows, 0
+
+    def try_lock(self, cursor, name):
+        return True # Writers are serialized by SQLite itself; jobs are idempotent
+
+    def release_lock(self, cursor, name):
+        pass
+
+    def create_database(self):
+        if not self.path.startswith('file:') and self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def upgrade_schema(self, db_manager):
+        """
+        Created with the current schema; fill attendance_daily for rows written before it
+        existed and add alert_log.claim_token to files created without it
+        """
+        from database.aggregates import backfill_attendance_daily
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM attendance), EXISTS (SELECT 1 FROM attendance_daily)')
+            has_attendance, has_daily = cursor.fetchone()
+            cursor.execute('PRAGMA table_info(alert_log)')
+            if 'claim_token' not in {row[1] for row in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE alert_log ADD COLUMN claim_token TEXT')
+                conn.commit()
+        finally:
+            conn.close()
+        if has_attendance and not has_daily:
+            backfill_attendance_daily(db_manager)
+
+
+BACKENDS = {'mysql': MySQLBackend, 'sqlite': SQLiteBackend}
+
+def create_backend(name=None):
+    name = name or DB_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND '{name}' (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[name]()
@@ -0,0 +1,271 @@
+"""
+Columnar attendance export for analytics (typed columns instead of re-parsed CSV strings).
+
+One row per attendance_daily row, partitioned by month:
+    <out>/month=2025-01/part-20250101-20250131.parquet
+    <out>/month=2025-02/part-20250201-20250214.parquet
+    <out>/month=2025-02/part-20250215-20250228.parquet    (appended by a later run)
+    <out>/_manifest.json                                  (format, last exported date)
+
+Columns: person_id, name (str), date (date), arrival / leaving (time of day, null when
+missing), status (str), worked (duration, seconds), is_late / is_early (bool).
+  - parquet / arrow (IPC file): needs pyarrow; date32, time32[s] (Parquet stores time32[ms]),
+    duration[s] columns. The tree is hive-partitioned: pyarrow.dataset.dataset(out, partitioning='hive')
+  - npz (NumPy only): datetime64[D] dates, int32 seconds after midnight (-1 = missing)
+    for arrival / leaving, timedelta64[s] worked
+
+Each run appends only the days after the manifest's last date, up to yesterday (today
+is still being written). Past rows edited afterwards are not re-exported: use --full.
+    python -m database.columnar                       # append new days
+    python -m database.columnar --format npz --full   # rebuild everything
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.config import COLUMNAR_EXPORT_FOLDER, COLUMNAR_EXPORT_FORMAT
+
+MANIFEST = '_manifest.json'
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'npz': '.npz'}
+COLUMNS = ['person_id', 'name', 'date', 'arrival', 'leaving', 'status', 'worked', 'is_late', 'is_early']
+
+
+def resolve_format(fmt=COLUMNAR_EXPORT_FORMAT):
+    """'auto' -> parquet if pyarrow is installed, else npz. Raises ImportError for parquet/arrow without it."""
+    if fmt not in EXTENSIONS and fmt != 'auto':
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    if fmt == 'npz':
+        return fmt
+    try:
+        import pyarrow # noqa: F401
+    except ImportError:
+        if fmt == 'auto':
+            return 'npz'
+        raise
+    return 'parquet' if fmt == 'auto' else fmt
+
+
+def _month_spans(first, last):
+    """(start, end) date pairs covering first..last, split at month boundaries"""
+    start = first
+    while start <= last:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(next_month - timedelta(days=1), last)
+        yield start, end
+        start = end + timedelta(days=1)
+
+
+def fetch_columns(db_manager, start_date, end_date):
+    """attendance_daily rows for the range as {column: ndarray} (npz typing)"""
+    sec = db_manager.backend.time_seconds
+    conn = db_manager.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT d.person_id, p.name, d.date, {sec('d.arrival_time')}, {sec('d.leaving_time')},
+                   d.status, d.worked_seconds, d.is_late, d.is_early
+            FROM attendance_daily d JOIN persons p ON p.person_id = d.person_id
+            WHERE d.date BETWEEN %s AND %s
+            ORDER BY d.date, d.person_id
+        ''', (start_date.isoformat(), end_date.isoformat()))
+        return build_columns(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def build_columns(rows):
+    def seconds(value):
+        return -1 if value is None else int(value)
+
+    return {
+        'person_id': np.array([r[0] for r in rows], dtype=str),
+        'name': np.array([r[1] or '' for r in rows], dtype=str),
+        'date': np.array([str(r[2])[:10] for r in rows], dtype='datetime64[D]'),
+        'arrival': np.array([seconds(r[3]) for r in rows], dtype=np.int32),
+        'leaving': np.array([seconds(r[4]) for r in rows], dtype=np.int32),
+        'status': np.array([r[5] or '' for r in rows], dtype=str),
+        'worked': np.array([int(r[6] or 0) for r in rows], dtype='timedelta64[s]'),
+        'is_late': np.array([bool(r[7]) for r in rows], dtype=bool),
+        'is_early': np.array([bool(r[8]) for r in rows], dtype=bool),
+    }
+
+
+def to_arrow(columns):
+    import pyarrow as pa
+
+    def time_of_day(values):
+        return pa.array(values, type=pa.time32('s'), mask=values < 0)
+
+    return pa.table({
+        'person_id': pa.array(columns['person_id'], type=pa.string()),
+        'name': pa.array(columns['name'], type=pa.string()),
+        'date': pa.array(columns['date'], type=pa.date32()),
+        'arrival': time_of_day(columns['arrival']),
+        'leaving': time_of_day(columns['leaving']),
+        'status': pa.array(columns['status'], type=pa.string()),
+        'worked': pa.array(columns['worked'], type=pa.duration('s')),
+        'is_late': pa.array(columns['is_late']),
+        'is_early': pa.array(columns['is_early']),
+    })
+
+
+def write_part(columns, path, fmt):
+    tmp = path + '.tmp'
+    if fmt == 'npz':
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **columns)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(to_arrow(columns), tmp)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(to_arrow(columns), tmp)
+    os.replace(tmp, path) # A reader never sees a half-written part
+
+
+class ColumnarExporter:
+    """Incremental, month-partitioned export of attendance_daily"""
+    def __init__(self, db_manager, out_dir=COLUMNAR_EXPORT_FOLDER, fmt=COLUMNAR_EXPORT_FORMAT):
+        self.db_manager = db_manager
+        self.out_dir = out_dir
+        self.fmt = resolve_format(fmt)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.out_dir, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, last_date):
+        path = os.path.join(self.out_dir, MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'format': self.fmt, 'last_date': last_date.isoformat()}, f)
+        os.replace(path + '.tmp', path)
+
+    def _clear(self):
+        if not os.path.isdir(self.out_dir):
+            return
+        for entry in os.scandir(self.out_dir):
+            if entry.is_dir() and entry.name.startswith('month='):
+                shutil.rmtree(entry.path)
+        try:
+            os.remove(os.path.join(self.out_dir, MANIFEST))
+        except OSError:
+            pass
+
+    def _first_date(self):
+        conn = self.db_manager.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MIN(date) FROM attendance_daily')
+            (first,) = cursor.fetchone()
+        finally:
+            conn.close()
+        return None if first is None else date.fromisoformat(str(first)[:10])
+
+    def export(self, end_date=None, full=False):
+        """
+        Append the days after the last export up to end_date (default and latest: yesterday,
+        since today's rows are still being written and the manifest would skip the rest).
+        Returns: {'format', 'days', 'rows', 'parts'}
+        """
+        summary = {'format': self.fmt, 'days': 0, 'rows': 0, 'parts': []}
+        yesterday = date.today() - timedelta(days=1)
+        if end_date and end_date > yesterday:
+            print(f"[COLUMNAR] {end_date} is not closed yet, exporting up to {yesterday}")
+        end_date = min(end_date or yesterday, yesterday)
+        if full:
+            self._clear()
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        manifest = self._read_manifest()
+        if manifest and manifest['format'] != self.fmt:
+            print(f"[COLUMNAR] ✗ {self.out_dir} holds {manifest['format']} parts, re-run with --full to switch to {self.fmt}")
+            return summary
+        if manifest:
+            start_date = date.fromisoformat(manifest['last_date']) + timedelta(days=1)
+        else:
+            start_date = self._first_date()
+            if start_date is None:
+                print("[COLUMNAR] No attendance rows to export")
+                return summary
+
+        for month_start, month_end in _month_spans(start_date, end_date):
+            columns = fetch_columns(self.db_manager, month_start, month_end)
+            rows = len(columns['date'])
+            if rows:
+                month_dir = os.path.join(self.out_dir, f"month={month_start:%Y-%m}")
+                os.makedirs(month_dir, exist_ok=True)
+                path = os.path.join(month_dir, f"part-{month_start:%Y%m%d}-{month_end:%Y%m%d}{EXTENSIONS[self.fmt]}")
+                write_part(columns, path, self.fmt)
+                summary['parts'].append(path)
+            self._write_manifest(month_end) # Resume point if a later month fails
+            summary['days'] += (month_end - month_start).days + 1
+            summary['rows'] += rows
+
+        if summary['days']:
+            print(f"[COLUMNAR] ✓ {summary['rows']:,} rows ({summary['days']} days, {len(summary['parts'])} part(s)) "
+                  f"appended to {self.out_dir} as {self.fmt}")
+        else:
+            print(f"[COLUMNAR] {self.out_dir} is up to date")
+        return summary
+
+
+def load_columnar(out_dir=COLUMNAR_EXPORT_FOLDER, start_month=None, end_month=None):
+    """
+    Read the parts of months start_month..end_month ('YYYY-MM', inclusive, None = open).
+    Returns a pyarrow.Table for parquet / arrow exports, {column: ndarray} for npz.
+    """
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        fmt = json.load(f)['format']
+
+    paths = []
+    for month_dir in sorted(d for d in os.listdir(out_dir) if d.startswith('month=')):
+        month = month_dir.split('=', 1)[1]
+        if (start_month and month < start_month) or (end_month and month > end_month):
+            continue
+        folder = os.path.join(out_dir, month_dir)
+        paths += [os.path.join(folder, p) for p in sorted(os.listdir(folder)) if p.endswith(EXTENSIONS[fmt])]
+
+    if fmt == 'npz':
+        parts = []
+        for path in paths:
+            with np.load(path) as part:
+                parts.append({c: part[c] for c in COLUMNS})
+        if not parts:
+            return build_columns([])
+        return {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+
+    import pyarrow as pa
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        tables = [pq.read_table(path) for path in paths]
+    else:
+        import pyarrow.feather as feather
+        tables = [feather.read_table(path) for path in paths]
+    return pa.concat_tables(tables) if tables else to_arrow(build_columns([]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export attendance as month-partitioned columnar files")
+    parser.add_argument('--out', default=COLUMNAR_EXPORT_FOLDER, help="Output folder")
+    parser.add_argument('--format', default=COLUMNAR_EXPORT_FORMAT, choices=['auto', 'parquet', 'arrow', 'npz'])
+    parser.add_argument('--to', dest='end_date', help="Last date (YYYY-MM-DD), default and latest: yesterday")
+    parser.add_argument('--full', action='store_true', help="Drop existing parts and export all history")
+    args = parser.parse_args()
+
+    from database.database import DatabaseManager
+    end_date = date.fromisoformat(args.end_date) if args.end_date else None
+    ColumnarExporter(DatabaseManager(), args.out, args.format).export(end_date, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,253 +1,411 @@
-import mysql.connector
-from mysql.connector import errorcode
-import pickle
-import base64
+import hashlib
 from datetime import datetime, date
-from config.config import MYSQL_CONFIG
+from config.config import (AUTO_MIGRATE, FACE_DETECTION_MODEL, OFFLINE_JOURNAL_ENABLED, OFFLINE_JOURNAL_PATH,
+                           REPORT_EXPORT_CHUNK_SIZE, GALLERY_SYNC_LAG_WINDOW)
+from database.backends import create_backend
+from database.journal import OfflineJournal, JournalReplayer
+from database.day_state import DayStateCache
+from database.report_cache import ReportCache
+from database.stats import StatisticsService
+from database.formatting import format_db_rows
+from database.embeddings import encode_embedding, decode_embeddings
+from database.presence import union_seconds
+from database.aggregates import refresh_attendance_daily
 
 class DatabaseManager:
-    def __init__(self):
-        self.config = MYSQL_CONFIG
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend() # DB_BACKEND unless given (e.g. SQLiteBackend for tests)
+        self.person_cache = {} # person_id -> (name, shift_end), see get_shift_end()
+        self.day_state = DayStateCache(self)
+        self.report_cache = ReportCache() # Report rows per date range, see get_attendance_report()
+        self.stats = StatisticsService(self) # total_persons / present_today without a query per call
         self.init_database()
+        self.day_state.seed()
+
+        # Attendance / presence / unknown faces are buffered locally while MySQL is down
+        use_journal = OFFLINE_JOURNAL_ENABLED and self.backend.remote
+        self.journal = OfflineJournal(OFFLINE_JOURNAL_PATH) if use_journal else None
+        self.replayer = JournalReplayer(self.journal, self) if self.journal else None
+        self.stats.start() # Also the thread that keeps day_state fresh
     
     def get_connection(self):
-        """Helper to get a fresh connection"""
-        return mysql.connector.connect(**self.config)
+        """Borrow a connection from the backend (conn.close() returns it)"""
+        return self.backend.connect()
+
+    def get_pool_stats(self):
+        """Pool size, wait-time and reconnect metrics"""
+        return self.backend.get_stats()
+
+    def get_report_cache_stats(self):
+        """Report cache hits / misses, entries and estimated bytes"""
+        return self.report_cache.get_stats()
 
     def init_database(self):
-        """Initialize MySQL tables"""
+        """Initialize tables (schema comes from the storage backend)"""
         try:
             # 1. Create Database if not exists
-            self.create_database_if_not_exists()
+            self.backend.create_database()
 
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # 1. Persons Table (With Shift Columns)
-            try:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS persons (
-                        person_id VARCHAR(50) PRIMARY KEY,
-                        name VARCHAR(100) NOT NULL,
-                        email VARCHAR(100),
-                        department VARCHAR(100),
-                        shift_start VARCHAR(10) DEFAULT '09:00',
-                        shift_end VARCHAR(10) DEFAULT '18:00',
-                        registered_date VARCHAR(30) NOT NULL,
-                        face_encoding LONGTEXT
-                    )
-                ''')
-                print("Table 'persons' checked/created.")
-            except mysql.connector.Error as err:
-                print(f"Error creating 'persons' table: {err}")
-            
-            # 2. Attendance Summary
-            try:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS attendance (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        person_id VARCHAR(50) NOT NULL,
-                        date VARCHAR(20) NOT NULL,
-                        arrival_time VARCHAR(20),
-                        leaving_time VARCHAR(20),
-                        status VARCHAR(20) DEFAULT 'Present',
-                        FOREIGN KEY (person_id) REFERENCES persons (person_id) ON DELETE CASCADE,
-                        UNIQUE KEY unique_attendance (person_id, date)
-                    )
-                ''')
-                print("Table 'attendance' checked/created.")
-            except mysql.connector.Error as err:
-                print(f"Error creating 'attendance' table: {err}")
-
-            # 3. Raw Logs (With Name Column)
             try:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS face_logs (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        person_id VARCHAR(50),
-                        name VARCHAR(100),
-                        date VARCHAR(20),
-                        time VARCHAR(20),
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (person_id) REFERENCES persons(person_id) ON DELETE CASCADE
-                    )
-                ''')
-                print("Table 'face_logs' checked/created.")
-            except mysql.connector.Error as err:
-                print(f"Error creating 'face_logs' table: {err}")
-
-            # 4. Unknown Faces Table
-            try:
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS unknown_faces (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        snapshot_path VARCHAR(255),
-                        face_encoding LONGTEXT
-                    )
-                ''')
-                print("Table 'unknown_faces' checked/created.")
-            except mysql.connector.Error as err:
-                print(f"Error creating 'unknown_faces' table: {err}")
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-        except mysql.connector.Error as err:
-            print(f"Error connecting to MySQL: {err}")
-
-    def create_database_if_not_exists(self):
-        """Creates the database if it doesn't exist"""
-        db_name = self.config.get('database')
-        if not db_name: return
-
-        # Connect without database
-        temp_config = self.config.copy()
-        if 'database' in temp_config:
-            del temp_config['database']
-        
-        try:
-            conn = mysql.connector.connect(**temp_config)
-            cursor = conn.cursor()
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
-            conn.commit()
-            cursor.close()
-            conn.close()
-            print(f"Database '{db_name}' checked/created successfully.")
-        except mysql.connector.Error as err:
-            print(f"Error creating database: {err}")
+                cursor = conn.cursor()
+                
+                # 2. Tables: persons, attendance, face_logs, unknown_faces, presence_intervals, person_changes
+                for table, statements in self.backend.schema:
+                    try:
+                        for statement in statements:
+                            cursor.execute(statement)
+                        print(f"Table '{table}' checked/created.")
+                    except self.backend.Error as err:
+                        print(f"Error creating '{table}' table: {err}")
+                
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+
+            # 3. Bring existing (older) tables up to the current schema
+            if AUTO_MIGRATE:
+                self.backend.upgrade_schema(self)
+        except self.backend.Error as err:
+            print(f"Error connecting to database: {err}")
 
     # --- CORE LOGGING & ATTENDANCE ---
 
     def log_raw_detection(self, person_id, person_name):
         """Logs detection with Name, Date and Time"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        return self.log_raw_detections_batch([(person_id, person_name, datetime.now())])
+
+    def log_unknown_person(self, snapshot_path, face_encoding):
+        """Logs unknown person with snapshot and encoding"""
+        return self.log_unknown_persons_batch([(snapshot_path, face_encoding)])
+
+    def log_unknown_persons_batch(self, rows):
+        """
+        Logs many unknown persons in one round trip.
+        rows: list of (snapshot_path, face_encoding)
+        """
+        if not rows:
+            return True
+        now = datetime.now()
+        rows = [(snapshot_path, face_encoding, now) for snapshot_path, face_encoding in rows]
+        return self._write_or_journal('unknown', rows, self._write_unknown_faces, "Log Unknown Batch Error")
+
+    def sync_daily_attendance(self, person_id):
+        """
+        Manages Attendance based on PERSON-SPECIFIC Shift, in one round trip:
+        1. Shift end comes from the in-process shift cache.
+        2. LOGIN vs update is known from the in-memory day state.
+        3. A single upsert on unique_attendance (person_id, date) creates the row
+           or moves leaving_time to now (see sync_attendance_batch).
+        """
+        today = date.today().isoformat()
+        current_time = datetime.now().strftime('%H:%M:%S')
+        results = self.sync_attendance_batch([(person_id, today, current_time, current_time)])
+        if results is None:
+            return "DB Error: attendance not saved"
+        return results[(person_id, today)]
+
+    def get_shift_end(self, person_id):
+        """
+        Shift end ("HH:MM") for a person from the in-process cache.
+        The cache is filled with one query for all persons and refreshed on a miss
+        (e.g. someone registered from another process). Returns None if unknown.
+        """
+        if person_id not in self.person_cache:
+            self.load_person_cache()
+        cached = self.person_cache.get(person_id)
+        return cached[1] if cached else None
+
+    def get_person_name(self, person_id):
+        if person_id not in self.person_cache:
+            self.load_person_cache()
+        cached = self.person_cache.get(person_id)
+        return cached[0] if cached else None
+
+    def load_person_cache(self):
         try:
-            now = datetime.now()
-            current_date = now.strftime('%Y-%m-%d')
-            current_time = now.strftime('%H:%M:%S')
-            
-            cursor.execute('''
-                INSERT INTO face_logs (person_id, name, date, time, timestamp) 
-                VALUES (%s, %s, %s, %s, NOW())
-            ''', (person_id, person_name, current_date, current_time))
-            
-            conn.commit()
+            conn = self.get_connection()
+        except self.backend.Error as e:
+            print(f"Person Cache Error: {e}")
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT person_id, name, shift_end FROM persons')
+            self.person_cache = {pid: (name, shift_end) for pid, name, shift_end in cursor.fetchall()}
         except Exception as e:
-            print(f"Log Error: {e}")
+            print(f"Person Cache Error: {e}")
         finally:
             conn.close()
 
-    def log_unknown_person(self, snapshot_path, face_encoding):
-        """Logs unknown person with snapshot and encoding"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def log_raw_detections_batch(self, rows):
+        """
+        Logs many detections in one round trip (write-behind path).
+        rows: list of (person_id, person_name, captured_at datetime)
+        """
+        if not rows:
+            return True
+        return self._write_or_journal('log', rows, self._write_raw_detections, "Log Batch Error")
+
+    def write_presence_intervals(self, rows):
+        """
+        Insert or extend presence intervals (PresenceRecorder).
+        rows: list of (person_id, name, camera_id, start datetime, end datetime, sightings)
+        """
+        if not rows:
+            return True
+        return self._write_or_journal('presence', rows, self._write_presence_intervals, "Presence Write Error")
+
+    def sync_attendance_batch(self, entries):
+        """
+        Batched version of sync_daily_attendance (write-behind path).
+        entries: list of (person_id, date_str, first_seen 'HH:MM:SS', last_seen 'HH:MM:SS'),
+                 at most one entry per (person_id, date_str).
+        Arrival is only set on the first row of the day; leaving_time moves forward to the
+        latest sighting. Returns: {(person_id, date_str): message}, or None on DB error.
+        While MySQL is unreachable the entries are journaled and the messages are worked
+        out from the in-memory day state.
+        """
+        if not entries:
+            return {}
         try:
-            pickled_data = pickle.dumps(face_encoding)
-            safe_data_string = base64.b64encode(pickled_data).decode('utf-8')
-            
-            cursor.execute('''
-                INSERT INTO unknown_faces (snapshot_path, face_encoding) 
-                VALUES (%s, %s)
-            ''', (snapshot_path, safe_data_string))
+            conn = self.get_connection()
+        except self.backend.Error as err:
+            return self._attendance_offline(entries, err)
+        try:
+            cursor = conn.cursor()
+            pids = sorted({e[0] for e in entries})
+            dates = sorted({e[1] for e in entries})
+            pid_marks = ', '.join(['%s'] * len(pids))
+            date_marks = ', '.join(['%s'] * len(dates))
+
+            # 1. Shift ends (cached) + which rows already exist (login vs update)
+            shift_ends = {pid: self.get_shift_end(pid) for pid in pids}
+            shift_ends = {pid: end for pid, end in shift_ends.items() if end is not None}
             
+            if len(dates) == 1 and self.day_state.is_current(dates[0]):
+                # Today's state is in memory: no existence query needed
+                existing = {(pid, dates[0]) for pid in pids if self.day_state.is_present(pid)}
+            else:
+                cursor.execute(f'''
+                    SELECT person_id, date FROM attendance
+                    WHERE person_id IN ({pid_marks}) AND date IN ({date_marks})
+                ''', pids + dates)
+                existing = {(pid, str(d)) for pid, d in cursor.fetchall()}
+
+            # 2. One multi-row upsert for the whole batch
+            results, params = self._attendance_results(entries, existing, shift_ends)
+            if params:
+                self._write_attendance(cursor, params)
+                conn.commit()
+                self._record_day_state(params, shift_ends)
+                self.report_cache.invalidate(dates)
+            return results
+        except self.backend.Error as err:
+            if self.is_connectivity_error(err):
+                conn.invalidate()
+                return self._attendance_offline(entries, err)
+            print(f"[DATABASE] ✗ Batch Error: {err}")
+            return None
+        finally:
+            conn.close()
+
+    def _attendance_results(self, entries, existing, shift_ends):
+        """Voice/UI message per entry + upsert params for persons that exist"""
+        results = {}
+        params = []
+        for pid, day, first_seen, last_seen in entries:
+            if pid not in shift_ends:
+                results[(pid, day)] = "Error: Person not found"
+                continue
+            params.append((pid, day, first_seen, last_seen))
+
+            if (pid, day) not in existing:
+                results[(pid, day)] = f"LOGIN: {first_seen}"
+            elif int(last_seen.split(':')[0]) >= self._shift_end_hour(shift_ends[pid]):
+                results[(pid, day)] = f"LOGOUT UPDATE: {last_seen}"
+            else:
+                results[(pid, day)] = f"Shift Ongoing (Ends {shift_ends[pid]})"
+        return results, params
+
+    def _record_day_state(self, params, shift_ends):
+        for pid, day, first_seen, last_seen in params:
+            self.day_state.record(pid, day, first_seen, last_seen,
+                                  name=self.get_person_name(pid), shift_end=shift_ends[pid])
+
+    def _attendance_offline(self, entries, err):
+        """Journal attendance entries and answer from memory (day state + person cache)"""
+        if not self._journal_rows('attendance', entries, err):
+            print(f"[DATABASE] ✗ Batch Error: {err}")
+            return None
+        # Person cache may be empty if the server was down since startup: assume the default shift
+        shift_ends = {pid: (self.person_cache.get(pid) or (None, '18:00'))[1] for pid, _, _, _ in entries}
+        existing = {(pid, day) for pid, day, _, _ in entries
+                    if self.day_state.is_current(day) and self.day_state.is_present(pid)}
+        results, params = self._attendance_results(entries, existing, shift_ends)
+        self._record_day_state(params, shift_ends)
+        return results
+
+    # --- WRITES: SQL, OFFLINE JOURNAL & REPLAY ---
+
+    def is_connectivity_error(self, err):
+        """Server unreachable (retry later) as opposed to a statement the server rejected"""
+        return self.backend.is_connectivity_error(err)
+
+    @staticmethod
+    def _event_uid(*parts):
+        """Deterministic id so a replayed event is inserted at most once"""
+        return hashlib.md5('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+    def _write_raw_detections(self, cursor, rows):
+        params = [
+            (self._event_uid(pid, ts.isoformat()), pid, name, ts.strftime('%Y-%m-%d'), ts.strftime('%H:%M:%S'), ts)
+            for pid, name, ts in rows
+        ]
+        cursor.executemany(f'''
+            {self.backend.insert_ignore} INTO face_logs (event_uid, person_id, name, date, time, timestamp)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        ''', params)
+
+    def _write_unknown_faces(self, cursor, rows):
+        params = []
+        for snapshot_path, face_encoding, ts in rows:
+            blob, dim = encode_embedding(face_encoding)
+            params.append((self._event_uid(snapshot_path), ts, snapshot_path, blob, dim, FACE_DETECTION_MODEL))
+        cursor.executemany(f'''
+            {self.backend.insert_ignore} INTO unknown_faces (event_uid, timestamp, snapshot_path, embedding, embedding_dim, embedding_model)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        ''', params)
+
+    def _write_attendance(self, cursor, params):
+        """
+        Order-independent upsert: earliest arrival and latest leaving win (safe to replay).
+        attendance_daily is recomputed for the touched (person, date) pairs.
+        """
+        b = self.backend
+        new_arrival, new_leaving = b.excluded('arrival_time'), b.excluded('leaving_time')
+        cursor.executemany(f'''
+            INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
+            VALUES (%s, %s, %s, %s, 'Present')
+            {b.upsert(['person_id', 'date'])}
+                arrival_time = {b.least}(COALESCE(arrival_time, {new_arrival}), {new_arrival}),
+                leaving_time = {b.greatest}(COALESCE(leaving_time, {new_leaving}), {new_leaving})
+        ''', params)
+        # Keep the daily aggregate in the same transaction
+        pids = sorted({p[0] for p in params})
+        dates = sorted({p[1] for p in params})
+        self.refresh_attendance_daily(
+            cursor, f"a.person_id IN ({', '.join(['%s'] * len(pids))}) AND a.date IN ({', '.join(['%s'] * len(dates))})",
+            pids + dates)
+
+    def _write_presence_intervals(self, cursor, rows):
+        """Upsert keyed on (person, camera, start): the end and sighting count only grow (safe to replay)"""
+        b = self.backend
+        params = [
+            (self._event_uid(pid, camera_id, start.isoformat()), pid, name, camera_id,
+             start.strftime('%Y-%m-%d'), start, end, sightings)
+            for pid, name, camera_id, start, end, sightings in rows
+        ]
+        cursor.executemany(f'''
+            INSERT INTO presence_intervals (interval_uid, person_id, name, camera_id, date, start_time, end_time, sightings)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            {b.upsert(['interval_uid'])}
+                end_time = {b.greatest}(end_time, {b.excluded('end_time')}),
+                sightings = {b.greatest}(sightings, {b.excluded('sightings')})
+        ''', params)
+
+    def _write_or_journal(self, kind, rows, write, error_label):
+        """Run write(cursor, rows) and commit; journal the rows if the server is unreachable"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            write(conn.cursor(), rows)
             conn.commit()
             return True
         except Exception as e:
-            print(f"Log Unknown Error: {e}")
+            if self.is_connectivity_error(e):
+                if conn is not None:
+                    conn.invalidate()
+                if self._journal_rows(kind, rows, e):
+                    return True
+            print(f"{error_label}: {e}")
             return False
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
-    def sync_daily_attendance(self, person_id):
-        """
-        Manages Attendance based on PERSON-SPECIFIC Shift:
-        1. Get the person's shift_end from DB.
-        2. If current time >= shift_end, update Logout.
-        """
-        today = date.today().isoformat()
-        now = datetime.now()
-        current_time = now.strftime('%H:%M:%S')
-        
+    def _journal_rows(self, kind, rows, err):
+        if self.journal is None:
+            return False
+        try:
+            self.journal.append(kind, rows)
+        except Exception as e:
+            print(f"Journal Error: {e}")
+            return False
+        print(f"[DATABASE] ⚠ MySQL unreachable ({err}): {len(rows)} {kind} event(s) saved to offline journal")
+        return True
+
+    def replay_events(self, kind, rows):
+        """Write journaled rows (JournalReplayer). Raises on failure so the replayer can classify it."""
+        write = {'log': self._write_raw_detections,
+                 'unknown': self._write_unknown_faces,
+                 'attendance': self._write_attendance,
+                 'presence': self._write_presence_intervals}[kind]
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # 1. Get Person's Shift Details
-            cursor.execute('SELECT shift_end FROM persons WHERE person_id = %s', (person_id,))
-            person_data = cursor.fetchone()
-            
-            if not person_data:
-                return "Error: Person not found"
-                
-            # Parse user's specific shift end (e.g., "18:00")
-            user_shift_end_str = person_data[0] 
-            try:
-                user_shift_end_hour = int(user_shift_end_str.split(':')[0])
-            except:
-                user_shift_end_hour = 18 # Default fallback
-            
-            # 2. Check Attendance Record
-            cursor.execute('SELECT id FROM attendance WHERE person_id = %s AND date = %s', (person_id, today))
-            record = cursor.fetchone()
-            
-            if record is None:
-                # --- LOGIN ---
-                cursor.execute('''
-                    INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
-                    VALUES (%s, %s, %s, %s, 'Present')
-                ''', (person_id, today, current_time, current_time))
-                conn.commit()
-                print(f"[DATABASE] ✓ Created attendance record: {person_id} - {current_time}")
-                return f"LOGIN: {current_time}"
-            else:
-                # --- UPDATE LEAVING TIME (Always update to latest seen) ---
-                cursor.execute('''
-                    UPDATE attendance 
-                    SET leaving_time = %s 
-                    WHERE person_id = %s AND date = %s
-                ''', (current_time, person_id, today))
-                conn.commit()
-                print(f"[DATABASE] ✓ Updated leaving_time: {person_id} - {current_time}")
-                
-                # Check if shift is over for voice feedback
-                if now.hour >= user_shift_end_hour:
-                    return f"LOGOUT UPDATE: {current_time}"
-                else:
-                    return f"Shift Ongoing (Ends {user_shift_end_str})"
-                
-        except mysql.connector.Error as err:
-            print(f"[DATABASE] ✗ Error: {err}")
-            return f"DB Error: {err}"
+            write(conn.cursor(), rows)
+            conn.commit()
+            if kind == 'attendance':
+                self.report_cache.invalidate({row[1] for row in rows})
+        except Exception as e:
+            if self.is_connectivity_error(e):
+                conn.invalidate()
+            raise
         finally:
             conn.close()
 
+    def get_journal_stats(self):
+        return self.journal.get_stats() if self.journal else None
+
+    @staticmethod
+    def _shift_end_hour(shift_end_str):
+        """Hour part of a shift end like "18:00" (18 if unparsable)"""
+        try:
+            return int(shift_end_str.split(':')[0])
+        except:
+            return 18 # Default fallback
+
     # --- PERSON MANAGEMENT ---
 
     def add_person(self, person_id, name, face_encoding, email=None, department=None, shift_start="09:00", shift_end="18:00"):
+        conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
-            pickled_data = pickle.dumps(face_encoding)
-            safe_data_string = base64.b64encode(pickled_data).decode('utf-8')
+            blob, dim = encode_embedding(face_encoding)
             
             cursor.execute('''
-                INSERT INTO persons (person_id, name, email, department, shift_start, shift_end, registered_date, face_encoding)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (person_id, name, email, department, shift_start, shift_end, datetime.now().isoformat(), safe_data_string))
+                INSERT INTO persons (person_id, name, email, department, shift_start, shift_end, registered_date,
+                                     embedding, embedding_dim, embedding_model)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ''', (person_id, name, email, department, shift_start, shift_end, datetime.now().isoformat(),
+                  blob, dim, FACE_DETECTION_MODEL))
+            self._log_person_change(cursor, person_id, 'upsert')
             
             conn.commit()
+            self.person_cache[person_id] = (name, shift_end)
+            self.stats.person_added()
             return True, "Person added successfully"
-        except mysql.connector.IntegrityError:
+        except self.backend.IntegrityError:
             return False, "Person ID already exists"
         except Exception as e:
             return False, str(e)
         finally:
-            if conn.is_connected(): conn.close()
+            if conn is not None: conn.close()
 
     def update_person(self, person_id, name, email, dept, s_start, s_end):
         """Update a person's details"""
+        conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
@@ -256,183 +414,280 @@ class DatabaseManager:
                 SET name=%s, email=%s, department=%s, shift_start=%s, shift_end=%s
                 WHERE person_id=%s
             ''', (name, email, dept, s_start, s_end, person_id))
+            self._log_person_change(cursor, person_id, 'upsert')
             conn.commit()
+            self.person_cache[person_id] = (name, s_end)
+            self.day_state.invalidate()
+            self.report_cache.invalidate() # Names / shifts in cached rows
             return True, "Update Successful"
         except Exception as e:
             return False, str(e)
         finally:
-            conn.close()
+            if conn is not None: conn.close()
 
     def get_all_face_encodings(self):
         """
         Retrieve all face encodings from the database.
+        Embeddings are raw float32 BLOBs: all rows are decoded with one np.frombuffer.
         Returns: Dictionary {person_id: {'name': name, 'encoding': numpy_array}}
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute("SELECT person_id, name, face_encoding FROM persons")
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT person_id, name, embedding, embedding_dim, embedding_model
+                FROM persons WHERE embedding IS NOT NULL
+            """)
             rows = cursor.fetchall()
-            
-            encodings = {}
-            for pid, name, encoded_data in rows:
-                if encoded_data:
-                    try:
-                        # Decode base64 and unpickle
-                        face_data = pickle.loads(base64.b64decode(encoded_data))
-                        encodings[pid] = {
-                            'name': name,
-                            'encoding': face_data
-                        }
-                    except Exception as e:
-                        print(f"Error decoding face for {name} ({pid}): {e}")
-            return encodings
         except Exception as e:
             print(f"DB Error fetching encodings: {e}")
             return {}
         finally:
             conn.close()
+        return self._decode_gallery_rows(rows)
+
+    def _decode_gallery_rows(self, rows, dim=None):
+        """
+        rows: (person_id, name, embedding, embedding_dim, embedding_model)
+        Rows from another model or with a different dimension can't be compared and are skipped.
+        dim: expected dimension (default: the most common one among the rows)
+        """
+        usable = [r for r in rows if r[4] == FACE_DETECTION_MODEL]
+        if dim is None:
+            dims = [r[3] for r in usable]
+            dim = max(set(dims), key=dims.count) if dims else 0
+        for pid, name, _, row_dim, model in rows:
+            if model != FACE_DETECTION_MODEL or row_dim != dim:
+                print(f"Skipping face for {name} ({pid}): {model}/{row_dim}d, expected {FACE_DETECTION_MODEL}/{dim}d. Re-register.")
+        usable = [r for r in usable if r[3] == dim and len(r[2]) == dim * 4]
+
+        matrix = decode_embeddings([r[2] for r in usable], dim)
+        return {pid: {'name': name, 'encoding': matrix[i]} for i, (pid, name, _, _, _) in enumerate(usable)}
+
+    # --- GALLERY CHANGE LOG ---
+
+    def _log_person_change(self, cursor, person_id, op):
+        """Record a person change in the caller's transaction ('upsert' or 'delete')"""
+        cursor.execute('INSERT INTO person_changes (person_id, op) VALUES (%s, %s)', (person_id, op))
+
+    def get_gallery_version(self):
+        """Latest change_id (0 if none). Take it BEFORE loading the gallery so nothing is missed."""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COALESCE(MAX(change_id), 0) FROM person_changes')
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_gallery_changes(self, since_version, dim=None, applied=frozenset()):
+        """
+        Persons changed after since_version, in two cheap queries (PK range scan, then
+        only the changed rows).
+        change_id is assigned at insert but becomes visible at commit, so a lower id can
+        show up after a higher one was already read. The last GALLERY_SYNC_LAG_WINDOW ids
+        below since_version are re-read and those not in `applied` are picked up late.
+        The current persons row decides the outcome, so the order changes arrive in doesn't matter.
+        Returns: (new_version, {person_id: entry}, {deleted person_ids}, applied change_ids in the window)
+        dim: dimension of the caller's gallery, so incompatible embeddings are not mixed in
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT change_id, person_id FROM person_changes
+                WHERE change_id > %s ORDER BY change_id
+            ''', (max(0, since_version - GALLERY_SYNC_LAG_WINDOW),))
+            changes = [(cid, pid) for cid, pid in cursor.fetchall() if cid not in applied]
+            version = max([since_version] + [cid for cid, _ in changes])
+            window_start = version - GALLERY_SYNC_LAG_WINDOW
+            applied = {cid for cid in applied if cid > window_start} | {cid for cid, _ in changes if cid > window_start}
+            if not changes:
+                return version, {}, set(), applied
+
+            changed = list(dict.fromkeys(pid for _, pid in changes))
+            marks = ', '.join(['%s'] * len(changed))
+            cursor.execute(f"""
+                SELECT person_id, name, embedding, embedding_dim, embedding_model
+                FROM persons WHERE person_id IN ({marks}) AND embedding IS NOT NULL
+            """, changed)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        # Name/shift may have changed in another process
+        for pid in changed:
+            self.person_cache.pop(pid, None)
+
+        upserts = self._decode_gallery_rows(rows, dim) if rows else {}
+        deleted = {pid for pid in changed if pid not in upserts}
+        return version, upserts, deleted, applied
 
     def delete_person(self, person_id):
         """Delete a person and their logs"""
+        conn = None
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute('DELETE FROM persons WHERE person_id=%s', (person_id,))
+            deleted = cursor.rowcount > 0
+            self._log_person_change(cursor, person_id, 'delete')
             conn.commit()
+            if deleted:
+                self.stats.person_removed()
+            self.person_cache.pop(person_id, None)
+            self.day_state.remove_person(person_id)
+            self.report_cache.invalidate() # Their attendance went with them (cascade)
             return True, "Deleted Successfully"
         except Exception as e:
             return False, str(e)
         finally:
-            conn.close()
+            if conn is not None:
+                conn.close()
 
     # --- STATS & REPORTS (This was missing!) ---
 
-    def get_person_stats(self, person_id):
+    def get_person_stats(self, person_id, start_date=None, end_date=None):
         """
-        Calculate detailed stats: Late In, Early Out, Avg Hours
+        Calculate detailed stats: Late In, Early Out, Avg Hours.
+        Summed in SQL from attendance_daily (late/early judged against the shift in effect
+        that day); start_date / end_date ('YYYY-MM-DD', inclusive) limit the window.
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # 1. Get Person Details (Shift info)
-        cursor.execute('SELECT name, shift_start, shift_end FROM persons WHERE person_id = %s', (person_id,))
-        person = cursor.fetchone()
-        
-        if not person:
-            conn.close()
+        try:
+            stats = self._query_person_stats(person_id, start_date, end_date)
+        except self.backend.Error as e:
+            return None, str(e)
+        if person_id not in stats:
             return None, "Person not found"
-            
-        name, s_start_str, s_end_str = person
-        
-        # 2. Get All Attendance Records for this person
-        cursor.execute('SELECT arrival_time, leaving_time FROM attendance WHERE person_id = %s', (person_id,))
-        records = cursor.fetchall()
-        conn.close()
-        
-        # 3. Calculate Stats
-        total_days = len(records)
-        late_count = 0
-        early_out_count = 0
-        total_seconds_worked = 0
-        days_with_full_data = 0
-        
-        def parse_time(t_str, fmt='%H:%M:%S'):
-            try: return datetime.strptime(t_str, fmt)
-            except: return None
-            
+        return stats[person_id], "Success"
+
+    def get_all_person_stats(self, start_date=None, end_date=None):
+        """Same stats as get_person_stats for every person, in one query: {person_id: stats}"""
+        return self._query_person_stats(None, start_date, end_date)
+
+    def _query_person_stats(self, person_id, start_date, end_date):
+        # Window goes in the JOIN so persons without rows still get zeros
+        window, params = '', []
+        if start_date:
+            window += ' AND d.date >= %s'
+            params.append(start_date)
+        if end_date:
+            window += ' AND d.date <= %s'
+            params.append(end_date)
+        where = ''
+        if person_id is not None:
+            where = 'WHERE p.person_id = %s'
+            params.append(person_id)
+
+        conn = self.get_connection()
         try:
-            shift_start_dt = datetime.strptime(s_start_str, '%H:%M')
-            shift_end_dt = datetime.strptime(s_end_str, '%H:%M')
-        except:
-            return None, "Error parsing shift times in DB"
-
-        for arrival, leaving in records:
-            # Check Late
-            if arrival:
-                arr_dt = parse_time(arrival)
-                if arr_dt and arr_dt.time() > shift_start_dt.time():
-                    late_count += 1
-            
-            # Check Early Out & Avg Hours
-            if leaving:
-                leave_dt = parse_time(leaving)
-                if leave_dt:
-                    if leave_dt.time() < shift_end_dt.time():
-                        early_out_count += 1
-                    
-                    if arrival:
-                        arr_dt = parse_time(arrival)
-                        if arr_dt:
-                            duration = (leave_dt - arr_dt).total_seconds()
-                            if duration > 0:
-                                total_seconds_worked += duration
-                                days_with_full_data += 1
-
-        avg_hours = 0
-        if days_with_full_data > 0:
-            avg_hours = (total_seconds_worked / days_with_full_data) / 3600 
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT p.person_id, p.name, p.shift_start, p.shift_end,
+                       COUNT(d.person_id), COALESCE(SUM(d.is_late), 0), COALESCE(SUM(d.is_early), 0),
+                       AVG(CASE WHEN d.worked_seconds > 0 THEN d.worked_seconds END)
+                FROM persons p
+                LEFT JOIN attendance_daily d ON d.person_id = p.person_id{window}
+                {where}
+                GROUP BY p.person_id, p.name, p.shift_start, p.shift_end
+            ''', params)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
 
         return {
-            'name': name,
-            'id': person_id,
-            'shift': f"{s_start_str} - {s_end_str}",
-            'total_days': total_days,
-            'late': late_count,
-            'early': early_out_count,
-            'avg_hours': round(avg_hours, 1)
-        }, "Success"
+            pid: {
+                'name': name,
+                'id': pid,
+                'shift': f"{s_start} - {s_end}",
+                'total_days': int(total_days),
+                'late': int(late),
+                'early': int(early),
+                'avg_hours': round(float(avg_seconds) / 3600, 1) if avg_seconds else 0
+            }
+            for pid, name, s_start, s_end, total_days, late, early, avg_seconds in rows
+        }
 
     # --- DATA FETCHING ---
 
     def get_statistics(self):
-        today = date.today().isoformat()
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM persons')
-        total = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM attendance WHERE date = %s', (today,))
-        present = cursor.fetchone()[0]
-        conn.close()
-        return {'total_persons': total, 'present_today': present}
+        """Registered / present counts from memory (StatisticsService), safe to call every frame"""
+        return self.stats.get()
 
     def get_today_attendance(self):
-        today = date.today().isoformat()
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT a.person_id, p.name, a.arrival_time, a.leaving_time, a.status
-            FROM attendance a JOIN persons p ON a.person_id = p.person_id
-            WHERE a.date = %s ORDER BY a.arrival_time DESC
-        ''', (today,))
-        records = cursor.fetchall()
-        conn.close()
-        return records
+        """Today's rows from the in-memory day state (no DB hit once seeded)"""
+        return self.day_state.rows()
     
     def get_recent_logs(self):
-        """Fetch the detailed raw logs (Last 100 records)"""
+        """Latest presence intervals (last 100) as (ID, Name, Date, 'start - end')"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT person_id, name, date, time 
-            FROM face_logs 
-            ORDER BY id DESC LIMIT 100
-        ''')
-        records = cursor.fetchall()
-        conn.close()
-        return records
-    
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT person_id, name, date, start_time, end_time
+                FROM presence_intervals
+                ORDER BY end_time DESC LIMIT 100
+            ''')
+            rows = format_db_rows(cursor.fetchall())
+        finally:
+            conn.close()
+        return [(pid, name, day, f"{self._clock(start)} - {self._clock(end)}") for pid, name, day, start, end in rows]
+
+    @staticmethod
+    def _clock(value):
+        """'HH:MM:SS' part of a DATETIME (datetime from MySQL, text from SQLite)"""
+        return str(value)[11:19]
+
+    def get_presence_intervals(self, start_date, end_date, person_id=None):
+        """
+        Presence intervals for a date range.
+        Returns: [(date, name, person_id, camera_id, start, end, sightings)], oldest first
+        """
+        query = '''
+            SELECT date, name, person_id, camera_id, start_time, end_time, sightings
+            FROM presence_intervals
+            WHERE date BETWEEN %s AND %s
+        '''
+        params = [start_date, end_date]
+        if person_id and person_id != "All":
+            query += ' AND person_id = %s'
+            params.append(person_id)
+        query += ' ORDER BY person_id, start_time'
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, tuple(params))
+            return format_db_rows(cursor.fetchall())
+        finally:
+            conn.close()
+
+    def get_time_on_site(self, start_date, end_date, person_id=None):
+        """
+        Seconds each person was seen on site per day: union of their intervals across
+        cameras (being on two cameras at once is not counted twice).
+        Returns: {(person_id, date): seconds}
+        """
+        spans = {}
+        for day, _, pid, _, start, end, _ in self.get_presence_intervals(start_date, end_date, person_id):
+            spans.setdefault((pid, day), []).append((self._as_datetime(start), self._as_datetime(end)))
+        return {key: union_seconds(person_spans) for key, person_spans in spans.items()}
+
+    @staticmethod
+    def _as_datetime(value):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
     def get_all_persons_details(self):
         """Fetch all details for the Edit View"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT person_id, name, email, department, shift_start, shift_end 
-            FROM persons
-        ''')
-        records = cursor.fetchall()
-        conn.close()
-        return records
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT person_id, name, email, department, shift_start, shift_end 
+                FROM persons
+            ''')
+            return cursor.fetchall()
+        finally:
+            conn.close()
 
     def export_to_csv(self, filename):
         import csv
@@ -448,29 +703,111 @@ class DatabaseManager:
 
     def get_attendance_report(self, start_date, end_date, person_id=None):
         """
-        Fetch attendance records for a specific date range.
+        Fetch attendance records for a specific date range (attendance_daily index range read).
+        Closed days are served from the report cache, only today's rows are re-read after writes.
+        """
+        person_id = None if person_id == "All" else person_id or None
+        return self.report_cache.get('attendance_report', start_date, end_date, person_id,
+                                     lambda start, end: self._fetch_attendance_report(start, end, person_id),
+                                     newest_first=True)
+
+    def _fetch_attendance_report(self, start_date, end_date, person_id):
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(*self._attendance_report_query(start_date, end_date, person_id))
+            return format_db_rows(cursor.fetchall())
+        finally:
+            conn.close()
+
+    def iter_attendance_report(self, start_date, end_date, person_id=None, chunk_size=REPORT_EXPORT_CHUNK_SIZE):
+        """
+        Same rows as get_attendance_report, streamed from an unbuffered cursor in lists of
+        at most chunk_size, so memory does not grow with the date range (database/export.py).
+        Cached partitions are replayed; streamed ones are cached if they fit an entry.
         """
+        person_id = None if person_id == "All" else person_id or None
+        return self.report_cache.iter_chunks('attendance_report', start_date, end_date, person_id,
+                                             lambda start, end: self._stream_attendance_report(start, end, person_id, chunk_size),
+                                             chunk_size, newest_first=True)
+
+    def _stream_attendance_report(self, start_date, end_date, person_id, chunk_size):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
+        cursor = self.backend.stream_cursor(conn)
+        exhausted = False
+        try:
+            cursor.execute(*self._attendance_report_query(start_date, end_date, person_id))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    exhausted = True
+                    return
+                yield format_db_rows(rows)
+        finally:
+            if not exhausted:
+                self.backend.end_stream(conn, cursor) # Consumer stopped early
+            conn.close()
+
+    @staticmethod
+    def _attendance_report_query(start_date, end_date, person_id=None):
         query = '''
-            SELECT a.date, p.name, a.person_id, a.arrival_time, a.leaving_time, a.status
-            FROM attendance a 
-            JOIN persons p ON a.person_id = p.person_id
-            WHERE a.date BETWEEN %s AND %s
+            SELECT d.date, p.name, d.person_id, d.arrival_time, d.leaving_time, d.status
+            FROM attendance_daily d
+            JOIN persons p ON d.person_id = p.person_id
+            WHERE d.date BETWEEN %s AND %s
         '''
         params = [start_date, end_date]
         
-        if person_id and person_id != "All":
-            query += ' AND a.person_id = %s'
+        if person_id:
+            query += ' AND d.person_id = %s'
             params.append(person_id)
             
-        query += ' ORDER BY a.date DESC, a.arrival_time DESC'
-        
-        cursor.execute(query, tuple(params))
-        records = cursor.fetchall()
-        conn.close()
-        return records
+        query += ' ORDER BY d.date DESC, d.arrival_time DESC'
+        return query, tuple(params)
+
+    def get_all_attendance(self, start_date=None, end_date=None):
+        """
+        Attendance with precomputed figures from attendance_daily, oldest first.
+        Returns: [(person_id, name, date, arrival, leaving, status, worked_seconds, is_late, is_early)]
+        """
+        return self.report_cache.get('attendance_daily', start_date, end_date, None,
+                                     lambda start, end: self._query_attendance_daily(None, start, end))
+
+    def get_person_attendance(self, person_id, start_date=None, end_date=None):
+        """Same rows as get_all_attendance for one person (primary key range read)"""
+        return self.report_cache.get('attendance_daily', start_date, end_date, person_id,
+                                     lambda start, end: self._query_attendance_daily(person_id, start, end))
+
+    def _query_attendance_daily(self, person_id, start_date, end_date):
+        conditions, params = [], []
+        if person_id is not None:
+            conditions.append('d.person_id = %s')
+            params.append(person_id)
+        if start_date:
+            conditions.append('d.date >= %s')
+            params.append(start_date)
+        if end_date:
+            conditions.append('d.date <= %s')
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT d.person_id, p.name, d.date, d.arrival_time, d.leaving_time, d.status,
+                       d.worked_seconds, d.is_late, d.is_early
+                FROM attendance_daily d JOIN persons p ON d.person_id = p.person_id
+                {where}
+                ORDER BY d.date, d.person_id
+            ''', params)
+            return format_db_rows(cursor.fetchall())
+        finally:
+            conn.close()
+
+    def refresh_attendance_daily(self, cursor, where, params):
+        """Recompute attendance_daily for attendance rows matching `where` (alias `a`), in the caller's transaction"""
+        refresh_attendance_daily(cursor, self.backend, where, params)
 
     def export_to_pdf(self, data, filename, title="Attendance Report"):
         """
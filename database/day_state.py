@@ -0,0 +1,146 @@
+import time
+import threading
+from datetime import date
+from database.formatting import format_db_rows
+from config.config import DAY_STATE_MAX_AGE_SECONDS
+
+class DayStateCache:
+    """
+    In-process view of today's attendance:
+        person_id -> {'name', 'arrival', 'last_seen', 'status', 'shift_end'}
+    Seeded with one query at startup, then kept current by the attendance write path.
+    Reads never touch the DB: the dashboard, CLI and API are served from memory.
+    Reloading is left to refresh(), run by StatisticsService's background thread: at day
+    rollover, after invalidate(), and once the view is max_age seconds old, since attendance
+    written by another process (GUI, CLI app, API server) only reaches this one through the DB.
+    """
+    def __init__(self, db_manager, max_age=DAY_STATE_MAX_AGE_SECONDS):
+        self.db_manager = db_manager
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.day = None
+        self.entries = {}
+        self.last_seed_attempt = 0
+        self.stale = threading.Event() # Set by invalidate(): wakes the refresh thread early
+        self.seeding = None # Writes applied while a seed query runs, replayed onto its result
+
+    def seed(self):
+        """(Re)load today's rows with a single query (run outside the lock: reads are not held up)"""
+        today = date.today().isoformat()
+        with self.lock:
+            self.last_seed_attempt = time.time()
+            self.stale.clear()
+            self.seeding = []
+        entries = None
+        try:
+            conn = self.db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT a.person_id, p.name, a.arrival_time, a.leaving_time, a.status, p.shift_end
+                    FROM attendance a JOIN persons p ON a.person_id = p.person_id
+                    WHERE a.date = %s
+                ''', (today,))
+                entries = {
+                    pid: {'name': name, 'arrival': arrival, 'last_seen': leaving,
+                          'status': status, 'shift_end': shift_end}
+                    for pid, name, arrival, leaving, status, shift_end in format_db_rows(cursor.fetchall())
+                }
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Day State Error: {e}")
+        with self.lock:
+            raced, self.seeding = self.seeding, None
+            if entries is None:
+                return False
+            self.entries = entries
+            self.day = today
+            for apply, args in raced: # Committed after the query may have run
+                apply(*args)
+            return True
+
+    def refresh(self, force=False):
+        """Reseed if due (new day, invalidated, max_age old, or force). Called from the background thread."""
+        with self.lock:
+            today = date.today().isoformat()
+            if self.day is not None and self.day != today:
+                # Day rollover: yesterday's view is dropped even if the reload fails
+                self.entries = {}
+                self.day = None
+            due = force or self.day is None or self.stale.is_set() or \
+                (self.max_age and time.time() - self.last_seed_attempt >= self.max_age)
+            self.stale.clear()
+        if not due:
+            return False
+        journal = getattr(self.db_manager, 'journal', None)
+        # Journaled attendance is only in this view until it is replayed: don't drop it
+        if self.day is not None and journal and journal.pending_count():
+            return False
+        return self.seed()
+
+    def invalidate(self):
+        """Reload soon (e.g. attendance edited through the API); the current view is served until then"""
+        self.stale.set()
+
+    def is_current(self, day=None):
+        """True if the cache holds an up-to-date view of `day` (default: today)"""
+        self._ensure_today()
+        return self.day is not None and self.day == (day or date.today().isoformat())
+
+    def _ensure_today(self):
+        """Memory only: at day rollover drop yesterday's view (refresh() loads the new day)"""
+        with self.lock:
+            if self.day is not None and self.day != date.today().isoformat():
+                self.entries = {}
+                self.day = None
+
+    # --- WRITE PATH ---
+
+    def record(self, person_id, day, first_seen, last_seen, name=None, shift_end=None):
+        """Apply a committed attendance write (login or leaving-time update)"""
+        with self.lock:
+            if self.seeding is not None:
+                self.seeding.append((self.record, (person_id, day, first_seen, last_seen, name, shift_end)))
+            if day != self.day:
+                return
+            entry = self.entries.get(person_id)
+            if entry is None:
+                self.entries[person_id] = {'name': name, 'arrival': first_seen, 'last_seen': last_seen,
+                                           'status': 'Present', 'shift_end': shift_end}
+            else:
+                entry['arrival'] = min(entry['arrival'] or first_seen, first_seen)
+                entry['last_seen'] = max(entry['last_seen'] or last_seen, last_seen)
+                if name: entry['name'] = name
+
+    def remove_person(self, person_id):
+        with self.lock:
+            if self.seeding is not None:
+                self.seeding.append((self.remove_person, (person_id,)))
+            self.entries.pop(person_id, None)
+
+    # --- READ PATH ---
+
+    def is_present(self, person_id):
+        self._ensure_today()
+        with self.lock:
+            return person_id in self.entries
+
+    def get(self, person_id):
+        self._ensure_today()
+        with self.lock:
+            entry = self.entries.get(person_id)
+            return dict(entry) if entry else None
+
+    def present_count(self):
+        self._ensure_today()
+        with self.lock:
+            return len(self.entries)
+
+    def rows(self):
+        """Same shape/order as the old get_today_attendance query: (id, name, arrival, leaving, status)"""
+        self._ensure_today()
+        with self.lock:
+            rows = [(pid, e['name'], e['arrival'], e['last_seen'], e['status']) for pid, e in self.entries.items()]
+        rows.sort(key=lambda r: r[2] or '', reverse=True)
+        return rows
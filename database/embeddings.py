@@ -0,0 +1,44 @@
+import io
+import pickle
+import base64
+import numpy as np
+
+EMBEDDING_DTYPE = np.dtype('<f4') # Little-endian float32, independent of the host
+
+def encode_embedding(embedding):
+    """ndarray/list -> (raw float32 bytes, dimension) for the BLOB columns"""
+    vector = np.asarray(embedding, dtype=EMBEDDING_DTYPE).ravel()
+    return vector.tobytes(), int(vector.shape[0])
+
+def decode_embeddings(blobs, dim):
+    """
+    Bulk decode: one join + one np.frombuffer for all rows.
+    Returns a read-only (len(blobs), dim) float32 matrix; row i is blobs[i].
+    """
+    if not blobs:
+        return np.empty((0, dim), dtype=EMBEDDING_DTYPE)
+    return np.frombuffer(b''.join(blobs), dtype=EMBEDDING_DTYPE).reshape(len(blobs), dim)
+
+def decode_embedding(blob):
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+# --- LEGACY base64(pickle) FORMAT (migration only) ---
+
+class _NumpyOnlyUnpickler(pickle.Unpickler):
+    """Refuses anything but the numpy classes an ndarray pickle refers to"""
+    ALLOWED = {
+        ('numpy', 'ndarray'), ('numpy', 'dtype'),
+        ('numpy.core.multiarray', '_reconstruct'), ('numpy._core.multiarray', '_reconstruct'),
+        ('numpy.core.multiarray', 'scalar'), ('numpy._core.multiarray', 'scalar'),
+        ('numpy.core.numeric', '_frombuffer'), ('numpy._core.numeric', '_frombuffer'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name}")
+        return super().find_class(module, name)
+
+def decode_legacy_embedding(text):
+    """base64(pickle.dumps(ndarray)) as written before the BLOB columns -> float32 vector"""
+    data = _NumpyOnlyUnpickler(io.BytesIO(base64.b64decode(text))).load()
+    return np.asarray(data, dtype=EMBEDDING_DTYPE).ravel()
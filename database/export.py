@@ -0,0 +1,148 @@
+"""
+Streaming attendance report export.
+
+Rows are read from an unbuffered cursor REPORT_EXPORT_CHUNK_SIZE at a time
+(DatabaseManager.iter_attendance_report) and handed straight to a writer, so memory
+stays flat however long the date range is:
+  - csv:   one line per row
+  - jsonl: one JSON object per row
+  - pdf:   REPORT_PDF_ROWS_PER_PAGE rows per page, each page laid out on its own (no
+           document-wide table to split). ReportLab keeps the finished, compressed pages
+           until save(), so PDF memory still grows with the page count (about the size
+           of the output file)
+"""
+import os
+import csv
+import json
+import time
+
+from config.config import REPORT_EXPORT_CHUNK_SIZE, REPORT_PDF_ROWS_PER_PAGE
+
+REPORT_HEADER = ['Date', 'Name', 'ID', 'Arrival', 'Leaving', 'Status']
+JSON_KEYS = ['date', 'name', 'person_id', 'arrival_time', 'leaving_time', 'status']
+
+
+class CsvReportWriter:
+    def __init__(self, path, title=None):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(REPORT_HEADER)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesReportWriter:
+    def __init__(self, path, title=None):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, rows):
+        self.file.writelines(json.dumps(dict(zip(JSON_KEYS, row)), default=str) + '\n' for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class PdfReportWriter:
+    """Same table look as DatabaseManager.export_to_pdf, drawn page by page on a canvas"""
+    MARGIN = 40
+    COLUMN_WIDTHS = [70, 170, 80, 70, 70, 72]
+
+    def __init__(self, path, title="Attendance Report", rows_per_page=REPORT_PDF_ROWS_PER_PAGE):
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import Table, TableStyle
+
+        self.Table = Table
+        self.style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ])
+        self.page_width, self.page_height = letter
+        self.canvas = canvas.Canvas(path, pagesize=letter, pageCompression=1)
+        self.title = title
+        self.rows_per_page = rows_per_page
+        self.pending = []
+        self.pages = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.pending.append([str(item) if item is not None else "" for item in row])
+            if len(self.pending) >= self.rows_per_page:
+                self._draw_page()
+
+    def _draw_page(self):
+        c = self.canvas
+        top = self.page_height - self.MARGIN
+        if self.pages == 0:
+            c.setFont('Helvetica-Bold', 18)
+            c.drawCentredString(self.page_width / 2, top - 18, self.title)
+            top -= 40
+
+        table = self.Table([REPORT_HEADER] + self.pending, colWidths=self.COLUMN_WIDTHS)
+        table.setStyle(self.style)
+        _, height = table.wrapOn(c, self.page_width - 2 * self.MARGIN, top - self.MARGIN)
+        table.drawOn(c, self.MARGIN, top - height)
+
+        self.pages += 1
+        c.setFont('Helvetica', 8)
+        c.drawCentredString(self.page_width / 2, self.MARGIN / 2, f"Page {self.pages}")
+        c.showPage()
+        self.pending = []
+
+    def close(self):
+        if self.pending or self.pages == 0:
+            self._draw_page()
+        self.canvas.save()
+
+
+WRITERS = {
+    'csv': CsvReportWriter,
+    'jsonl': JsonLinesReportWriter,
+    'pdf': PdfReportWriter,
+}
+
+
+def export_attendance_report(db_manager, path, fmt, start_date, end_date, person_id=None,
+                             title="Attendance Report", chunk_size=REPORT_EXPORT_CHUNK_SIZE):
+    """
+    Stream get_attendance_report's rows for the range into `path` as csv / jsonl / pdf.
+    Returns: (success, message, stats) with stats {'rows', 'seconds', 'rows_per_second'}
+    """
+    stats = {'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    if fmt not in WRITERS:
+        return False, f"Unknown export format: {fmt}", stats
+
+    started = time.perf_counter()
+    try:
+        writer = WRITERS[fmt](path, title=title)
+    except ImportError:
+        return False, "ReportLab not installed. Cannot generate PDF.", stats
+    except OSError as e:
+        return False, str(e), stats
+
+    try:
+        for rows in db_manager.iter_attendance_report(start_date, end_date, person_id, chunk_size=chunk_size):
+            writer.write_rows(rows)
+            stats['rows'] += len(rows)
+        writer.close()
+    except Exception as e:
+        try:
+            writer.close()
+            os.remove(path) # Don't leave a half-written report behind
+        except Exception:
+            pass
+        return False, str(e), stats
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    return True, f"{fmt.upper()} Exported: {path} ({stats['rows']:,} rows)", stats
@@ -0,0 +1,25 @@
+from datetime import date, datetime, timedelta
+
+def format_db_value(value):
+    """
+    Typed DATE/TIME columns come back from mysql.connector as date / timedelta.
+    Callers (GUI tables, CSV/PDF, JSON API) expect the 'YYYY-MM-DD' / 'HH:MM:SS' strings
+    the VARCHAR schema used to return, so convert them here.
+    """
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def format_db_row(row):
+    """format_db_value() applied to a tuple row or a dictionary row"""
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return {k: format_db_value(v) for k, v in row.items()}
+    return tuple(format_db_value(v) for v in row)
+
+def format_db_rows(rows):
+    return [format_db_row(r) for r in rows]
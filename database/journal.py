@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from config.config import JOURNAL_REPLAY_INTERVAL, JOURNAL_REPLAY_BATCH
+from database.embeddings import encode_embedding, decode_embedding
+
+class OfflineJournal:
+    """
+    Local append-only buffer (SQLite, WAL mode) for writes that could not reach MySQL.
+    Event kinds and their rows (same shapes the DatabaseManager batch methods take):
+        'log'        (person_id, name, captured_at datetime)
+        'attendance' (person_id, date_str, first_seen, last_seen)
+        'unknown'    (snapshot_path, embedding, captured_at datetime)
+        'presence'   (person_id, name, camera_id, start datetime, end datetime, sightings)
+    Rows are kept in arrival order and deleted once replayed (see JournalReplayer).
+    """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL') # Durable across app crashes, cheap fsyncs
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                data BLOB,
+                created_at REAL NOT NULL
+            )
+        ''')
+        # Events the server rejected (not a connectivity problem): kept for inspection
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS failed_events (
+                seq INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                data BLOB,
+                created_at REAL NOT NULL,
+                error TEXT,
+                failed_at REAL NOT NULL
+            )
+        ''')
+        self.stats = {'appended': 0, 'replayed': 0, 'failed': 0}
+
+    # --- ENCODING ---
+
+    @staticmethod
+    def _encode(kind, row):
+        if kind == 'log':
+            pid, name, ts = row
+            return json.dumps([pid, name, ts.isoformat()]), None
+        if kind == 'unknown':
+            path, embedding, ts = row
+            return json.dumps([path, (ts or datetime.now()).isoformat()]), encode_embedding(embedding)[0]
+        if kind == 'presence':
+            pid, name, camera_id, start, end, sightings = row
+            return json.dumps([pid, name, camera_id, start.isoformat(), end.isoformat(), sightings]), None
+        return json.dumps(list(row)), None
+
+    @staticmethod
+    def _decode(kind, payload, data):
+        values = json.loads(payload)
+        if kind == 'log':
+            return (values[0], values[1], datetime.fromisoformat(values[2]))
+        if kind == 'unknown':
+            return (values[0], decode_embedding(data), datetime.fromisoformat(values[1]))
+        if kind == 'presence':
+            return (values[0], values[1], values[2], datetime.fromisoformat(values[3]),
+                    datetime.fromisoformat(values[4]), values[5])
+        return tuple(values)
+
+    # --- WRITE / READ ---
+
+    def append(self, kind, rows):
+        """Buffer rows in one transaction"""
+        now = time.time()
+        params = [(kind, *self._encode(kind, row), now) for row in rows]
+        with self.lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany(
+                    'INSERT INTO events (kind, payload, data, created_at) VALUES (?, ?, ?, ?)', params)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.stats['appended'] += len(params)
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def read_batch(self, limit):
+        """Oldest events first: [(seq, kind, row)]"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT seq, kind, payload, data FROM events ORDER BY seq LIMIT ?', (limit,)).fetchall()
+        return [(seq, kind, self._decode(kind, payload, data)) for seq, kind, payload, data in rows]
+
+    def ack(self, seqs):
+        """Delete replayed events"""
+        with self.lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('DELETE FROM events WHERE seq = ?', [(s,) for s in seqs])
+            self.conn.execute('COMMIT')
+            self.stats['replayed'] += len(seqs)
+
+    def move_to_failed(self, seqs, error):
+        with self.lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO failed_events (seq, kind, payload, data, created_at, error, failed_at)
+                SELECT seq, kind, payload, data, created_at, ?, ? FROM events WHERE seq = ?
+            ''', [(str(error), time.time(), s) for s in seqs])
+            self.conn.executemany('DELETE FROM events WHERE seq = ?', [(s,) for s in seqs])
+            self.conn.execute('COMMIT')
+            self.stats['failed'] += len(seqs)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['pending'] = self.pending_count()
+        return stats
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JournalReplayer:
+    """
+    Background thread that drains the journal into MySQL in batches once it is reachable.
+    Consecutive events of the same kind are replayed with one DatabaseManager.replay_events
+    call. Replays are idempotent (event_uid + INSERT IGNORE, LEAST/GREATEST attendance
+    upsert), so a batch that is applied but not acknowledged can safely be sent again.
+    """
+    def __init__(self, journal, db_manager, interval=JOURNAL_REPLAY_INTERVAL, batch_size=JOURNAL_REPLAY_BATCH):
+        self.journal = journal
+        self.db_manager = db_manager
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _worker(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                while self.replay_once() and not self.stop_event.is_set():
+                    pass # Keep draining while full batches go through
+            except Exception as e:
+                print(f"Journal Replay Error: {e}")
+
+    def replay_once(self):
+        """Replay one batch. Returns True if a full batch was replayed (more may be waiting)."""
+        events = self.journal.read_batch(self.batch_size)
+        if not events:
+            return False
+
+        # Split into runs of the same kind, keeping order
+        runs = []
+        for seq, kind, row in events:
+            if runs and runs[-1][0] == kind:
+                runs[-1][1].append((seq, row))
+            else:
+                runs.append((kind, [(seq, row)]))
+
+        for kind, run in runs:
+            if not self._replay_run(kind, run):
+                return False # Server unreachable again: retry later
+
+        print(f"[JOURNAL] Replayed {len(events)} buffered events")
+        return len(events) == self.batch_size
+
+    def _replay_run(self, kind, run):
+        try:
+            self.db_manager.replay_events(kind, [row for _, row in run])
+            self.journal.ack([seq for seq, _ in run])
+            return True
+        except Exception as e:
+            if self.db_manager.is_connectivity_error(e):
+                return False
+            if len(run) == 1:
+                print(f"[JOURNAL] ✗ Event {run[0][0]} rejected: {e}")
+                self.journal.move_to_failed([run[0][0]], e)
+                return True
+
+        # One bad row (e.g. person deleted meanwhile) must not block the rest
+        for item in run:
+            if not self._replay_run(kind, [item]):
+                return False
+        return True
@@ -0,0 +1,290 @@
+"""
+Retention, rollup and purge jobs for the log tables.
+
+For every table in RETENTION_DAYS, rows older than the cutoff are removed in small
+batches (one short transaction each, MAINTENANCE_BATCH_PAUSE in between):
+  - face_logs, presence_intervals: each day is first rolled up into presence_daily
+    (first/last seen, rows, sightings and seconds on site per person), then deleted
+  - unknown_faces: rows together with their snapshot JPEGs
+  - person_changes: old gallery change-log entries
+  - alert_log: which absence / late / summary alerts were sent on old days
+Snapshot files in UNKNOWN_FACES_DIR that no row refers to are removed too. Each run
+reports the rows and bytes reclaimed per table (table bytes are estimated from its
+average row size). The GUI and CLI app run it every MAINTENANCE_INTERVAL_HOURS; by hand:
+    python -m database.maintenance             # apply retention
+    python -m database.maintenance --dry-run   # only report what would be removed
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.config import (RETENTION_DAYS, MAINTENANCE_INTERVAL_HOURS, MAINTENANCE_START_DELAY,
+                           MAINTENANCE_BATCH_SIZE, MAINTENANCE_BATCH_PAUSE, SNAPSHOT_ORPHAN_GRACE,
+                           UNKNOWN_FACES_DIR)
+from database.presence import union_seconds
+
+LOCK_NAME = 'attendance_maintenance'
+
+# table -> (age column, key column, rollup kind or None)
+RETENTION_TABLES = {
+    'face_logs': ('date', 'id', 'logs'),
+    'presence_intervals': ('date', 'id', 'intervals'),
+    'unknown_faces': ('timestamp', 'id', None),
+    'person_changes': ('changed_at', 'change_id', None),
+    'alert_log': ('date', 'id', None),
+}
+
+
+class MaintenanceRunner:
+    """Applies the retention policy on one dedicated connection"""
+    def __init__(self, db_manager, retention=None, batch_size=MAINTENANCE_BATCH_SIZE,
+                 pause=MAINTENANCE_BATCH_PAUSE, snapshot_dir=UNKNOWN_FACES_DIR):
+        self.db_manager = db_manager
+        self.backend = db_manager.backend
+        self.retention = RETENTION_DAYS if retention is None else retention
+        self.batch_size = batch_size
+        self.pause = pause
+        self.snapshot_dir = snapshot_dir
+        self.conn = None
+
+    # --- ENTRY POINT ---
+
+    def run(self, dry_run=False, today=None):
+        """
+        Purge every table with a retention period, then orphaned snapshot files.
+        Returns: {table: {'rows', 'bytes', 'days_rolled_up', 'files', 'file_bytes'}}
+        """
+        report = {}
+        today = today or date.today()
+        self.conn = self.db_manager.get_connection()
+        try:
+            cursor = self.conn.cursor()
+            # GUI, CLI and API may all schedule it: only one process runs at a time
+            if not self.backend.try_lock(cursor, LOCK_NAME):
+                print("[MAINTENANCE] Another process is running maintenance, skipping")
+                return report
+            try:
+                for table, days in self.retention.items():
+                    if days is None or table not in RETENTION_TABLES:
+                        continue
+                    report[table] = self._purge_table(table, today - timedelta(days=days), dry_run)
+                report['orphan_snapshots'] = self._purge_orphan_snapshots(dry_run)
+            finally:
+                self.backend.release_lock(cursor, LOCK_NAME)
+        except self.backend.Error as e:
+            print(f"[MAINTENANCE] ✗ Error: {e}")
+        finally:
+            self.conn.close()
+            self.conn = None
+        self.print_report(report, dry_run)
+        return report
+
+    # --- SQL HELPERS ---
+
+    def _query(self, sql, params=None):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _execute(self, sql, params=None, many=False):
+        cursor = self.conn.cursor()
+        try:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            self.conn.commit()
+        finally:
+            cursor.close()
+
+    # --- TABLES ---
+
+    def _purge_table(self, table, cutoff, dry_run):
+        age_col, key_col, rollup = RETENTION_TABLES[table]
+        # Works for DATE columns and, compared as 'YYYY-MM-DD 00:00:00', for DATETIME ones
+        limit = cutoff.isoformat() if age_col == 'date' else f"{cutoff.isoformat()} 00:00:00"
+        stats = {'rows': 0, 'bytes': 0, 'days_rolled_up': 0, 'files': 0, 'file_bytes': 0}
+
+        cursor = self.conn.cursor()
+        try:
+            table_rows, table_bytes = self.backend.table_size(cursor, table)
+        finally:
+            cursor.close()
+        row_bytes = table_bytes / table_rows if table_rows else 0
+
+        if dry_run:
+            stats['rows'] = self._query(f'SELECT COUNT(*) FROM {table} WHERE {age_col} < %s', (limit,))[0][0]
+        elif rollup:
+            days = [d for (d,) in self._query(
+                f'SELECT DISTINCT {age_col} FROM {table} WHERE {age_col} < %s ORDER BY {age_col}', (limit,))]
+            for day in days:
+                self._rollup_day(rollup, day)
+                stats['days_rolled_up'] += 1
+                stats['rows'] += self._delete_batches(table, key_col, f'{age_col} = %s', (day,), stats)
+        else:
+            stats['rows'] = self._delete_batches(table, key_col, f'{age_col} < %s', (limit,), stats)
+
+        stats['bytes'] = int(stats['rows'] * row_bytes)
+        return stats
+
+    def _delete_batches(self, table, key_col, where, params, stats):
+        """Delete matching rows batch_size at a time (unknown_faces: and their snapshot files)"""
+        snapshots = table == 'unknown_faces'
+        columns = f'{key_col}, snapshot_path' if snapshots else key_col
+        deleted = 0
+        while True:
+            rows = self._query(f'''
+                SELECT {columns} FROM {table} WHERE {where} ORDER BY {key_col} LIMIT {int(self.batch_size)}
+            ''', params)
+            if not rows:
+                break
+            marks = ', '.join(['%s'] * len(rows))
+            self._execute(f'DELETE FROM {table} WHERE {key_col} IN ({marks})', [r[0] for r in rows])
+            deleted += len(rows)
+            if snapshots:
+                for _, path in rows:
+                    self._remove_file(path, stats)
+            if len(rows) < self.batch_size:
+                break
+            time.sleep(self.pause) # Let live writes in between batches
+        return deleted
+
+    # --- ROLLUP ---
+
+    def _rollup_day(self, kind, day):
+        """Fold one day of face_logs / presence_intervals into presence_daily (safe to repeat)"""
+        if kind == 'logs':
+            rows = [(pid, day, first, last, count, 0, 0, 0) for pid, first, last, count in self._query('''
+                SELECT person_id, MIN(time), MAX(time), COUNT(*) FROM face_logs
+                WHERE date = %s AND person_id IS NOT NULL GROUP BY person_id
+            ''', (day,))]
+        else:
+            persons = {}
+            for pid, start, end, sightings in self._query('''
+                SELECT person_id, start_time, end_time, sightings FROM presence_intervals WHERE date = %s
+            ''', (day,)):
+                persons.setdefault(pid, []).append((self.db_manager._as_datetime(start),
+                                                    self.db_manager._as_datetime(end), sightings))
+            rows = [
+                (pid, day, min(s for s, _, _ in spans).strftime('%H:%M:%S'),
+                 max(e for _, e, _ in spans).strftime('%H:%M:%S'), 0, len(spans),
+                 sum(n for _, _, n in spans), int(union_seconds([(s, e) for s, e, _ in spans])))
+                for pid, spans in persons.items()
+            ]
+        if not rows:
+            return
+
+        # A day interrupted half-way is rolled up again from fewer rows: keep the larger figures
+        b = self.backend
+        new = b.excluded
+        self._execute(f'''
+            INSERT INTO presence_daily (person_id, date, first_seen, last_seen, log_rows, intervals, sightings, seconds_on_site)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            {b.upsert(['person_id', 'date'])}
+                first_seen = {b.least}(COALESCE(first_seen, {new('first_seen')}), COALESCE({new('first_seen')}, first_seen)),
+                last_seen = {b.greatest}(COALESCE(last_seen, {new('last_seen')}), COALESCE({new('last_seen')}, last_seen)),
+                log_rows = {b.greatest}(log_rows, {new('log_rows')}),
+                intervals = {b.greatest}(intervals, {new('intervals')}),
+                sightings = {b.greatest}(sightings, {new('sightings')}),
+                seconds_on_site = {b.greatest}(seconds_on_site, {new('seconds_on_site')})
+        ''', rows, many=True)
+
+    # --- SNAPSHOT FILES ---
+
+    @staticmethod
+    def _norm(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _remove_file(self, path, stats, dry_run=False):
+        if not path:
+            return
+        try:
+            size = os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+        except OSError:
+            return # Already gone
+        stats['files'] += 1
+        stats['file_bytes'] += size
+
+    def _purge_orphan_snapshots(self, dry_run):
+        """Snapshot JPEGs no unknown_faces row refers to (older than SNAPSHOT_ORPHAN_GRACE)"""
+        stats = {'rows': 0, 'bytes': 0, 'days_rolled_up': 0, 'files': 0, 'file_bytes': 0}
+        if not os.path.isdir(self.snapshot_dir):
+            return stats
+        referenced = {self._norm(p) for (p,) in self._query(
+            'SELECT snapshot_path FROM unknown_faces WHERE snapshot_path IS NOT NULL')}
+        # A fresh file may belong to a row still queued in SnapshotWriter
+        oldest = time.time() - SNAPSHOT_ORPHAN_GRACE
+        for entry in os.scandir(self.snapshot_dir):
+            if entry.is_file() and entry.stat().st_mtime < oldest and self._norm(entry.path) not in referenced:
+                self._remove_file(entry.path, stats, dry_run)
+        return stats
+
+    # --- REPORT ---
+
+    @staticmethod
+    def print_report(report, dry_run=False):
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        total_rows = total_bytes = 0
+        for table, stats in report.items():
+            total_rows += stats['rows']
+            total_bytes += stats['bytes'] + stats['file_bytes']
+            parts = [] if table == 'orphan_snapshots' else [f"{stats['rows']:,} rows (~{stats['bytes'] / 1e6:.1f} MB)"]
+            if stats['days_rolled_up']:
+                parts.append(f"{stats['days_rolled_up']} day(s) rolled up")
+            if stats['files']:
+                parts.append(f"{stats['files']:,} snapshot file(s) ({stats['file_bytes'] / 1e6:.1f} MB)")
+            if not parts:
+                continue
+            print(f"[MAINTENANCE] {table}: {', '.join(parts)}")
+        print(f"[MAINTENANCE] ✓ {verb} {total_rows:,} rows, ~{total_bytes / 1e6:.1f} MB")
+
+
+class MaintenanceScheduler:
+    """Runs MaintenanceRunner every MAINTENANCE_INTERVAL_HOURS in a background thread"""
+    def __init__(self, db_manager, interval_hours=MAINTENANCE_INTERVAL_HOURS, start_delay=MAINTENANCE_START_DELAY):
+        self.runner = MaintenanceRunner(db_manager)
+        self.interval = interval_hours * 3600
+        self.start_delay = start_delay
+        self.last_report = None
+        self.last_run = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self._worker, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _worker(self):
+        delay = self.start_delay
+        while not self.stop_event.wait(delay):
+            try:
+                self.last_report = self.runner.run()
+                self.last_run = time.time()
+            except Exception as e:
+                print(f"Maintenance Error: {e}")
+            delay = self.interval
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply data retention to the log tables")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed")
+    args = parser.parse_args()
+
+    from database.database import DatabaseManager
+    MaintenanceRunner(DatabaseManager()).run(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
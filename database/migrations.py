@@ -0,0 +1,377 @@
+"""
+Versioned schema migrations for the MySQL database.
+
+Applied versions are recorded in `schema_migrations`. DatabaseManager runs pending
+migrations at startup (AUTO_MIGRATE); they can also be run by hand:
+    python -m database.migrations            # apply pending
+    python -m database.migrations --status   # list applied / pending
+
+Column type changes run online:
+  1. add shadow columns (<col>__new) with the target type
+  2. copy existing rows in primary-key batches (one short transaction each)
+  3. catch up rows written by the live system meanwhile
+  4. under a short table lock: final catch-up, then swap the columns in one ALTER
+Every step checks the current schema first, so an interrupted run resumes where it stopped,
+and a fresh install (already created with typed columns) only gets recorded.
+"""
+import os
+import sys
+import time
+import argparse
+import mysql.connector
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.config import MIGRATION_BATCH_SIZE, MIGRATION_BATCH_PAUSE, FACE_DETECTION_MODEL
+from database.embeddings import encode_embedding, decode_legacy_embedding
+
+LOCK_NAME = 'attendance_schema_migrations'
+
+# VARCHAR -> typed value; anything that does not look like a date/time becomes NULL
+CAST_EXPRESSIONS = {
+    'DATE': "CASE WHEN {col} REGEXP '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}$' THEN CAST({col} AS DATE) END",
+    'TIME': "CASE WHEN {col} REGEXP '^[0-9]{{1,2}}:[0-9]{{2}}(:[0-9]{{2}})?$' THEN CAST({col} AS TIME) END",
+}
+
+
+class MigrationError(Exception):
+    pass
+
+
+class MigrationRunner:
+    """Applies MIGRATIONS in order on a dedicated pooled connection"""
+    def __init__(self, db_manager, batch_size=MIGRATION_BATCH_SIZE, pause=MIGRATION_BATCH_PAUSE):
+        self.db_manager = db_manager
+        self.batch_size = batch_size
+        self.pause = pause
+        self.conn = None
+
+    # --- ENTRY POINTS ---
+
+    def run_pending(self):
+        """Apply every migration not yet recorded. Returns the list of versions applied."""
+        applied_now = []
+        self.conn = self.db_manager.get_connection()
+        try:
+            self._ensure_table()
+            # Several processes (GUI, API, CLI) may start together: only one migrates
+            if not self._query('SELECT GET_LOCK(%s, 0)', (LOCK_NAME,))[0][0]:
+                print("[MIGRATIONS] Another process is migrating, skipping")
+                return applied_now
+            try:
+                applied = self._applied_versions()
+                for version, description, migrate in MIGRATIONS:
+                    if version in applied:
+                        continue
+                    print(f"[MIGRATIONS] Applying {version}: {description}")
+                    start = time.time()
+                    migrate(self)
+                    duration = time.time() - start
+                    self._execute('''
+                        INSERT INTO schema_migrations (version, description, applied_at, duration_seconds)
+                        VALUES (%s, %s, NOW(), %s)
+                    ''', (version, description, duration))
+                    print(f"[MIGRATIONS] ✓ {version} done in {duration:.1f}s")
+                    applied_now.append(version)
+            finally:
+                self._query('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
+        except (mysql.connector.Error, MigrationError) as e:
+            print(f"[MIGRATIONS] ✗ Error: {e}")
+        finally:
+            self.conn.close()
+            self.conn = None
+        return applied_now
+
+    def status(self):
+        """[(version, description, applied_at or None)] for every known migration"""
+        self.conn = self.db_manager.get_connection()
+        try:
+            self._ensure_table()
+            rows = self._query('SELECT version, applied_at FROM schema_migrations')
+            applied = {version: applied_at for version, applied_at in rows}
+            return [(version, description, applied.get(version)) for version, description, _ in MIGRATIONS]
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    # --- SQL HELPERS ---
+
+    def _query(self, sql, params=None):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _execute(self, sql, params=None):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            self.conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def _execute_many(self, sql, params):
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(sql, params)
+            self.conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def _ensure_table(self):
+        self._execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(64) PRIMARY KEY,
+                description VARCHAR(255),
+                applied_at DATETIME NOT NULL,
+                duration_seconds FLOAT
+            )
+        ''')
+
+    def _applied_versions(self):
+        return {row[0] for row in self._query('SELECT version FROM schema_migrations')}
+
+    def column_type(self, table, column):
+        """Lower-case DATA_TYPE of a column ('varchar', 'date', ...) or None if missing"""
+        rows = self._query('''
+            SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        ''', (table, column))
+        return rows[0][0].lower() if rows else None
+
+    def has_index(self, table, index):
+        rows = self._query('''
+            SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1
+        ''', (table, index))
+        return bool(rows)
+
+    def add_column(self, table, column, definition):
+        if self.column_type(table, column) is None:
+            self._execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    def add_index(self, table, index, columns, unique=False):
+        """Online secondary index build (reads and writes continue)"""
+        if self.has_index(table, index):
+            return
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        print(f"[MIGRATIONS]   adding {kind.lower()} {table}.{index} ({columns})")
+        self._execute(f'ALTER TABLE {table} ADD {kind} {index} ({columns}), ALGORITHM=INPLACE, LOCK=NONE')
+
+    # --- ONLINE COLUMN TYPE CHANGE ---
+
+    def convert_columns(self, table, columns, extra_clauses=()):
+        """
+        Change VARCHAR columns to typed ones without blocking writers for the copy.
+        columns: [(name, 'DATE' | 'TIME', 'NULL' | 'NOT NULL')]
+        extra_clauses: additional ALTER clauses applied in the swap (e.g. rebuilding a unique key)
+        """
+        pending = [c for c in columns if self.column_type(table, c[0]) != c[1].lower()]
+        if not pending:
+            return
+
+        # 1. Shadow columns (nullable; filled below)
+        for name, sql_type, _ in pending:
+            if self.column_type(table, f'{name}__new') is None:
+                self._execute(f'ALTER TABLE {table} ADD COLUMN {name}__new {sql_type} NULL')
+
+        assignments = ', '.join(
+            f'{name}__new = {CAST_EXPRESSIONS[sql_type].format(col=name)}' for name, sql_type, _ in pending
+        )
+        out_of_sync = ' OR '.join(
+            f'NOT ({name}__new <=> {CAST_EXPRESSIONS[sql_type].format(col=name)})' for name, sql_type, _ in pending
+        )
+
+        # 2. Backfill in primary-key batches
+        copied = self._batched_update(table, assignments)
+        print(f"[MIGRATIONS]   {table}: {copied} rows copied")
+
+        # 3. Catch up rows inserted/updated by the live system during the copy
+        caught_up = self._batched_update(table, assignments, where=out_of_sync)
+        print(f"[MIGRATIONS]   {table}: {caught_up} rows caught up")
+
+        # 4. Swap. Writers wait for this step only (the write-behind queue absorbs it).
+        for name, sql_type, null_spec in pending:
+            if null_spec == 'NOT NULL':
+                bad = self._query(f'''
+                    SELECT COUNT(*) FROM {table}
+                    WHERE {name} IS NOT NULL AND {CAST_EXPRESSIONS[sql_type].format(col=name)} IS NULL
+                ''')[0][0]
+                if bad:
+                    raise MigrationError(f"{table}.{name}: {bad} rows are not valid {sql_type} values; "
+                                         f"fix them and run the migration again")
+
+        swap = []
+        for name, sql_type, null_spec in pending:
+            swap.append(f'DROP COLUMN {name}')
+            swap.append(f'CHANGE COLUMN {name}__new {name} {sql_type} {null_spec}')
+        swap.extend(extra_clauses)
+
+        self._execute(f'LOCK TABLES {table} WRITE')
+        try:
+            self._execute(f'UPDATE {table} SET {assignments} WHERE {out_of_sync}')
+            self._execute(f'ALTER TABLE {table} ' + ', '.join(swap))
+        finally:
+            self._execute('UNLOCK TABLES')
+        print(f"[MIGRATIONS]   {table}: swapped {', '.join(c[0] for c in pending)}")
+
+    def _batched_update(self, table, assignments, where=None):
+        """UPDATE over id ranges of batch_size, committing and pausing between batches"""
+        low, high = self._query(f'SELECT MIN(id), MAX(id) FROM {table}')[0]
+        if low is None:
+            return 0
+        condition = f' AND ({where})' if where else ''
+        total = 0
+        for start in range(low, high + 1, self.batch_size):
+            total += self._execute(
+                f'UPDATE {table} SET {assignments} WHERE id BETWEEN %s AND %s{condition}',
+                (start, start + self.batch_size - 1)
+            )
+            if self.pause:
+                time.sleep(self.pause)
+        return total
+
+
+# --- MIGRATIONS ---
+
+def migrate_attendance_types(runner):
+    runner.convert_columns('attendance', [
+        ('date', 'DATE', 'NOT NULL'),
+        ('arrival_time', 'TIME', 'NULL'),
+        ('leaving_time', 'TIME', 'NULL'),
+    ], extra_clauses=[
+        # Dropping `date` would silently shrink the unique key to (person_id): rebuild it
+        'DROP INDEX unique_attendance',
+        'ADD UNIQUE KEY unique_attendance (person_id, date)',
+    ])
+    runner.add_index('attendance', 'idx_attendance_date', 'date')
+
+
+def migrate_face_logs_types(runner):
+    runner.convert_columns('face_logs', [
+        ('date', 'DATE', 'NULL'),
+        ('time', 'TIME', 'NULL'),
+    ])
+    runner.add_index('face_logs', 'idx_face_logs_person_ts', 'person_id, timestamp')
+    runner.add_index('face_logs', 'idx_face_logs_date', 'date')
+
+
+def migrate_unknown_faces_index(runner):
+    runner.add_index('unknown_faces', 'idx_unknown_faces_ts', 'timestamp')
+
+
+def migrate_embeddings_to_blob(runner):
+    """
+    base64(pickle) LONGTEXT face_encoding -> raw float32 BLOB + dimension + model.
+    Legacy rows are decoded with a numpy-only unpickler and tagged with the configured model.
+    face_encoding is dropped only if every row converted; otherwise it is kept (nullable)
+    as face_encoding_legacy so the unreadable encodings are not lost.
+    """
+    for table, key, start in (('persons', 'person_id', ''), ('unknown_faces', 'id', 0)):
+        runner.add_column(table, 'embedding', 'BLOB NULL')
+        runner.add_column(table, 'embedding_dim', 'SMALLINT NULL')
+        runner.add_column(table, 'embedding_model', 'VARCHAR(64) NULL')
+        if runner.column_type(table, 'face_encoding') is None:
+            continue
+
+        converted, failed, last = 0, [], start
+        while True:
+            rows = runner._query(f'''
+                SELECT {key}, face_encoding FROM {table}
+                WHERE {key} > %s AND embedding IS NULL AND face_encoding IS NOT NULL
+                ORDER BY {key} LIMIT %s
+            ''', (last, runner.batch_size))
+            if not rows:
+                break
+            last = rows[-1][0]
+            params = []
+            for row_key, text in rows:
+                try:
+                    blob, dim = encode_embedding(decode_legacy_embedding(text))
+                    params.append((blob, dim, FACE_DETECTION_MODEL, row_key))
+                except Exception:
+                    failed.append(row_key)
+            if params:
+                runner._execute_many(f'''
+                    UPDATE {table} SET embedding = %s, embedding_dim = %s, embedding_model = %s
+                    WHERE {key} = %s
+                ''', params)
+                converted += len(params)
+            if runner.pause:
+                time.sleep(runner.pause)
+
+        print(f"[MIGRATIONS]   {table}: {converted} embeddings converted")
+        if not failed:
+            runner._execute(f'ALTER TABLE {table} DROP COLUMN face_encoding')
+            continue
+
+        # New inserts no longer fill face_encoding: keep the old values, but as a nullable column
+        legacy_type = runner.column_type(table, 'face_encoding').upper()
+        runner._execute(f'ALTER TABLE {table} CHANGE face_encoding face_encoding_legacy {legacy_type} NULL')
+        print(f"[MIGRATIONS]   {table}: {len(failed)} rows had unreadable encodings, kept in "
+              f"{table}.face_encoding_legacy ({key}: {', '.join(str(k) for k in failed)})")
+        if table == 'persons':
+            print("[MIGRATIONS]   those persons need to re-register")
+
+
+def migrate_event_uids(runner):
+    """Idempotency key for rows that may be replayed from the offline journal (NULL for old rows)"""
+    for table in ('face_logs', 'unknown_faces'):
+        runner.add_column(table, 'event_uid', 'CHAR(32) NULL')
+        runner.add_index(table, f'uq_{table}_event_uid', 'event_uid', unique=True)
+
+
+def migrate_attendance_daily(runner):
+    """Aggregate table (needs the DATE attendance.date from 001 for its foreign key), then backfill"""
+    from database.backends import ATTENDANCE_DAILY_MYSQL
+    from database.aggregates import backfill_attendance_daily
+    runner._execute(ATTENDANCE_DAILY_MYSQL)
+    backfill_attendance_daily(runner.db_manager, pause=runner.pause)
+
+
+def migrate_alert_log_claim_token(runner):
+    """Alerts claim their alert_log rows under a token before sending (NULL for old rows)"""
+    runner.add_column('alert_log', 'claim_token', 'CHAR(32) NULL')
+
+
+MIGRATIONS = [
+    ('001_attendance_typed_columns', 'attendance.date/arrival_time/leaving_time to DATE/TIME, index on date',
+     migrate_attendance_types),
+    ('002_face_logs_typed_columns', 'face_logs.date/time to DATE/TIME, indexes on (person_id, timestamp) and date',
+     migrate_face_logs_types),
+    ('003_unknown_faces_timestamp_index', 'index on unknown_faces.timestamp',
+     migrate_unknown_faces_index),
+    ('004_embeddings_float32_blob', 'face_encoding base64 pickle to float32 BLOB with dimension and model columns',
+     migrate_embeddings_to_blob),
+    ('005_event_uids', 'event_uid unique keys on face_logs and unknown_faces for idempotent journal replay',
+     migrate_event_uids),
+    ('006_attendance_daily', 'attendance_daily aggregate table (worked seconds, late/early flags), backfilled',
+     migrate_attendance_daily),
+    ('007_alert_log_claim_token', 'alert_log.claim_token so concurrent alert checks never send the same alert twice',
+     migrate_alert_log_claim_token),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations")
+    parser.add_argument('--status', action='store_true', help="List migrations and exit")
+    args = parser.parse_args()
+
+    from database.database import DatabaseManager
+    db = DatabaseManager()
+    runner = MigrationRunner(db)
+    if args.status:
+        for version, description, applied_at in runner.status():
+            state = applied_at.strftime('%Y-%m-%d %H:%M:%S') if applied_at else 'pending'
+            print(f"{version:<36} {state:<20} {description}")
+    else:
+        applied = runner.run_pending()
+        print(f"{len(applied)} migration(s) applied")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import time
+import queue
+import threading
+import mysql.connector
+from mysql.connector.errors import PoolError
+from config.config import (
+    MYSQL_POOL_SIZE, MYSQL_POOL_TIMEOUT, MYSQL_POOL_PING_INTERVAL, MYSQL_CONNECT_TIMEOUT,
+    DB_BREAKER_FAILURES, DB_BREAKER_COOLDOWN
+)
+
+class CircuitOpenError(PoolError):
+    """Raised without touching the network while the breaker is open"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops callers from paying a connect timeout on every call while MySQL is down.
+    closed    -> normal; `failures` consecutive connection failures open it
+    open      -> calls fail immediately with CircuitOpenError for `cooldown` seconds
+    half-open -> one trial call is let through; success closes, failure re-opens
+    """
+    def __init__(self, failures=DB_BREAKER_FAILURES, cooldown=DB_BREAKER_COOLDOWN):
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.cooldown:
+                self.state = 'half-open'
+            if self.state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != 'closed':
+                print("[DATABASE] ✓ MySQL reachable again, circuit closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """The half-open trial ended without a server round trip: let the next call try"""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == 'half-open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                if self.state == 'closed':
+                    print(f"[DATABASE] ✗ MySQL unreachable, circuit open for {self.cooldown}s")
+                self.state = 'open'
+                self.opened_at = time.time()
+                self.stats['opened'] += 1
+
+    def is_open(self):
+        with self.lock:
+            return self.state != 'closed'
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, state=self.state, failures=self.failures)
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a pooled MySQL connection.
+    close() hands the connection back to the pool instead of closing the socket,
+    so existing `conn.close()` call sites keep working unchanged.
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def invalidate(self):
+        """Drop a connection that lost the server instead of returning it to the pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._discard(conn)
+        self._pool.report_failure()
+
+    def is_connected(self):
+        # No server round trip: health is checked by the pool on checkout
+        return self._conn is not None
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise PoolError("Connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+    - At most `size` connections; callers wait up to `timeout` seconds for a free one
+    - Connections idle longer than `ping_interval` are pinged and reconnected if stale
+    - Wait times and reconnects are counted in `stats`
+    - A circuit breaker fails checkouts fast while the server is unreachable
+    """
+    def __init__(self, config, size=MYSQL_POOL_SIZE, timeout=MYSQL_POOL_TIMEOUT, ping_interval=MYSQL_POOL_PING_INTERVAL):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        # LIFO keeps the most recently used (warm) connections in circulation
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.open_count = 0
+        self.breaker = CircuitBreaker()
+
+        self.stats = {
+            'acquired': 0,
+            'waits': 0,              # Checkouts that found the pool exhausted
+            'wait_time_total': 0.0,  # Seconds spent in get_connection()
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'reconnects': 0,
+            'discarded': 0,
+        }
+
+    def get_connection(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError("MySQL unreachable (circuit open)")
+        start = time.perf_counter()
+        # While the breaker is not closed every checkout must prove the server is back
+        verify = self.breaker.is_open()
+        try:
+            conn, round_trip = self._checkout(verify)
+        except mysql.connector.Error as e:
+            # Pool exhaustion says nothing about the server: no round trip was made
+            if isinstance(e, PoolError):
+                self.breaker.release_trial()
+            else:
+                self.breaker.record_failure()
+            raise
+        if round_trip:
+            self.breaker.record_success()
+        else:
+            self.breaker.release_trial()
+        waited = time.perf_counter() - start
+
+        with self.lock:
+            self.stats['acquired'] += 1
+            self.stats['wait_time_total'] += waited
+            self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+
+        return PooledConnection(self, conn)
+
+    def _checkout(self, verify=False):
+        """(connection, True if the server answered during checkout)"""
+        try:
+            conn, last_used = self.idle.get_nowait()
+            return self._ensure_healthy(conn, last_used, verify)
+        except queue.Empty:
+            pass
+
+        # Pool not full yet: open a new connection
+        with self.lock:
+            can_create = self.open_count < self.size
+            if can_create:
+                self.open_count += 1
+        if can_create:
+            return self._connect(), True
+
+        # Pool exhausted: wait for a connection to be returned
+        with self.lock:
+            self.stats['waits'] += 1
+        try:
+            conn, last_used = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self.lock:
+                self.stats['timeouts'] += 1
+            raise PoolError(f"No free MySQL connection after {self.timeout}s (pool size {self.size})")
+        return self._ensure_healthy(conn, last_used, verify)
+
+    def _connect(self):
+        try:
+            conn = mysql.connector.connect(**{'connection_timeout': MYSQL_CONNECT_TIMEOUT, **self.config})
+        except Exception:
+            with self.lock:
+                self.open_count -= 1
+            raise
+        with self.lock:
+            self.stats['created'] += 1
+        return conn
+
+    def _ensure_healthy(self, conn, last_used, verify=False):
+        if not verify and time.time() - last_used < self.ping_interval:
+            return conn, False
+        try:
+            conn.ping(reconnect=False)
+            return conn, True
+        except Exception:
+            pass
+
+        # Stale (server restarted, wait_timeout hit): try to revive, else replace
+        try:
+            conn.reconnect(attempts=1, delay=0)
+            with self.lock:
+                self.stats['reconnects'] += 1
+            return conn, True
+        except Exception:
+            self._discard(conn)
+            with self.lock:
+                self.open_count += 1
+            return self._connect(), True
+
+    def report_failure(self):
+        """A query failed because the server went away (see PooledConnection.invalidate)"""
+        self.breaker.record_failure()
+
+    def release(self, conn):
+        try:
+            # Unread rows of an unbuffered cursor (e.g. fetchone() on a SELECT) would make
+            # in_transaction / rollback() fail with "Unread result found"
+            conn.consume_results()
+            # End any implicit transaction so the next user does not see a stale snapshot
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle.put((conn, time.time()))
+        except Exception:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.open_count -= 1
+            self.stats['discarded'] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['open'] = self.open_count
+        stats['idle'] = self.idle.qsize()
+        stats['breaker'] = self.breaker.get_stats()
+        if stats['acquired']:
+            stats['wait_time_avg'] = stats['wait_time_total'] / stats['acquired']
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# One pool per (process, connection config): every DatabaseManager in the process shares it
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config):
+    key = tuple(sorted((k, str(v)) for k, v in config.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(config)
+        return _pools[key]
@@ -0,0 +1,196 @@
+import time
+import threading
+from datetime import datetime
+from config.config import PRESENCE_GAP_SECONDS, PRESENCE_CHECKPOINT_SECONDS, PRESENCE_FLUSH_INTERVAL
+
+def union_seconds(spans):
+    """Seconds covered by (start, end) datetime spans, overlapping spans counted once"""
+    total = 0.0
+    current = None
+    for start, end in sorted(spans):
+        if current is not None and start <= current[1]:
+            current[1] = max(current[1], end)
+            continue
+        if current is not None:
+            total += (current[1] - current[0]).total_seconds()
+        current = [start, end]
+    if current is not None:
+        total += (current[1] - current[0]).total_seconds()
+    return total
+
+
+class PresenceSessionizer:
+    """
+    Merges sightings into presence intervals, one open interval per (person_id, camera_id).
+    A sighting within `gap` seconds of the interval's last sighting extends it; a longer gap
+    (or midnight) closes it and opens a new one. Pure in-memory bookkeeping, not thread-safe:
+    PresenceRecorder holds the lock and decides when collected rows are written, then
+    reports back with written() or failed(): a checkpoint only counts once it committed,
+    and closed rows that failed are collected again (up to MAX_ATTEMPTS writes).
+    Rows: (person_id, name, camera_id, start datetime, end datetime, sightings)
+    """
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, gap=PRESENCE_GAP_SECONDS, checkpoint=PRESENCE_CHECKPOINT_SECONDS):
+        self.gap = gap
+        self.checkpoint = checkpoint
+        self.open = {}    # (person_id, camera_id) -> interval dict
+        self.closed = []  # Closed by a new sighting (or a failed write), waiting for the next collect()
+        self.attempts = {} # (person_id, camera_id, start) -> failed writes of a closed row
+
+    def observe(self, person_id, name, camera_id, seen_at):
+        """Returns True if the sighting opened a new interval"""
+        key = (person_id, camera_id)
+        interval = self.open.get(key)
+        if interval is not None:
+            elapsed = (seen_at - interval['end']).total_seconds()
+            if elapsed <= self.gap and seen_at.date() == interval['start'].date():
+                interval['end'] = max(interval['end'], seen_at)
+                interval['sightings'] += 1
+                interval['name'] = name
+                return False
+            self._close(key)
+
+        self.open[key] = {'person_id': person_id, 'name': name, 'camera_id': camera_id,
+                          'start': seen_at, 'end': seen_at, 'sightings': 1,
+                          'written': None, 'written_at': time.time()}
+        return True
+
+    def _close(self, key):
+        interval = self.open.pop(key)
+        if interval['written'] != (interval['end'], interval['sightings']):
+            self.closed.append(self._row(interval))
+
+    @staticmethod
+    def _row(interval):
+        return (interval['person_id'], interval['name'], interval['camera_id'],
+                interval['start'], interval['end'], interval['sightings'])
+
+    def collect(self, now=None, force=False):
+        """
+        Rows to write now:
+          - intervals whose gap has run out (closed, forgotten)
+          - every open interval if force (shutdown), also forgotten
+          - open intervals not written for `checkpoint` seconds (stay open, extended in place later)
+        """
+        now = now or datetime.now()
+        for key, interval in list(self.open.items()):
+            if force or (now - interval['end']).total_seconds() > self.gap or now.date() != interval['start'].date():
+                self._close(key)
+
+        rows, self.closed = self.closed, []
+        if self.checkpoint:
+            wall = time.time()
+            for interval in self.open.values():
+                state = (interval['end'], interval['sightings'])
+                if interval['written'] != state and wall - interval['written_at'] >= self.checkpoint:
+                    rows.append(self._row(interval))
+        return rows
+
+    def _open_interval(self, row):
+        """The still-open interval a collected row was taken from, if any"""
+        interval = self.open.get((row[0], row[2]))
+        return interval if interval is not None and interval['start'] == row[3] else None
+
+    def written(self, rows):
+        """Collected rows committed: checkpoints count from now"""
+        wall = time.time()
+        for row in rows:
+            interval = self._open_interval(row)
+            if interval is not None:
+                interval['written'], interval['written_at'] = (row[4], row[5]), wall
+            self.attempts.pop((row[0], row[2], row[3]), None)
+
+    def failed(self, rows):
+        """Collected rows not written: closed ones go back in the queue, open ones stay due"""
+        dropped = 0
+        for row in rows:
+            if self._open_interval(row) is not None:
+                continue # Not marked written: the next collect() checkpoints it again
+            key = (row[0], row[2], row[3])
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            if self.attempts[key] < self.MAX_ATTEMPTS:
+                self.closed.append(row)
+            else:
+                del self.attempts[key]
+                dropped += 1
+        return dropped
+
+    def open_rows(self):
+        return [self._row(interval) for interval in self.open.values()]
+
+
+class PresenceRecorder:
+    """
+    Records recognized sightings as presence intervals instead of one face_logs row each.
+    record() is cheap (dict update under a lock) and safe to call from the video threads;
+    a background thread writes closed / checkpointed intervals with
+    DatabaseManager.write_presence_intervals (idempotent upsert on the interval id).
+    """
+    def __init__(self, db_manager, interval=PRESENCE_FLUSH_INTERVAL):
+        self.db_manager = db_manager
+        self.interval = interval
+        self.sessionizer = PresenceSessionizer()
+        self.lock = threading.Lock()
+        self.stats = {
+            'sightings': 0,
+            'intervals_opened': 0,
+            'rows_written': 0,   # Interval inserts/extensions (compare with 'sightings')
+            'writes': 0,
+            'failed_writes': 0,
+            'rows_dropped': 0,   # Closed intervals given up on after MAX_ATTEMPTS failed writes
+        }
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def record(self, person_id, person_name, camera_id=None, seen_at=None):
+        with self.lock:
+            opened = self.sessionizer.observe(person_id, person_name, camera_id or '', seen_at or datetime.now())
+            self.stats['sightings'] += 1
+            self.stats['intervals_opened'] += 1 if opened else 0
+
+    def flush(self, force=False):
+        with self.lock:
+            rows = self.sessionizer.collect(force=force)
+        if not rows:
+            return True
+        ok = self.db_manager.write_presence_intervals(rows)
+        with self.lock:
+            if ok:
+                self.sessionizer.written(rows)
+                dropped = 0
+            else:
+                dropped = self.sessionizer.failed(rows)
+            self.stats['writes'] += 1
+            self.stats['rows_written'] += len(rows) if ok else 0
+            self.stats['failed_writes'] += 0 if ok else 1
+            self.stats['rows_dropped'] += dropped
+        if dropped:
+            print(f"Presence Writer Error: gave up on {dropped} interval(s) after "
+                  f"{PresenceSessionizer.MAX_ATTEMPTS} failed writes")
+        return ok
+
+    def get_open_intervals(self):
+        """Intervals still in progress (not closed yet): live 'on site now' view"""
+        with self.lock:
+            return self.sessionizer.open_rows()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['open_intervals'] = len(self.sessionizer.open)
+        return stats
+
+    def stop(self, timeout=5.0):
+        """Stop the flush thread and write every open interval"""
+        self.stop_event.set()
+        self.thread.join(timeout=timeout)
+        self.flush(force=True)
+
+    def _worker(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Presence Writer Error: {e}")
@@ -0,0 +1,159 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from config.config import REPORT_CACHE_MAX_BYTES, REPORT_CACHE_TTL_SECONDS
+
+
+class ReportCache:
+    """
+    Memoized report rows keyed by (query, date range, person).
+
+    A requested range is split into a past partition (start .. yesterday) and a live one
+    (today .. end), cached separately. Closed days rarely change, so past entries stay
+    until evicted or ttl expires; attendance writes only drop the entries whose range holds a written
+    date, which for the recognition path is today's partition. LRU eviction keeps the
+    estimated size of the cached rows under max_bytes.
+    Invalidation only sees this process's writes: edits made by another process (e.g. the
+    API server correcting a past day) show up once the entry is ttl seconds old.
+    Open-ended ranges (no start or end date) are not cached.
+    """
+    def __init__(self, max_bytes=REPORT_CACHE_MAX_BYTES, ttl=REPORT_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_bytes // 4 # One huge range must not flush everything else
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # (query, start, end, person_id) -> (rows, size, stored_at)
+        self.bytes = 0
+        self.generation = 0 # Bumped by every invalidation: loads that raced one are not stored
+        self.stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evictions': 0, 'expired': 0, 'invalidations': 0}
+
+    # --- READ PATH ---
+
+    def get(self, query, start_date, end_date, person_id, load, newest_first=False):
+        """Rows of load(start, end) for the range, served per partition from the cache where possible"""
+        parts = self._partitions(start_date, end_date)
+        if parts is None:
+            with self.lock:
+                self.stats['bypassed'] += 1
+            return load(start_date, end_date)
+
+        rows = []
+        for start, end in (reversed(parts) if newest_first else parts):
+            key = (query, start, end, person_id)
+            cached = self._lookup(key)
+            if cached is None:
+                generation = self.generation
+                cached = load(start, end)
+                self._store(key, cached, generation)
+            rows.extend(cached)
+        return rows
+
+    def iter_chunks(self, query, start_date, end_date, person_id, stream, chunk_size, newest_first=False):
+        """
+        Like get() for streamed reads: yields lists of at most chunk_size rows. Missed
+        partitions are streamed with stream(start, end) and only kept if they fit in an entry.
+        """
+        parts = self._partitions(start_date, end_date)
+        if parts is None:
+            with self.lock:
+                self.stats['bypassed'] += 1
+            yield from stream(start_date, end_date)
+            return
+
+        for start, end in (reversed(parts) if newest_first else parts):
+            key = (query, start, end, person_id)
+            cached = self._lookup(key)
+            if cached is not None:
+                for i in range(0, len(cached), chunk_size):
+                    yield cached[i:i + chunk_size]
+                continue
+
+            generation = self.generation
+            kept, size = [], 0
+            for chunk in stream(start, end):
+                if kept is not None:
+                    size += self._size(chunk)
+                    if size <= self.max_entry_bytes:
+                        kept.extend(chunk)
+                    else:
+                        kept = None
+                yield chunk
+            if kept is not None:
+                self._store(key, kept, generation)
+
+    def _partitions(self, start_date, end_date):
+        """[(start, end)] ISO date pairs: past partition first, then live. None = don't cache."""
+        try:
+            start = date.fromisoformat(str(start_date)[:10])
+            end = date.fromisoformat(str(end_date)[:10])
+        except (TypeError, ValueError):
+            return None
+        if start > end:
+            return None
+        today = date.today()
+        parts = []
+        if start < today:
+            parts.append((start.isoformat(), min(end, today - timedelta(days=1)).isoformat()))
+        if end >= today:
+            parts.append((max(start, today).isoformat(), end.isoformat()))
+        return parts
+
+    def _lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry[2] >= self.ttl:
+                self.bytes -= self.entries.pop(key)[1]
+                self.stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def _store(self, key, rows, generation):
+        size = self._size(rows)
+        with self.lock:
+            if generation != self.generation or size > self.max_entry_bytes:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (rows, size, time.time())
+            self.bytes += size
+            while self.bytes > self.max_bytes and self.entries:
+                _, (_, evicted, _) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.stats['evictions'] += 1
+
+    @staticmethod
+    def _size(rows):
+        """Estimated bytes held by a list of row tuples"""
+        return sys.getsizeof(rows) + sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r) for r in rows)
+
+    # --- WRITE PATH ---
+
+    def invalidate(self, dates=None):
+        """Drop entries whose range holds one of `dates` (ISO strings); everything if None"""
+        with self.lock:
+            self.generation += 1
+            self.stats['invalidations'] += 1
+            if dates is None:
+                self.entries.clear()
+                self.bytes = 0
+                return
+            dates = [str(d)[:10] for d in dates]
+            for key in [k for k in self.entries if any(k[1] <= d <= k[2] for d in dates)]:
+                self.bytes -= self.entries.pop(key)[1]
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,101 @@
+import time
+import threading
+from config.config import STATS_RECONCILE_SECONDS
+
+
+class StatisticsService:
+    """
+    Dashboard counters served from memory:
+      - total_persons: counted once, then moved by person_added / person_removed
+      - present_today: the day state (already kept current by the attendance write path)
+    A background thread reconciles both with the database every `interval` seconds, which
+    also picks up registrations and attendance written by other processes (e.g. the API).
+    In between it runs day_state.refresh(), the only place the day state is reloaded
+    (every DAY_STATE_MAX_AGE_SECONDS, on day rollover, and right after an invalidate()).
+    Started by DatabaseManager; get() never queries the database.
+    """
+    def __init__(self, db_manager, interval=STATS_RECONCILE_SECONDS):
+        self.db_manager = db_manager
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.total_persons = None
+        self.reconciles = 0
+        self.events = 0 # Bumped by person_added / person_removed
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def get(self):
+        if self.thread is None:
+            self.start()
+        with self.lock:
+            total = self.total_persons or 0
+        return {'total_persons': total, 'present_today': self.db_manager.day_state.present_count()}
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.reconcile(reseed=False) # First figures before anyone is served
+        self.thread.start()
+
+    # --- EVENTS ---
+
+    def person_added(self):
+        with self.lock:
+            self.events += 1
+            if self.total_persons is not None:
+                self.total_persons += 1
+
+    def person_removed(self):
+        with self.lock:
+            self.events += 1
+            if self.total_persons is not None:
+                self.total_persons = max(self.total_persons - 1, 0)
+
+    # --- RECONCILE ---
+
+    def reconcile(self, reseed=True):
+        """Recount persons and (reseed) reload today's attendance. Keeps the last figures if the DB is down."""
+        with self.lock:
+            events = self.events
+        try:
+            conn = self.db_manager.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT COUNT(*) FROM persons')
+                total = cursor.fetchone()[0]
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Stats Error: {e}")
+            return False
+        with self.lock:
+            # A registration that raced the count is already applied: keep it, recount next time
+            if self.events == events or self.total_persons is None:
+                self.total_persons = total
+            self.reconciles += 1
+        if reseed:
+            self.db_manager.day_state.refresh(force=True)
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+        self.db_manager.day_state.stale.set() # Wake the worker
+
+    def _worker(self):
+        day_state = self.db_manager.day_state
+        tick = min(self.interval, day_state.max_age or self.interval)
+        last_reconcile = time.time()
+        while not self.stop_event.is_set():
+            day_state.stale.wait(tick) # invalidate() wakes it early
+            if self.stop_event.is_set():
+                return
+            try:
+                if time.time() - last_reconcile >= self.interval:
+                    last_reconcile = time.time()
+                    self.reconcile()
+                else:
+                    day_state.refresh()
+            except Exception as e:
+                print(f"Stats Error: {e}")
@@ -0,0 +1,141 @@
+import time
+import queue
+import threading
+from datetime import datetime
+from config.config import ATTENDANCE_QUEUE_SIZE, ATTENDANCE_BATCH_SIZE, ATTENDANCE_FLUSH_INTERVAL
+
+class AttendanceWriter:
+    """
+    Write-behind pipeline for attendance events.
+    The video thread only enqueues (person, capture timestamp); a single DB writer
+    thread drains the queue in batches, coalesced per (person, day) into one
+    executemany upsert (first sighting = arrival, latest sighting = leaving_time).
+    Raw sightings are not queued here: see database/presence.py.
+    Per-person outcomes (LOGIN / LOGOUT UPDATE / Shift Ongoing) are passed to
+    on_result(person_id, person_name, message) from the writer thread.
+    """
+    def __init__(self, db_manager, on_result=None):
+        self.db_manager = db_manager
+        self.on_result = on_result
+        self.queue = queue.Queue(maxsize=ATTENDANCE_QUEUE_SIZE)
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'dropped': 0,            # Queue full
+            'batches': 0,
+            'events_written': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_seconds': 0.0,   # DB time of the last flush
+            'max_flush_seconds': 0.0,
+            'last_event_lag': 0.0,       # Capture -> commit delay of the oldest event in the last batch
+            'max_event_lag': 0.0,
+            'failed_batches': 0,
+        }
+
+        self.stopped = False
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    # --- PRODUCER SIDE (video threads) ---
+
+    def record_attendance(self, person_id, person_name, captured_at=None):
+        return self._put(('attendance', person_id, person_name, captured_at or datetime.now()))
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+            with self.stats_lock:
+                self.stats['enqueued'] += 1
+            return True
+        except queue.Full:
+            with self.stats_lock:
+                self.stats['dropped'] += 1
+            return False
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        return stats
+
+    def stop(self, timeout=5.0):
+        """Flush remaining events and stop the writer thread"""
+        self.stopped = True
+        self.thread.join(timeout=timeout)
+
+    # --- WRITER THREAD ---
+
+    def _worker(self):
+        while not self.stopped or not self.queue.empty():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                self._flush(batch)
+            except Exception as e:
+                # e.g. DB unreachable: count it and keep the writer alive
+                print(f"Attendance Writer Error: {e}")
+                with self.stats_lock:
+                    self.stats['failed_batches'] += 1
+
+    def _collect_batch(self):
+        """Block for the first event, then take whatever arrives within the flush interval"""
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.time() + ATTENDANCE_FLUSH_INTERVAL
+        while len(batch) < ATTENDANCE_BATCH_SIZE:
+            # Shutting down: take what is already queued without waiting
+            remaining = 0 if self.stopped else deadline - time.time()
+            try:
+                if remaining <= 0:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        start = time.time()
+        visits = {}  # (person_id, day) -> [name, first_seen, last_seen]
+
+        for _, person_id, person_name, captured_at in batch:
+            key = (person_id, captured_at.strftime('%Y-%m-%d'))
+            if key not in visits:
+                visits[key] = [person_name, captured_at, captured_at]
+            else:
+                visits[key][1] = min(visits[key][1], captured_at)
+                visits[key][2] = max(visits[key][2], captured_at)
+
+        entries = [
+            (pid, day, first.strftime('%H:%M:%S'), last.strftime('%H:%M:%S'))
+            for (pid, day), (_, first, last) in visits.items()
+        ]
+        results = self.db_manager.sync_attendance_batch(entries)
+        ok = results is not None
+
+        finished = time.time()
+        oldest = min(event[3] for event in batch)
+        lag = finished - oldest.timestamp()
+        with self.stats_lock:
+            self.stats['batches'] += 1
+            self.stats['events_written'] += len(batch) if ok else 0
+            self.stats['failed_batches'] += 0 if ok else 1
+            self.stats['last_batch_size'] = len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.stats['last_flush_seconds'] = finished - start
+            self.stats['max_flush_seconds'] = max(self.stats['max_flush_seconds'], finished - start)
+            self.stats['last_event_lag'] = lag
+            self.stats['max_event_lag'] = max(self.stats['max_event_lag'], lag)
+
+        if results and self.on_result:
+            for (pid, day), msg in results.items():
+                try:
+                    self.on_result(pid, visits[(pid, day)][0], msg)
+                except Exception as e:
+                    print(f"Attendance Result Error: {e}")
@@ -4,9 +4,12 @@ import warnings
 import traceback
 from datetime import datetime
 from database.database import DatabaseManager
+from database.maintenance import MaintenanceScheduler
+from core.alerts import AlertScheduler
 from core.face_recognition import FaceRecognitionHandler
 from core.attendance_tracker import AttendanceTracker
 from core.video_processor import VideoProcessor
+from core.camera import DualStreamCamera, get_substream_url
 from config.config import get_config
 
 # Filter warnings to keep console clean
@@ -21,6 +24,8 @@ class AttendanceSystem:
         self.face_handler = FaceRecognitionHandler(self.db_manager)
         self.attendance_tracker = AttendanceTracker(self.db_manager, self.face_handler)
         self.video_processor = VideoProcessor(self.face_handler)
+        self.maintenance = MaintenanceScheduler(self.db_manager) # Log retention / rollup
+        self.alerts = AlertScheduler(self.db_manager) # Absence / late digests (EMAIL_NOTIFICATIONS_ENABLED)
         
         print("✓ System initialized successfully!")
     
@@ -38,9 +43,17 @@ class AttendanceSystem:
     
     def start_automatic_attendance(self):
         """Run the main attendance system"""
-        source = get_config()['webcam_index']
+        conf = get_config()
+        source = conf['webcam_index']
         print(f"Connecting to camera: {source}")
-        cap = cv2.VideoCapture(source)
+        
+        # RTSP: detect on the substream, crop faces from the main stream
+        dual = conf['dual_stream_enabled'] and isinstance(source, str) and "subtype=" in source
+        if dual:
+            cap = DualStreamCamera(get_substream_url(source, conf['detection_subtype']), source,
+                                   reader=conf['camera_reader'])
+        else:
+            cap = cv2.VideoCapture(source)
         
         if not cap.isOpened():
             print(f"Error: Could not open webcam ({source})")
@@ -51,28 +64,45 @@ class AttendanceSystem:
         print("="*60)
         print("• First Detection = LOGIN")
         print("• Shift End Rule  = Updates LOGOUT if time > Shift End")
-        print("• Raw Logs        = Saved every 90 seconds")
+        print("• Presence        = Saved as on-camera intervals")
         print("\nPress 'q' to Stop and return to menu.")
         
         fps_start_time = time.time()
         fps_counter = 0
         fps = 0
+        last_seq = 0
+        last_frame_time = time.time()
         
+        frame_buffer = None
         while True:
-            ret, frame = cap.read()
+            ret, frame = cap.read(out=frame_buffer) if dual else cap.read()
+            if dual and (not ret or frame is None or cap.frame_seq == last_seq):
+                # Threaded reader: wait for the next substream frame
+                if time.time() - last_frame_time > 10.0:
+                    print("Error: Cannot read from camera")
+                    break
+                time.sleep(0.005)
+                continue
             if not ret:
                 print("Error: Cannot read from webcam")
                 break
+            if dual:
+                frame_buffer = frame # Reused by the next read (annotate_frame draws on a copy)
+                last_seq = cap.frame_seq
+                last_frame_time = time.time()
             
             # Process frame
-            annotated_frame, faces, tracked_detections, messages = \
+            detections, labels, faces, messages = \
                 self.video_processor.process_frame(
                     frame, 
                     mark_attendance_callback=self.attendance_tracker.process_recognized_face,
-                    unknown_person_callback=self.attendance_tracker.process_unknown_person
+                    unknown_person_callback=self.attendance_tracker.process_unknown_person,
+                    hires_reader=cap.read_main if dual else None
                 )
+            annotated_frame = self.video_processor.annotate_frame(frame, detections, labels, faces)
             
-            # Print messages to console (optional)
+            # Print messages to console (optional), incl. write-behind attendance results
+            messages = list(messages) + self.attendance_tracker.get_pending_messages()
             for msg in messages:
                 print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}")
             
@@ -91,6 +121,9 @@ class AttendanceSystem:
                 'Present': stats['present_today'],
                 'FPS': f"{fps}"
             }
+            if dual:
+                # Share of face crops that had to fall back to the substream
+                info['Sub Crops'] = f"{cap.get_stats()['fallback_rate']:.0%}"
             
             annotated_frame = self.video_processor.draw_info_panel(annotated_frame, info)
             
@@ -174,6 +207,7 @@ class AttendanceSystem:
             
             if success:
                 self.face_handler.add_face_encoding(person_id, name, face_encoding)
+                self.attendance_tracker.prepare_greetings([name])
                 print(f"\n✓ SUCCESS: {name} registered with shift {shift_start}-{shift_end}")
             else:
                 print(f"\n✗ Database Error: {message}")
@@ -237,6 +271,10 @@ class AttendanceSystem:
             elif choice == '4':
                 self.export_attendance()
             elif choice == '5':
+                self.maintenance.stop()
+                self.alerts.stop()
+                self.db_manager.stats.stop()
+                self.attendance_tracker.shutdown()
                 print("\nGoodbye!")
                 break
             else:
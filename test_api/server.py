@@ -165,7 +165,8 @@ def delete_attendance(record_id):
 
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
-    return jsonify(api.get_all_logs())
+    # Presence intervals (person, camera, first / last sighting), newest first
+    return jsonify(api.get_all_logs(request.args.get('limit', 100, type=int), request.args.get('person_id')))
 
 @app.route('/api/logs', methods=['POST'])
 def create_log():
@@ -174,7 +175,8 @@ def create_log():
         data.get('person_id'),
         data.get('name'),
         data.get('date'),
-        data.get('time')
+        data.get('time'),
+        data.get('camera_id', 'api')
     )
     if success: return jsonify({"message": msg}), 201
     return jsonify({"error": msg}), 400
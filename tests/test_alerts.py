@@ -0,0 +1,120 @@
+"""
+AlertEngine against a SQLite database with OutboxSender: late / absence digests, the daily
+summary, and that the same alert is never sent twice, also by two processes on one file.
+    python -m pytest tests/test_alerts.py
+"""
+from datetime import datetime
+import pytest
+from core.alerts import AlertEngine, OutboxSender
+from database.backends import SQLiteBackend
+from database.database import DatabaseManager
+
+DAY = '2026-10-19'                  # A Monday
+MORNING = datetime(2026, 10, 19, 11, 0)
+EVENING = datetime(2026, 10, 19, 18, 30)
+
+
+def connect(path):
+    return DatabaseManager(backend=SQLiteBackend(str(path)))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'alerts.db'
+    db = connect(path)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany('''
+        INSERT INTO persons (person_id, name, department, shift_start, shift_end, registered_date)
+        VALUES (%s, %s, 'QA', '09:00:00', '18:00:00', '2026-01-01')
+    ''', [('P1', 'On Time'), ('P2', 'Late'), ('P3', 'Absent')])
+    cursor.executemany('''
+        INSERT INTO attendance (person_id, date, arrival_time, leaving_time, status)
+        VALUES (%s, %s, %s, NULL, 'Present')
+    ''', [('P1', DAY, '08:55:00'), ('P2', DAY, '09:20:00')])
+    conn.commit()
+    conn.close()
+    db.stats.stop()
+    return path
+
+
+@pytest.fixture
+def managers(db_path):
+    opened = []
+
+    def open_manager():
+        db = connect(db_path)
+        opened.append(db)
+        return db
+    yield open_manager
+    for db in opened:
+        db.stats.stop()
+
+
+def engine(db, sender, absence=True, late=True, summary=True):
+    return AlertEngine(db, sender=sender, recipients=['admin@example.com'],
+                       absence=absence, late=late, summary=summary)
+
+
+def subjects(sender):
+    return [msg['Subject'] for msg in sender.sent]
+
+
+def test_late_and_absence_digests(managers):
+    sender = OutboxSender(folder=None)
+    sent = engine(managers(), sender, summary=False).run(MORNING)
+    assert sent == {'late': 1, 'absence': 1}
+    late, absence = sender.sent
+    assert 'P2' in late.get_content() and 'P1' not in late.get_content()
+    assert 'P3' in absence.get_content() and 'P2' not in absence.get_content()
+
+
+def test_summary_after_summary_time(managers):
+    sender = OutboxSender(folder=None)
+    alerts = engine(managers(), sender, absence=False, late=False)
+    assert alerts.run(MORNING) == {}
+    assert alerts.run(EVENING) == {'summary': 1}
+    assert subjects(sender) == [f"[Attendance] Daily summary - {DAY}"]
+    assert 'Absent: 1' in sender.sent[0].get_content()
+
+
+def test_nothing_sent_twice(managers):
+    sender = OutboxSender(folder=None)
+    alerts = engine(managers(), sender)
+    assert alerts.run(EVENING) == {'late': 1, 'absence': 1, 'summary': 1}
+    assert alerts.run(EVENING) == {}
+    assert len(sender.sent) == 3
+
+
+def test_two_processes_share_the_alert_log(managers):
+    first, second = OutboxSender(folder=None), OutboxSender(folder=None)
+    assert engine(managers(), first).run(EVENING) == {'late': 1, 'absence': 1, 'summary': 1}
+    assert engine(managers(), second).run(EVENING) == {}
+    assert second.sent == []
+
+
+def test_claim_race_sends_once(managers):
+    # Both processes query before either has logged anything; only one may send
+    first, second = OutboxSender(folder=None), OutboxSender(folder=None)
+    racer = engine(managers(), second, absence=False, summary=False)
+    conn = racer.db_manager.get_connection()
+    stale = racer._late_arrivals(conn.cursor(), DAY)
+    conn.close()
+    racer._late_arrivals = lambda cursor, day: stale
+    assert engine(managers(), first, absence=False, summary=False).run(MORNING) == {'late': 1}
+    assert racer.run(MORNING) == {}
+    assert second.sent == []
+
+
+def test_failed_send_is_retried(managers):
+    class FailingSender(OutboxSender):
+        def send(self, subject, body, recipients):
+            raise OSError('smtp down')
+
+    db = managers()
+    failing = engine(db, FailingSender(folder=None), absence=False, summary=False)
+    assert failing.run(MORNING) == {}
+    assert failing.stats['send_errors'] == 1
+    sender = OutboxSender(folder=None)
+    assert engine(db, sender, absence=False, summary=False).run(MORNING) == {'late': 1}
+    assert len(sender.sent) == 1
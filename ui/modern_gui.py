@@ -8,20 +8,23 @@ import time
 import math
 from datetime import datetime, timedelta, date
 import os
-import csv
 import sys
 import re
+import functools
 
 # --- IMPORT BACKEND ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.database import DatabaseManager
+from database.maintenance import MaintenanceScheduler
+from core.alerts import AlertScheduler
+from database.export import export_attendance_report
 from core.face_recognition import FaceRecognitionHandler
 from core.attendance_tracker import AttendanceTracker
 from core.video_processor import VideoProcessor
 from core.registration import RegistrationModule
 from core.utils import Utils
-from core.camera import ThreadedCamera
+from core.camera import ThreadedCamera, DualStreamCamera, FFmpegCamera, SharedMemoryCamera, get_substream_url
 from config.config import get_config
 
 # --- THEME COLORS ---
@@ -79,6 +82,8 @@ class FaceAttendancePro:
         self.processor = VideoProcessor(self.face_handler)
         self.processor2 = VideoProcessor(self.face_handler)
         self.registrar = RegistrationModule(self.db, self.face_handler)
+        self.maintenance = MaintenanceScheduler(self.db) # Log retention / rollup
+        self.alerts = AlertScheduler(self.db) # Absence / late digests (EMAIL_NOTIFICATIONS_ENABLED)
         
         self.caps = []
         self.is_running = False
@@ -94,6 +99,14 @@ class FaceAttendancePro:
         # Threading support
         self.processing_lock = threading.Lock()
         self.latest_results = {0: None, 1: None} # Stores (detections, labels, faces) for each camera index
+        self.results_version = {0: 0, 1: 0}      # Bumped only when process_frame produced new results
+        
+        # Display path state (per camera): reused buffers and last rendered (frame_seq, results_version)
+        self.display_buffers = {0: None, 1: None}
+        self.display_frames = {0: None, 1: None} # Camera frames are read into these
+        self.display_rgb = {0: None, 1: None}
+        self.display_photos = {0: None, 1: None}
+        self.display_state = {0: None, 1: None}
         self.log_queue = queue.Queue()
         self.threads_running = False
         self.processing_threads = []
@@ -310,6 +323,7 @@ class FaceAttendancePro:
         btn_grp = tk.Frame(controls, bg=COLORS['card']); btn_grp.pack(side="right", anchor="s")
         ModernButton(btn_grp, text="DOWNLOAD CSV", command=lambda: self.generate_report("csv"), bg=COLORS['success'], fg="#0f172a", width=15).pack(side="right")
         ModernButton(btn_grp, text="DOWNLOAD PDF", command=lambda: self.generate_report("pdf"), bg=COLORS['danger'], fg="#0f172a", width=15).pack(side="right", padx=10)
+        ModernButton(btn_grp, text="DOWNLOAD JSONL", command=lambda: self.generate_report("jsonl"), bg=COLORS['accent'], fg="#0f172a", width=15).pack(side="right")
 
         style = ttk.Style(); style.theme_use("clam")
         
@@ -436,6 +450,25 @@ class FaceAttendancePro:
                         # Local Webcam
                         source = int(selection_str.split(" ")[1])
                     
+                    # RTSP: detect on the substream, crop faces from the main stream
+                    conf = get_config()
+                    if conf['dual_stream_enabled'] and isinstance(source, str) and "subtype=" in source:
+                        if conf['shared_memory_capture']:
+                            print("SHARED_MEMORY_CAPTURE is ignored for dual-stream cameras (DUAL_STREAM_ENABLED)")
+                        sub_source = get_substream_url(source, conf['detection_subtype'])
+                        print(f"Opening DualStreamCamera(sub=...{sub_source[-20:]})...")
+                        return DualStreamCamera(sub_source, source, reader=conf['camera_reader'])
+                    
+                    # Capture in a separate process, frames shared zero-copy
+                    if conf['shared_memory_capture']:
+                        print(f"Opening SharedMemoryCamera({source})...")
+                        return SharedMemoryCamera(source, reader=conf['camera_reader'])
+                    
+                    # Streams/files: let ffmpeg scale and decimate at decode time
+                    if conf['camera_reader'] == 'ffmpeg' and isinstance(source, str):
+                        print(f"Opening FFmpegCamera(...{source[-20:]})...")
+                        return FFmpegCamera(source)
+                    
                     # ALWAYS return ThreadedCamera for smooth UI
                     print(f"Opening ThreadedCamera({source})...")
                     return ThreadedCamera(source)
@@ -458,6 +491,8 @@ class FaceAttendancePro:
             if cap2 and cap2.isOpened(): self.caps.append(cap2)
             else: self.caps.append(None); print(f"Camera Source 2 ({val2}) failed")
 
+            self.camera_labels = [val1, val2] # Camera ids for presence intervals
+            
             if all(c is None for c in self.caps):
                 messagebox.showerror("Error", "No cameras found"); return
 
@@ -466,6 +501,8 @@ class FaceAttendancePro:
             # Start background processing threads
             self.threads_running = True
             self.latest_results = {0: None, 1: None}
+            self.results_version = {0: 0, 1: 0}
+            self.display_state = {0: None, 1: None}
             
             for i in range(len(self.caps)):
                 if self.caps[i]:
@@ -486,19 +523,24 @@ class FaceAttendancePro:
         # Select processor
         processor = self.processor if cam_index == 0 else self.processor2
         cap = self.caps[cam_index]
+        # Presence intervals are kept per camera
+        mark_attendance = functools.partial(self.tracker.process_recognized_face,
+                                            camera_id=self.camera_labels[cam_index])
         
         frame_count = 0
         SKIP_FRAMES = 4 # Process 1 out of 5 frames (CPU Optimization)
         last_results = None # Memory for skipped frames
+        frame_buffer = None # Reused for every read (frames are not kept past process_frame)
         
         while self.threads_running and self.is_running:
             if cap is None: break
             
             # Read latest frame
-            ret, frame = cap.read()
+            ret, frame = cap.read(out=frame_buffer)
             if not ret or frame is None:
                 time.sleep(0.01)
                 continue
+            frame_buffer = frame
             
             # Run Heavy Processing or Skip
             # Returns: (detections, labels, faces, messages)
@@ -509,10 +551,12 @@ class FaceAttendancePro:
                 if frame_count % (SKIP_FRAMES + 1) == 0:
                     detections, labels, faces, messages = processor.process_frame(
                         frame, 
-                        mark_attendance_callback=self.tracker.process_recognized_face,
-                        unknown_person_callback=self.tracker.process_unknown_person
+                        mark_attendance_callback=mark_attendance,
+                        unknown_person_callback=self.tracker.process_unknown_person,
+                        hires_reader=getattr(cap, 'read_main', None)
                     )
                     last_results = (detections, labels, faces)
+                    new_results = True
                 else:
                     # Skip frame: use last known results (or empty if None)
                     if last_results:
@@ -520,13 +564,17 @@ class FaceAttendancePro:
                     else:
                         detections, labels, faces = [], [], []
                     messages = []
+                    new_results = False
 
-                # Queue messages for main thread
+                # Queue messages for main thread (incl. write-behind attendance results)
+                messages = list(messages) + self.tracker.get_pending_messages()
                 for msg in messages:
                     self.log_queue.put(msg)
                 
-                # Store visualization data safely
+                # Store visualization data safely (only new results bump the version)
                 with self.processing_lock:
+                    if new_results:
+                        self.results_version[cam_index] += 1
                     self.latest_results[cam_index] = (detections, labels, faces)
             except Exception as e:
                 print(f"Processing Error Cam {cam_index}: {e}")
@@ -555,27 +603,19 @@ class FaceAttendancePro:
         for i, cap in enumerate(self.caps):
             if cap is None: continue
             
-            # 1. Get Instant Frame (Non-blocking)
-            ret, frame = cap.read()
+            # 1. Get Instant Frame (Non-blocking, into this camera's reused buffer)
+            ret, frame = cap.read(out=self.display_frames[i])
             if not ret or frame is None:
                 if i == 0: self.video_label_1.configure(image="", text="No Signal")
                 else: self.video_label_2.configure(image="", text="No Signal")
                 continue
+            self.display_frames[i] = frame
 
             # 2. Get Latest Processing Results (Instant)
             results = None
             with self.processing_lock:
                 results = self.latest_results.get(i)
-            
-            # 3. Annotate Frame (Fast drawing)
-            annotated_frame = frame
-            
-            if results:
-                detections, labels, faces = results
-                
-                # Use the processor's drawing method
-                processor = self.processor if i == 0 else self.processor2
-                annotated_frame = processor.annotate_frame(frame, detections, labels, faces)
+                version = self.results_version.get(i)
             
             # Flush Logs
             while not self.log_queue.empty():
@@ -584,23 +624,38 @@ class FaceAttendancePro:
                     self.log_list.insert(0, f"{datetime.now().strftime('%H:%M:%S')} - {msg}")
                 except: break
 
-            # 4. Display
-            # 4. Display Optimized
-            if not self.is_paused:
-                # Resize using OpenCV (Much faster than PIL)
-                # target width=640, height=480 (standard VGA)
-                frame_resized = cv2.resize(annotated_frame, (640, 480), interpolation=cv2.INTER_LINEAR)
-                
-                # Convert to RGB for Tkinter
-                img = Image.fromarray(cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB))
-                imgtk = ImageTk.PhotoImage(image=img)
-                
-                if i == 0:
-                    self.video_label_1.imgtk = imgtk
-                    self.video_label_1.configure(image=imgtk, text="")
-                elif i == 1:
-                    self.video_label_2.imgtk = imgtk
-                    self.video_label_2.configure(image=imgtk, text="")
+            if self.is_paused: continue
+            
+            # 3. Skip entirely if neither the frame nor the results changed
+            frame_seq = getattr(cap, 'frame_seq', None)
+            state = (frame_seq, version)
+            if frame_seq is not None and state == self.display_state[i]:
+                continue
+            self.display_state[i] = state
+            
+            # 4. Downsize first, then annotate at display resolution (reused buffer)
+            processor = self.processor if i == 0 else self.processor2
+            if results:
+                detections, labels, faces = results
+            else:
+                detections, labels, faces = None, [], []
+            self.display_buffers[i] = processor.annotate_for_display(
+                frame, detections, labels, faces, size=(640, 480), out=self.display_buffers[i]
+            )
+            
+            # 5. Display: convert into a reused RGB buffer and paste into the existing PhotoImage
+            self.display_rgb[i] = cv2.cvtColor(self.display_buffers[i], cv2.COLOR_BGR2RGB, dst=self.display_rgb[i])
+            img = Image.fromarray(self.display_rgb[i])
+            
+            label = self.video_label_1 if i == 0 else self.video_label_2
+            if self.display_photos[i] is None:
+                self.display_photos[i] = ImageTk.PhotoImage(image=img)
+                label.imgtk = self.display_photos[i]
+                label.configure(image=self.display_photos[i], text="")
+            else:
+                self.display_photos[i].paste(img)
+                if label.cget("image") != str(self.display_photos[i]):
+                    label.configure(image=self.display_photos[i], text="")
 
         # Update stats occasionally
         if int(time.time())%2==0 and self.current_view == "dashboard": 
@@ -662,6 +717,7 @@ class FaceAttendancePro:
         success, db_msg = self.db.add_person(pid, name, encoding, self.reg_entries["Email (Optional)"].get(), self.reg_entries["Department (Optional)"].get(), s_start, s_end)
         if success: 
             self.face_handler.add_face_encoding(pid, name, encoding)
+            self.tracker.prepare_greetings([name])
             messagebox.showinfo("Success", f"Registered {name}!")
             self.clear_registration_form() # Clear inputs
             self.show_dashboard()
@@ -693,6 +749,7 @@ class FaceAttendancePro:
         success, db_msg = self.db.add_person(pid, name, encoding, self.reg_entries["Email (Optional)"].get(), self.reg_entries["Department (Optional)"].get(), s_start, s_end)
         if success: 
             self.face_handler.add_face_encoding(pid, name, encoding)
+            self.tracker.prepare_greetings([name])
             messagebox.showinfo("Success", f"Registered {name}!")
             self.clear_registration_form() # Clear inputs
             self.show_dashboard()
@@ -729,6 +786,7 @@ class FaceAttendancePro:
             ent = tk.Entry(popup, bg=COLORS['card'], fg="white", relief="flat"); ent.insert(0, str(curr[i])); ent.pack(fill="x", padx=40, pady=5); entries[lbl] = ent
         def save():
             if self.db.update_person(pid, entries["Name"].get(), entries["Email"].get(), entries["Department"].get(), entries["Shift Start"].get(), entries["Shift End"].get())[0]:
+                self.tracker.prepare_greetings([entries["Name"].get()])
                 messagebox.showinfo("OK", "Updated!"); self.load_records(); popup.destroy()
         ModernButton(popup, text="SAVE", command=save, bg=COLORS['success'], fg="#1e1e2e").pack(fill="x", padx=40, pady=30)
 
@@ -774,12 +832,6 @@ class FaceAttendancePro:
         pid = self.entry_report_id.get().strip()
         if not pid: pid = "All"
         
-        # Fetch Data
-        data = self.db.get_attendance_report(start, end, pid)
-        if not data:
-            messagebox.showinfo("Report", "No records found for this period.")
-            return
-
         # Create Reports Directory
         today_str = datetime.now().strftime('%Y-%m-%d')
         # Updated path for reports
@@ -792,32 +844,25 @@ class FaceAttendancePro:
                 messagebox.showerror("Error", f"Could not create report directory: {e}")
                 return
 
-        # Generate File
+        # Generate File (rows streamed from the database straight into the file)
         timestamp = datetime.now().strftime('%H%M%S')
-        filename = f"Report_{pid}_{start}_to_{end}_{timestamp}"
+        filename = f"Report_{pid}_{start}_to_{end}_{timestamp}.{fmt}"
         full_path = os.path.join(report_dir, filename)
         
-        if fmt == "csv":
-            full_path += ".csv"
-            try:
-                with open(full_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['Date', 'Name', 'ID', 'Arrival', 'Leaving', 'Status'])
-                    writer.writerows(data)
-                messagebox.showinfo("Success", f"Saved: {full_path}")
-                try: os.startfile(report_dir)
-                except: pass
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-                
-        elif fmt == "pdf":
-            full_path += ".pdf"
-            success, msg = self.db.export_to_pdf(data, full_path, title=f"Attendance Report ({start} to {end})")
-            if success: 
-                messagebox.showinfo("Success", f"Saved: {full_path}")
-                try: os.startfile(report_dir)
-                except: pass
-            else: messagebox.showerror("Error", msg)
+        success, msg, stats = export_attendance_report(self.db, full_path, fmt, start, end, pid,
+                                                       title=f"Attendance Report ({start} to {end})")
+        if not success:
+            messagebox.showerror("Error", msg)
+            return
+        if stats['rows'] == 0:
+            try: os.remove(full_path)
+            except OSError: pass
+            messagebox.showinfo("Report", "No records found for this period.")
+            return
+
+        messagebox.showinfo("Success", f"Saved: {full_path}\n{stats['rows']:,} rows ({stats['rows_per_second']:,.0f} rows/s)")
+        try: os.startfile(report_dir)
+        except: pass
 
     def animate_pulse(self):
         t = time.time() * 5; h = f"#{int(100+50*math.sin(t)):02x}ff{int(100+50*math.sin(t)):02x}"
@@ -825,7 +870,13 @@ class FaceAttendancePro:
         else: self.canvas_pulse.itemconfig(self.pulse_circle, fill=COLORS['danger'])
         self.root.after(100, self.animate_pulse)
 
-    def close_app(self): self.is_running = False; self.root.destroy()
+    def close_app(self):
+        self.is_running = False
+        self.maintenance.stop()
+        self.alerts.stop()
+        self.db.stats.stop()
+        self.tracker.shutdown() # Flush queued attendance events and unknown-face snapshots
+        self.root.destroy()
 
     def show_dashboard(self): self.switch_frame(self.frame_dashboard, "dashboard")
     